@@ -5,13 +5,16 @@ programa: sentencia* EOF;
 sentencia
     : declaracion
     | asignacion
-    | expresion ';'
+    | {self._input.LA(1) != DSLParser.LBRACE}? expresion ';'   // una sentencia que empieza con '{' es un bloque, no un diccionario o conjunto
     | condicional
     | ciclo
     | funcionDef
     | retorno
     | impresion
     | operacionML
+    | lanzamiento
+    | espera
+    | liberacion
     | operacionArchivos
     | operacionGrafico
     | bloque
@@ -23,9 +26,13 @@ declaracion
     ;
 
 asignacion
-    : ID '=' expresion ';'
-    | ID '[' expresion ']' '=' expresion ';'                    // asignación a elemento de lista
-    | ID '[' expresion ']' '[' expresion ']' '=' expresion ';'  // asignación a elemento de matriz
+    : ID operadorAsignacion expresion ';'
+    | ID '[' expresion ']' operadorAsignacion expresion ';'                    // asignación a elemento de lista o diccionario
+    | ID '[' expresion ']' '[' expresion ']' operadorAsignacion expresion ';'  // asignación a elemento de matriz
+    ;
+
+operadorAsignacion
+    : '=' | '+=' | '-=' | '*=' | '/='                           // '+=' etc. operan sobre el valor actual
     ;
 
 condicional
@@ -35,6 +42,7 @@ condicional
 ciclo
     : cicloFor
     | cicloWhile
+    | cicloParalelo
     ;
 
 cicloFor
@@ -46,6 +54,20 @@ cicloWhile
     : 'while' '(' expresion ')' bloque
     ;
 
+cicloParalelo                                               // iteraciones en el pool de procesos, por trozos
+    : 'pfor' ID 'in' 'range' '(' expresion (',' expresion (',' expresion)?)? ')' opcionesParalelo bloque
+    | 'pfor' ID 'in' expresion opcionesParalelo bloque
+    ;
+
+opcionesParalelo
+    : ({self._input.LT(1).text == 'chunk'}? ID '=' expresion)?  // 'chunk' no es palabra reservada: 'chunk = 5;' sigue siendo una asignación
+      ('reduce' '(' reduccion (',' reduccion)* ')')?
+    ;
+
+reduccion
+    : ID ':' ID                                             // variable ':' sum | append | min | max
+    ;
+
 bloque
     : '{' sentencia* '}'
     ;
@@ -66,7 +88,7 @@ expresion
     : expresion '**' expresion                              // potencia
     | expresion ('*' | '/' | '%') expresion                 // multiplicación, división, módulo
     | expresion ('+' | '-') expresion                       // suma, resta
-    | expresion ('<' | '<=' | '>' | '>=' | '==' | '!=') expresion  // comparación
+    | expresion ('<' | '<=' | '>' | '>=' | '==' | '!=' | 'in') expresion  // comparación y pertenencia
     | expresion ('and' | 'or') expresion                    // lógicos
     | 'not' expresion                                       // negación
     | '-' expresion                                         // negativo
@@ -77,6 +99,8 @@ expresion
     | expresion '[' expresion ':' expresion ']'             // slicing
     | lista                                                 // lista literal
     | matriz                                                // matriz literal
+    | diccionario                                           // diccionario literal
+    | conjunto                                              // conjunto literal
     | ID                                                    // identificador
     | NUMERO                                                // número
     | STRING                                                // cadena
@@ -99,6 +123,18 @@ matriz
     : '[' lista (',' lista)* ']'
     ;
 
+diccionario
+    : '{' (par (',' par)*)? '}'                             // {} es un diccionario vacío
+    ;
+
+par
+    : expresion ':' expresion
+    ;
+
+conjunto
+    : '{' expresion (',' expresion)* '}'
+    ;
+
 impresion
     : 'print' '(' expresion ')' ';'
     | 'show' '(' expresion ')' ';'
@@ -116,6 +152,18 @@ operacionML
     | evaluarModelo
     ;
 
+lanzamiento
+    : 'spawn' operacionML                                   // se ejecuta en otro proceso; su variable queda con un futuro
+    ;
+
+espera
+    : 'await' (ID (',' ID)*)? ';'                           // sin nombres espera todas las operaciones lanzadas
+    ;
+
+liberacion
+    : ('del' | 'free') ID (',' ID)* ';'                     // libera las variables (y su dataframe o modelo)
+    ;
+
 regresionLineal
     : 'regresion_lineal' '(' 
         'X=' expresion ',' 
@@ -335,6 +383,12 @@ VAR: 'var';
 GLOBAL: 'global';
 PRINT: 'print';
 RANGE: 'range';
+SPAWN: 'spawn';
+PFOR: 'pfor';
+REDUCE: 'reduce';
+AWAIT: 'await';
+DEL: 'del';
+FREE: 'free';
 
 // Operadores
 PLUS: '+';
@@ -353,6 +407,10 @@ AND: 'and';
 OR: 'or';
 NOT: 'not';
 ASSIGN: '=';
+PLUS_ASSIGN: '+=';
+MINUS_ASSIGN: '-=';
+MULT_ASSIGN: '*=';
+DIV_ASSIGN: '/=';
 
 // Delimitadores
 LPAREN: '(';
@@ -0,0 +1,70 @@
+import time
+from antlr4 import CommonTokenStream, PredictionMode
+from antlr4.error.ErrorListener import ConsoleErrorListener, ErrorListener
+from antlr4.error.ErrorStrategy import BailErrorStrategy, DefaultErrorStrategy
+from antlr4.error.Errors import ParseCancellationException
+from DSLLexer import DSLLexer
+from DSLParser import DSLParser
+
+
+class ErroresSintaxis(ErrorListener):
+    """Guarda los errores de sintaxis en lugar de escribirlos en stderr"""
+
+    def __init__(self):
+        self.mensajes = []
+
+    def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
+        self.mensajes.append(f"línea {line}:{column} {msg}")
+
+
+class _ContadorErrores(ErrorListener):
+    """Cuenta los errores del lexer (el lexer no lleva la cuenta)"""
+
+    def __init__(self):
+        self.cantidad = 0
+
+    def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
+        self.cantidad += 1
+
+
+def parsear(input_stream, tiempos=None, errores=None):
+    """
+    Lexea y parsea un programa en dos etapas:
+    1. Predicción SLL con BailErrorStrategy (rápida, alcanza casi siempre)
+    2. Si la primera falla, LL completo con la estrategia de errores normal
+    Retorna (tree, cantidad de errores de sintaxis del lexer y del parser);
+    'tiempos' recibe los segundos de 'lexer' y 'parser'.
+    'errores': ErrorListener que recibe los errores (por defecto, la consola)
+    """
+    inicio = time.perf_counter()
+    lexer = DSLLexer(input_stream)
+    if errores is not None:
+        lexer.removeErrorListeners()
+        lexer.addErrorListener(errores)
+    contador = _ContadorErrores()
+    lexer.addErrorListener(contador)
+    stream = CommonTokenStream(lexer)
+    stream.fill()
+    fin_lexer = time.perf_counter()
+
+    parser = DSLParser(stream)
+    parser.removeErrorListeners()
+    parser._errHandler = BailErrorStrategy()
+    parser._interp.predictionMode = PredictionMode.SLL
+    try:
+        tree = parser.programa()
+    except ParseCancellationException:
+        # SLL no alcanzó (o hay un error real): se repite con LL completo,
+        # que además reporta los errores
+        stream.seek(0)
+        parser.reset()
+        parser.addErrorListener(errores if errores is not None else ConsoleErrorListener.INSTANCE)
+        parser._errHandler = DefaultErrorStrategy()
+        parser._interp.predictionMode = PredictionMode.LL
+        tree = parser.programa()
+    fin_parser = time.perf_counter()
+
+    if tiempos is not None:
+        tiempos['lexer'] = fin_lexer - inicio
+        tiempos['parser'] = fin_parser - fin_lexer
+    return tree, contador.cantidad + parser.getNumberOfSyntaxErrors()
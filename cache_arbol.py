@@ -0,0 +1,134 @@
+import hashlib
+import marshal
+import os
+import sys
+import time
+from antlr4 import InputStream
+from antlr4.Token import CommonToken
+from antlr4.tree.Tree import TerminalNodeImpl
+import DSLLexer as modulo_lexer
+import DSLParser as modulo_parser
+from DSLParser import DSLParser
+from analizador import parsear
+
+# Cambia si cambia el formato de los archivos de la caché
+FORMATO = 1
+
+
+def directorio_cache(archivo):
+    """Directorio '.dsl_cache' junto al script"""
+    return os.path.join(os.path.dirname(os.path.abspath(archivo)), '.dsl_cache')
+
+
+def version_gramatica():
+    """Hash de los ATN generados: cambia al regenerar el lexer o el parser"""
+    h = hashlib.sha256()
+    for modulo in (modulo_lexer, modulo_parser):
+        h.update(repr(modulo.serializedATN()).encode('utf-8'))
+    return h.hexdigest()
+
+
+class CacheArbol:
+    """
+    Caché en disco del árbol de parseo de cada script:
+    - La clave es el hash del código fuente y de la versión de la gramática
+    - El árbol se guarda como tuplas anidadas con marshal
+    - Si el script no cambió, no se ejecutan DSLLexer ni DSLParser
+    """
+
+    def __init__(self, directorio=None):
+        # Por defecto, '.dsl_cache' junto a cada script
+        self.directorio = directorio
+        self._version = None
+
+    def obtener_arbol(self, archivo, tiempos=None, errores=None):
+        """
+        Retorna el árbol de 'archivo', desde la caché si es posible;
+        'tiempos' recibe 'cache' o los tiempos de lexer y parser y
+        'errores' los errores de sintaxis (ver parsear)
+        """
+        with open(archivo, 'rb') as f:
+            fuente = f.read()
+
+        ruta = self.ruta_cache(archivo, fuente)
+        if os.path.exists(ruta):
+            inicio = time.perf_counter()
+            try:
+                with open(ruta, 'rb') as f:
+                    tree = self.reconstruir(marshal.load(f))
+                if tiempos is not None:
+                    tiempos['cache'] = time.perf_counter() - inicio
+                return tree
+            except (OSError, EOFError, ValueError, TypeError, AttributeError):
+                pass  # archivo dañado o de otro formato: se vuelve a parsear
+
+        tree, cantidad = parsear(InputStream(fuente.decode('utf-8')), tiempos, errores)
+
+        # Un árbol con errores (del lexer o del parser) no se guarda
+        if cantidad == 0:
+            self.guardar(ruta, tree)
+        return tree
+
+    def ruta_cache(self, archivo, fuente):
+        if self._version is None:
+            self._version = version_gramatica()
+        h = hashlib.sha256()
+        h.update(fuente)
+        h.update(self._version.encode('utf-8'))
+        h.update(f"{FORMATO}:{marshal.version}:{sys.version_info[:2]}".encode('utf-8'))
+
+        directorio = self.directorio
+        if directorio is None:
+            directorio = directorio_cache(archivo)
+        return os.path.join(directorio, h.hexdigest() + '.arbol')
+
+    def guardar(self, ruta, tree):
+        """Escribe el árbol serializado (sin dejar archivos a medio escribir)"""
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            temporal = f"{ruta}.{os.getpid()}.tmp"
+            with open(temporal, 'wb') as f:
+                marshal.dump(self.serializar(tree), f)
+            os.replace(temporal, ruta)
+        except OSError:
+            pass  # sin permisos de escritura: se trabaja sin caché
+
+    # conversión árbol <-> tuplas
+
+    def serializar(self, nodo):
+        """
+        Regla: (nombre de la clase de contexto, *hijos)
+        Token: (tipo, texto, línea, columna)
+        """
+        if isinstance(nodo, TerminalNodeImpl):
+            token = nodo.symbol
+            return (token.type, token.text, token.line, token.column)
+        hijos = nodo.children if nodo.children else []
+        clase = type(nodo)
+        # Nodos que agrega el Optimizador: se guardan como su clase de DSLParser
+        while not hasattr(DSLParser, clase.__name__):
+            clase = clase.__base__
+        return (clase.__name__,) + tuple(self.serializar(h) for h in hijos)
+
+    def reconstruir(self, datos, padre=None):
+        """Vuelve a crear los contextos de DSLParser a partir de las tuplas"""
+        if not isinstance(datos[0], str):
+            token = CommonToken(type=datos[0])
+            token.text = datos[1]
+            token.line = datos[2]
+            token.column = datos[3]
+            hoja = TerminalNodeImpl(token)
+            hoja.parentCtx = padre
+            return hoja
+
+        nodo = getattr(DSLParser, datos[0])(None, padre)
+        nodo.parentCtx = padre
+        for hijo in datos[1:]:
+            nodo.addChild(self.reconstruir(hijo, nodo))
+
+        # Primer y último token, como los deja el parser
+        if nodo.children:
+            primero, ultimo = nodo.children[0], nodo.children[-1]
+            nodo.start = primero.symbol if isinstance(primero, TerminalNodeImpl) else primero.start
+            nodo.stop = ultimo.symbol if isinstance(ultimo, TerminalNodeImpl) else ultimo.stop
+        return nodo
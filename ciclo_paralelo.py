@@ -0,0 +1,237 @@
+import contextlib
+import hashlib
+import io
+import math
+import os
+import pickle
+import sys
+from antlr4.tree.Tree import TerminalNodeImpl
+from DSLParser import DSLParser
+from cache_arbol import CacheArbol
+from librerias.Nativas import NATIVAS, es_pura
+from librerias.Tareas import en_proceso_del_pool, pool_procesos
+from librerias.Vistas import LISTAS, desprender
+
+# Reducciones de 'pfor ... reduce(variable: operacion)'
+REDUCCIONES = ('sum', 'append', 'min', 'max')
+
+# Trozos por proceso cuando no se indica 'chunk=' (reparte mejor la carga)
+TROZOS_POR_PROCESO = 4
+
+
+# --- Análisis del cuerpo ---
+
+def _identificadores(ctx, nombres):
+    """Todos los ID que aparecen en 'ctx'"""
+    if isinstance(ctx, TerminalNodeImpl):
+        if ctx.symbol.type == DSLParser.ID:
+            nombres.add(ctx.getText())
+        return
+    for hijo in ctx.children or ():
+        _identificadores(hijo, nombres)
+
+
+def _variable_base(ctx):
+    """Variable que se modifica en 'ctx': 'l' en l, l[i] o (l[i])[j]"""
+    while isinstance(ctx, DSLParser.ExpresionContext) and ctx.ID() is None and ctx.expresion():
+        ctx = ctx.expresion(0)
+    if isinstance(ctx, DSLParser.ExpresionContext) and ctx.ID() is not None:
+        return ctx.ID().getText()
+    return None
+
+
+def _escrituras(ctx, escritas, propias, en_funcion=False):
+    """
+    escritas: variables que el cuerpo asigna o modifica en el lugar
+    propias: las que declara ('var') o itera: viven en el cuerpo
+    """
+    if isinstance(ctx, TerminalNodeImpl) or isinstance(ctx, DSLParser.FuncionDefContext):
+        return
+    if isinstance(ctx, DSLParser.RetornoContext) and not en_funcion:
+        raise ValueError(f"línea {ctx.start.line}: 'return' dentro de un pfor")
+    if isinstance(ctx, DSLParser.DeclaracionContext):
+        if ctx.getChild(0).getText() == 'var':
+            propias.add(ctx.ID().getText())
+        else:
+            escritas.add(ctx.ID().getText())
+    elif isinstance(ctx, DSLParser.AsignacionContext):
+        escritas.add(ctx.ID().getText())
+    elif isinstance(ctx, (DSLParser.CicloForContext, DSLParser.CicloParaleloContext)):
+        propias.add(ctx.ID().getText())
+    elif isinstance(ctx, DSLParser.LiberacionContext):
+        escritas.update(id_.getText() for id_ in ctx.ID())
+    elif isinstance(ctx, DSLParser.FuncionLlamadaContext):
+        nombre = ctx.ID().getText()
+        if nombre in NATIVAS and not es_pura(nombre) and ctx.argumentos():
+            # append(l, v) etc. modifican la lista que reciben (la de l en append(l[k], v))
+            base = _variable_base(ctx.argumentos().expresion(0))
+            if base is not None:
+                escritas.add(base)
+    for hijo in ctx.children or ():
+        _escrituras(hijo, escritas, propias, en_funcion)
+
+
+def _llamadas(ctx, nombres):
+    """Funciones del usuario que se llaman en 'ctx'"""
+    if isinstance(ctx, TerminalNodeImpl):
+        return
+    if isinstance(ctx, DSLParser.FuncionLlamadaContext) and ctx.ID().getText() not in NATIVAS:
+        nombres.add(ctx.ID().getText())
+    for hijo in ctx.children or ():
+        _llamadas(hijo, nombres)
+
+
+def funciones_usadas(contexto, ctx):
+    """Definiciones (funcionDef) de las funciones que el cuerpo llama, directa o indirectamente"""
+    definiciones = {}
+    pendientes = set()
+    _llamadas(ctx, pendientes)
+    while pendientes:
+        nombre = pendientes.pop()
+        if nombre in definiciones or not contexto.existe_funcion(nombre):
+            continue
+        cuerpo = contexto.obtener_funcion(nombre)['cuerpo']
+        definiciones[nombre] = cuerpo.parentCtx
+        _llamadas(cuerpo, pendientes)
+    return list(definiciones.values())
+
+
+# --- En los procesos del pool ---
+
+# Programa (hash) -> (visitor, cuerpo compilado) ya preparado en este proceso
+_preparados = {}
+
+
+def _preparar(programa):
+    clave = hashlib.sha256(programa).digest()
+    preparado = _preparados.get(clave)
+    if preparado is None:
+        from visitor import Visitor
+        from compilador import Compilador
+        tree = CacheArbol().reconstruir(pickle.loads(programa))
+        visitor = Visitor()
+        compilador = Compilador(visitor)
+        compilador.compilar_programa(tree)
+        *definiciones, cuerpo = compilador.sentencias_programa
+        for definicion in definiciones:
+            definicion()
+        preparado = _preparados[clave] = (visitor, cuerpo)
+    return preparado
+
+
+def ejecutar_trozo(programa, variables, nombre_var, valores, reducciones):
+    """
+    Ejecuta el cuerpo para cada valor del trozo con las variables de
+    afuera como globales; retorna el valor parcial de cada reducción y
+    lo que se imprimió
+    """
+    visitor, cuerpo = _preparar(programa)
+    globales = visitor.contexto.scope_global
+    globales.clear()
+    globales.update(pickle.loads(variables))
+    for nombre, operacion in reducciones:
+        if operacion == 'sum':
+            globales[nombre] = 0.0
+        elif operacion == 'append':
+            globales[nombre] = []
+
+    salida = io.StringIO()
+    with contextlib.redirect_stdout(salida):
+        for valor in valores:
+            globales[nombre_var] = valor
+            cuerpo()
+    return [globales[nombre] for nombre, _ in reducciones], salida.getvalue()
+
+
+# --- En el intérprete ---
+
+def ejecutar_ciclo_paralelo(visitor, ctx, nombre_var, iterable, chunk, reducciones):
+    """
+    pfor: reparte las iteraciones en trozos de 'chunk' valores entre los
+    procesos del pool. El cuerpo ve una copia de las variables de afuera
+    y solo puede modificarlas con reduce(variable: sum|append|min|max);
+    la salida de cada trozo se imprime en el orden de las iteraciones
+    """
+    contexto = visitor.contexto
+    bloque = ctx.bloque()
+    nombres_reduccion = set()
+    for nombre, operacion in reducciones:
+        if operacion not in REDUCCIONES:
+            raise ValueError(f"pfor: reducción '{operacion}' desconocida (se espera {', '.join(REDUCCIONES)})")
+        if not contexto.existe_variable(nombre):
+            raise NameError(f"pfor: la variable de reduce '{nombre}' no está definida")
+        if operacion == 'append' and not isinstance(contexto.obtener_variable(nombre), LISTAS):
+            raise TypeError(f"pfor: reduce({nombre}: append) necesita una lista")
+        nombres_reduccion.add(nombre)
+
+    escritas, propias = set(), {nombre_var}
+    _escrituras(bloque, escritas, propias)
+    for nombre in sorted(escritas - propias - nombres_reduccion):
+        if contexto.existe_variable(nombre):
+            raise ValueError(f"pfor: '{nombre}' es de afuera del ciclo; solo se puede modificar "
+                             f"con reduce({nombre}: {'|'.join(REDUCCIONES)})")
+
+    # Las funciones que llama tampoco: en el proceso modificarían una copia
+    definiciones = funciones_usadas(contexto, bloque)
+    for definicion in definiciones:
+        escritas = set()
+        propias = {id_.getText() for id_ in definicion.parametros().ID()} if definicion.parametros() else set()
+        _escrituras(definicion.bloque(), escritas, propias, en_funcion=True)
+        for nombre in sorted(escritas - propias - nombres_reduccion):
+            if contexto.existe_variable(nombre):
+                raise ValueError(f"pfor: la función '{definicion.ID().getText()}' modifica '{nombre}', "
+                                 f"que es de afuera del ciclo")
+
+    valores = list(iterable)
+    if not valores:
+        return None
+
+    # Programa para los procesos: las funciones que usa y el cuerpo
+    cache = CacheArbol()
+    programa = pickle.dumps(('ProgramaContext',)
+                            + tuple(('SentenciaContext', cache.serializar(d)) for d in definiciones)
+                            + (('SentenciaContext', cache.serializar(bloque)),))
+
+    # Copia de las variables de afuera que leen el cuerpo y las funciones
+    leidas = set()
+    for nodo in [bloque] + definiciones:
+        _identificadores(nodo, leidas)
+    iniciales = {nombre for nombre, operacion in reducciones if operacion in ('sum', 'append')}
+    variables = pickle.dumps({nombre: contexto.obtener_variable(nombre)
+                              for nombre in leidas - iniciales - {nombre_var}
+                              if contexto.existe_variable(nombre)})
+
+    if chunk is None:
+        chunk = math.ceil(len(valores) / ((os.cpu_count() or 1) * TROZOS_POR_PROCESO))
+    chunk = max(1, int(chunk))
+    inicios = range(0, len(valores), chunk)
+    if en_proceso_del_pool():
+        # pfor dentro de un proceso del pool: los trozos corren acá, en orden
+        resultados = (ejecutar_trozo(programa, variables, nombre_var, valores[inicio:inicio + chunk], reducciones)
+                      for inicio in inicios)
+    else:
+        pool = pool_procesos()
+        trozos = [pool.submit(ejecutar_trozo, programa, variables, nombre_var,
+                              valores[inicio:inicio + chunk], reducciones)
+                  for inicio in inicios]
+        resultados = (trozo.result() for trozo in trozos)
+
+    # Los parciales se combinan en el orden de las iteraciones
+    acumulados = [contexto.obtener_variable(nombre) for nombre, _ in reducciones]
+    for parciales, salida in resultados:
+        if salida:
+            sys.stdout.write(salida)
+        for i, (nombre, operacion) in enumerate(reducciones):
+            if operacion == 'sum':
+                acumulados[i] = acumulados[i] + parciales[i]
+            elif operacion == 'append':
+                desprender(acumulados[i])
+                acumulados[i].extend(parciales[i])
+            elif operacion == 'min':
+                acumulados[i] = min(acumulados[i], parciales[i])
+            else:
+                acumulados[i] = max(acumulados[i], parciales[i])
+
+    for (nombre, _), valor in zip(reducciones, acumulados):
+        contexto.actualizar_variable(nombre, valor)
+    return None
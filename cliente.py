@@ -0,0 +1,49 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+# Solo biblioteca estándar: el cliente arranca sin cargar el intérprete
+SOCKET_POR_DEFECTO = os.path.join(tempfile.gettempdir(), 'dsl.sock')
+
+
+def enviar(pedido, ruta_socket=SOCKET_POR_DEFECTO):
+    """Envía un pedido al servidor DSL y retorna su respuesta"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conexion:
+        conexion.connect(ruta_socket)
+        conexion.sendall(json.dumps(pedido).encode('utf-8') + b'\n')
+        with conexion.makefile('rb') as respuesta:
+            return json.loads(respuesta.readline())
+
+
+if __name__ == '__main__':
+    opciones = argparse.ArgumentParser(description="Cliente del servidor DSL")
+    opciones.add_argument('archivo', nargs='?', help="script a ejecutar")
+    opciones.add_argument('--socket', default=SOCKET_POR_DEFECTO)
+    opciones.add_argument('--sesion', help="sesión con nombre cuyo estado se conserva")
+    opciones.add_argument('--interpretar', action='store_true',
+                          help="ejecutar con el Visitor, sin compilar")
+    opciones.add_argument('--cerrar-sesion', action='store_true',
+                          help="descartar el estado de --sesion")
+    opciones.add_argument('--detener', action='store_true', help="detener el servidor")
+    args = opciones.parse_args()
+
+    if args.detener:
+        enviar({'comando': 'detener'}, args.socket)
+    elif args.cerrar_sesion:
+        enviar({'comando': 'cerrar_sesion', 'sesion': args.sesion}, args.socket)
+    elif args.archivo:
+        pedido = {'archivo': os.path.abspath(args.archivo)}
+        if args.sesion:
+            pedido['sesion'] = args.sesion
+        if args.interpretar:
+            pedido['compilar'] = False
+        respuesta = enviar(pedido, args.socket)
+        sys.stdout.write(respuesta['salida'])
+        if not respuesta['ok']:
+            sys.stderr.write(respuesta['error'])
+            sys.exit(1)
+    else:
+        opciones.print_help()
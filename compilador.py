@@ -0,0 +1,1365 @@
+import operator
+from antlr4 import ParserRuleContext
+from DSLParser import DSLParser
+from visitor import Visitor, RETORNO
+from resolutor import Resolutor, LOCAL, GLOBAL, define_variable, variables_lanzadas, variables_muertas
+from librerias.Contexto import SIN_VALOR, Llamada, CacheLRU
+from librerias.Matrices import Matrices
+from librerias.Nativas import NATIVAS, es_pura
+from librerias.Texto import imprimir
+from librerias.Vistas import LISTAS, desprender, rebanar
+from librerias.Vectores import Vector
+from librerias.Tareas import resolver
+from perfilador import linea_de, nombre_operacion
+from optimizador import ExpresionInvariante, CicloForOptimizado, CicloWhileOptimizado
+from metricas import regla_de
+
+# Frames de Python que puede usar la recursión nativa antes de pasar
+# a la pila explícita (el límite por defecto de Python es 1000)
+PRESUPUESTO_FRAMES = 400
+
+
+def _sumar(left, right):
+    if isinstance(left, str) or isinstance(right, str):
+        return str(left) + str(right)
+    return left + right
+
+# Operadores binarios resueltos una sola vez al compilar
+# ('and'/'or' evalúan ambos lados, igual que visitExpresion)
+OPERADORES_BINARIOS = {
+    '**': operator.pow,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '%': operator.mod,
+    '+': _sumar,
+    '-': operator.sub,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+    'in': lambda left, right: left in right,
+    'and': lambda left, right: left and right,
+    'or': lambda left, right: left or right,
+}
+
+OPERADORES_UNARIOS = {
+    '-': operator.neg,
+    'not': operator.not_,
+}
+
+
+def _identidad(valor):
+    return valor
+
+def _como_lista(*valores):
+    return list(valores)
+
+def _como_diccionario(*valores):
+    # clave, valor, clave, valor...
+    return dict(zip(valores[::2], valores[1::2]))
+
+def _como_conjunto(*valores):
+    return set(valores)
+
+def _indexar(obj, idx):
+    if isinstance(obj, LISTAS):
+        return obj[int(idx)]
+    if isinstance(obj, dict):
+        return obj[idx]
+    if type(obj) is Vector:
+        # Posición o máscara (v[v > 0])
+        return obj[idx]
+    return None
+
+# Las rebanadas largas son vistas (librerias.Vistas), no copias
+_rebanar = rebanar
+
+def _indexar_2d(matriz, fila, col):
+    return matriz[int(fila)][int(col)]
+
+def _rango(*limites):
+    return range(*[int(x) for x in limites])
+
+# Asignaciones a elementos; con 'operar' es compuesta (x[i] += v)
+def asignar_en_lista(nombre, lista, indice, v, operar=None):
+    if isinstance(lista, LISTAS):
+        if 0 <= indice < len(lista):
+            indice = int(indice)
+            if operar is not None:
+                v = operar(lista[indice], v)
+            desprender(lista)
+            lista[indice] = v
+        else:
+            print(f"Error: Indice {indice} fuera de rango para lista '{nombre}'")
+    elif isinstance(lista, dict) or type(lista) is Vector:
+        if operar is not None:
+            v = operar(lista[indice], v)
+        lista[indice] = v
+    else:
+        print(f"Error: Variable '{nombre}' no es una lista")
+    return v
+
+def asignar_en_matriz(nombre, matriz, fila, col, v, operar=None):
+    if isinstance(matriz, LISTAS) and isinstance(matriz[0], LISTAS):
+        if 0 <= fila < len(matriz) and 0 <= col < len(matriz[0]):
+            elemento = matriz[int(fila)]
+            col = int(col)
+            if operar is not None:
+                v = operar(elemento[col], v)
+            desprender(elemento)
+            elemento[col] = v
+        else:
+            print(f"Error: Indices [{fila}][{col}] fuera de rango para matriz '{nombre}'")
+    else:
+        print(f"Error: Variable '{nombre}' no es una matriz")
+    return v
+
+# Tipos inmutables que pueden ser clave o resultado de la caché de funciones puras
+ESCALARES = frozenset((float, int, str, bool, type(None)))
+
+def _clave_cache(argumentos):
+    """Clave (tipos y valores) o None si algún argumento no es escalar"""
+    tipos = tuple(map(type, argumentos))
+    for tipo in tipos:
+        if tipo not in ESCALARES:
+            return None
+    # Los tipos distinguen true de 1 (True == 1.0 en Python)
+    return (tipos, *argumentos)
+
+def _memoizar(ejecutar, cache):
+    """Envuelve una función pura compilada (y su versión en pila) con la caché"""
+    def memoizada(argumentos):
+        clave = _clave_cache(argumentos)
+        if clave is None:
+            return ejecutar(argumentos)
+        valor = cache.obtener(clave)
+        if valor is SIN_VALOR:
+            valor = ejecutar(argumentos)
+            if type(valor) in ESCALARES:
+                cache.guardar(clave, valor)
+        return valor
+
+    generador = getattr(ejecutar, 'generador', None)
+    if generador is not None:
+        def generador_memoizado(argumentos):
+            clave = _clave_cache(argumentos)
+            if clave is None:
+                return (yield from generador(argumentos))
+            valor = cache.obtener(clave)
+            if valor is SIN_VALOR:
+                valor = yield from generador(argumentos)
+                if type(valor) in ESCALARES:
+                    cache.guardar(clave, valor)
+            return valor
+        memoizada.generador = generador_memoizado
+    return memoizada
+
+def _mostrar(valor):
+    if isinstance(valor, LISTAS) and len(valor) > 0 and isinstance(valor[0], LISTAS):
+        Matrices.mostrar_matriz(valor)
+    else:
+        imprimir(valor)
+
+
+class LlamadaPendiente:
+    """
+    Pedido de llamada que un cuerpo en modo pila entrega (yield) a
+    ejecutar_en_pila; 'cola' indica una llamada en posición de cola
+    """
+    __slots__ = ('nombre', 'argumentos', 'cola')
+
+    def __init__(self, nombre, argumentos, cola=False):
+        self.nombre = nombre
+        self.argumentos = argumentos
+        self.cola = cola
+
+
+class Compilador:
+    """
+    Compila el árbol de ANTLR a un árbol de closures de Python:
+    - Cada sentencia/expresión se convierte en una función sin argumentos
+    - Operadores y literales se resuelven una sola vez
+    - Las variables locales se resuelven a (profundidad, slot) con el Resolutor
+    - Las sentencias retornan RETORNO cuando se ejecuta un 'return'
+    - Lo que no se compila (ML, archivos, gráficos) se delega al Visitor
+    - Las funciones puras guardan sus resultados en una CacheLRU
+    - Las funciones recursivas tienen además una versión en generadores que
+      corre sobre una pila explícita, con eliminación de llamadas de cola
+    """
+
+    def __init__(self, visitor=None, perfilador=None):
+        self.visitor = visitor if visitor else Visitor()
+        self.contexto = self.visitor.contexto
+        self.resolutor = Resolutor()
+
+        # Si hay un Perfilador, sentencias y funciones se compilan medidas
+        self.perfilador = perfilador
+
+        # Funciones en un ciclo del grafo de llamadas y caché de _suspende
+        self._recursivas = set()
+        self._lanzadas = set()
+        self._suspensiones = {}
+
+        # Análisis de pureza: un registro por cada funcionDef compilada
+        # ({'impura': bool, 'llamadas': set}) y los nombres que resultan puros
+        self._pureza = []
+        self._registros = {}
+        self._puras = set()
+
+        self._sentencias = {
+            DSLParser.DeclaracionContext: self.compilar_declaracion,
+            DSLParser.AsignacionContext: self.compilar_asignacion,
+            DSLParser.CondicionalContext: self.compilar_condicional,
+            DSLParser.CicloContext: lambda ctx: self.compilar_sentencia(ctx),
+            DSLParser.CicloForContext: self.compilar_ciclo_for,
+            DSLParser.CicloWhileContext: self.compilar_ciclo_while,
+            DSLParser.FuncionDefContext: self.compilar_funcion_def,
+            DSLParser.RetornoContext: self.compilar_retorno,
+            DSLParser.ImpresionContext: self.compilar_impresion,
+            DSLParser.LiberacionContext: self.compilar_liberacion,
+            DSLParser.BloqueContext: self.compilar_bloque,
+            DSLParser.ExpresionContext: self.compilar_expresion,
+            # Nodos que reemplaza el Optimizador
+            CicloForOptimizado: self.compilar_ciclo_for,
+            CicloWhileOptimizado: self.compilar_ciclo_while,
+            ExpresionInvariante: self.compilar_expresion,
+        }
+
+        # Sentencias con versión en modo pila (las demás nunca suspenden)
+        self._sentencias_pila = {
+            DSLParser.DeclaracionContext: self.compilar_declaracion_pila,
+            DSLParser.AsignacionContext: self.compilar_asignacion_pila,
+            DSLParser.CondicionalContext: self.compilar_condicional_pila,
+            DSLParser.CicloContext: lambda ctx: self.compilar_sentencia_pila(ctx),
+            DSLParser.CicloForContext: self.compilar_ciclo_for_pila,
+            DSLParser.CicloWhileContext: self.compilar_ciclo_while_pila,
+            DSLParser.RetornoContext: self.compilar_retorno_pila,
+            DSLParser.ImpresionContext: self.compilar_impresion_pila,
+            DSLParser.BloqueContext: self.compilar_bloque_pila,
+            DSLParser.ExpresionContext: self.compilar_expresion_pila,
+        }
+
+    # --- Programa y sentencias ---
+
+    def compilar_programa(self, ctx:DSLParser.ProgramaContext):
+        """Retorna una función que ejecuta el programa completo"""
+        self.resolutor.analizar_programa(ctx)
+        self._recursivas = self.resolutor.funciones_recursivas(ctx)
+        self._lanzadas = variables_lanzadas(ctx)
+        sentencias = [self.compilar_sentencia(s) for s in ctx.sentencia()]
+        self._resolver_puras()
+        # Closures de cada sentencia del nivel superior (las usa el transpilador)
+        self.sentencias_programa = sentencias
+        visitor = self.visitor
+
+        if visitor.liberar_memoria:
+            # Cada variable se libera después de la sentencia de su último uso
+            pasos = list(zip(sentencias, variables_muertas(ctx)))
+            liberar = visitor.liberar_muertas
+
+            def programa_liberando():
+                for sentencia, muertas in pasos:
+                    if sentencia() is RETORNO:
+                        break
+                    if muertas:
+                        liberar(muertas)
+                visitor.esperar_tareas()
+            return programa_liberando
+
+        def programa():
+            for sentencia in sentencias:
+                if sentencia() is RETORNO:
+                    break
+            visitor.esperar_tareas()
+        return programa
+
+    def compilar_sentencia(self, ctx):
+        """Compila una sentencia (o un nodo intermedio como ciclo)"""
+        hijo = ctx.getChild(0)
+        compilar = self._sentencias.get(type(hijo))
+        if compilar is None:
+            # Respaldo: el Visitor ejecuta el nodo tal cual
+            if isinstance(hijo, (DSLParser.OperacionMLContext, DSLParser.OperacionArchivosContext,
+                                 DSLParser.LanzamientoContext)):
+                nombre = define_variable(hijo if isinstance(hijo, DSLParser.LanzamientoContext) else hijo.getChild(0))
+                if nombre:
+                    self.resolutor.declarar(nombre)
+            self._marcar_impura()
+            visitor = self.visitor
+            sentencia = lambda: visitor.visit(hijo)
+            if self.perfilador is not None:
+                sentencia = self.perfilador.envolver_operacion(nombre_operacion(hijo), linea_de(ctx), sentencia)
+        else:
+            sentencia = compilar(hijo)
+
+        # 'ciclo' solo delega en cicloFor/cicloWhile: se mide una vez
+        if self.perfilador is not None and not isinstance(hijo, DSLParser.CicloContext):
+            sentencia = self.perfilador.envolver_linea(linea_de(ctx), sentencia)
+        if self.visitor.metricas is not None and not isinstance(hijo, DSLParser.CicloContext):
+            sentencia = self.visitor.metricas.contar_sentencia(regla_de(hijo), sentencia)
+        return sentencia
+
+    def compilar_bloque(self, ctx:DSLParser.BloqueContext):
+        contexto = self.contexto
+
+        if not self.resolutor.necesita_marco(ctx):
+            # El bloque no define variables: no hace falta un marco propio
+            sentencias = [self.compilar_sentencia(s) for s in ctx.sentencia()]
+
+            def bloque_sin_marco():
+                for sentencia in sentencias:
+                    if sentencia() is RETORNO:
+                        return RETORNO
+            return bloque_sin_marco
+
+        nombres = self.resolutor.entrar_marco()
+        try:
+            sentencias = [self.compilar_sentencia(s) for s in ctx.sentencia()]
+        finally:
+            self.resolutor.salir_marco()
+
+        def bloque():
+            contexto.entrar_scope('bloque', nombres)
+            try:
+                for sentencia in sentencias:
+                    if sentencia() is RETORNO:
+                        return RETORNO
+            finally:
+                contexto.salir_scope()
+        return bloque
+
+    # --- Acceso a variables ---
+
+    def compilar_lectura(self, nombre):
+        """Closure que lee una variable según su resolución"""
+        contexto = self.contexto
+        obtener = contexto.obtener_variable
+        resolucion = self.resolutor.resolver(nombre)
+        if resolucion[0] != LOCAL:
+            # Depende de una variable libre
+            self._marcar_impura()
+
+        if resolucion[0] == LOCAL:
+            marcos = contexto.scopes_locales
+            indice = -1 - resolucion[1]
+            slot = resolucion[2]
+
+            def leer_local():
+                valor = marcos[indice].valores[slot]
+                if valor is SIN_VALOR:
+                    return obtener(nombre)
+                return valor
+            leer = leer_local
+
+        elif resolucion[0] == GLOBAL:
+            scope_global = contexto.scope_global
+
+            def leer_global():
+                valor = scope_global.get(nombre, SIN_VALOR)
+                if valor is SIN_VALOR:
+                    return obtener(nombre)
+                return valor
+            leer = leer_global
+
+        else:
+            return lambda: obtener(nombre)
+
+        if nombre in self._lanzadas:
+            # Puede tener el Futuro de un 'spawn': leerla espera el resultado
+            leer_directo = leer
+            leer = lambda: resolver(leer_directo())
+        return leer
+
+    def compilar_escritura(self, resolucion, nombre):
+        """Función que escribe una variable según su resolución"""
+        contexto = self.contexto
+        if resolucion[0] != LOCAL:
+            self._marcar_impura()
+
+        if resolucion[0] == LOCAL:
+            marcos = contexto.scopes_locales
+            indice = -1 - resolucion[1]
+            slot = resolucion[2]
+
+            def escribir_local(valor):
+                marcos[indice].valores[slot] = valor
+            return escribir_local
+
+        if resolucion[0] == GLOBAL:
+            scope_global = contexto.scope_global
+
+            def escribir_global(valor):
+                scope_global[nombre] = valor
+            return escribir_global
+
+        actualizar = contexto.actualizar_variable
+        return lambda valor: actualizar(nombre, valor)
+
+    def compilar_actualizacion(self, nombre, operar):
+        """
+        Función que aplica una asignación compuesta (x += v) a una variable
+        existente, leyéndola una sola vez; retorna el valor nuevo
+        """
+        contexto = self.contexto
+        operar_variable = contexto.operar_variable
+        resolucion = self.resolutor.resolver(nombre)
+        if resolucion[0] != LOCAL:
+            self._marcar_impura()
+        if nombre in self._lanzadas:
+            # Puede tener el Futuro de un 'spawn': se opera sobre su resultado
+            operar_directo = operar
+            operar = lambda actual, valor: operar_directo(resolver(actual), valor)
+
+        if resolucion[0] == LOCAL:
+            marcos = contexto.scopes_locales
+            indice = -1 - resolucion[1]
+            slot = resolucion[2]
+
+            def actualizar_local(valor):
+                valores = marcos[indice].valores
+                actual = valores[slot]
+                if actual is SIN_VALOR:
+                    return operar_variable(nombre, operar, valor)
+                valores[slot] = actual = operar(actual, valor)
+                return actual
+            return actualizar_local
+
+        if resolucion[0] == GLOBAL:
+            scope_global = contexto.scope_global
+
+            def actualizar_global(valor):
+                actual = scope_global.get(nombre, SIN_VALOR)
+                if actual is SIN_VALOR:
+                    return operar_variable(nombre, operar, valor)
+                scope_global[nombre] = actual = operar(actual, valor)
+                return actual
+            return actualizar_global
+
+        return lambda valor: operar_variable(nombre, operar, valor)
+
+    # --- Declaración y Asignación ---
+
+    def compilar_declaracion(self, ctx:DSLParser.DeclaracionContext):
+        valor = self.compilar_expresion(ctx.expresion())
+        escribir = self._escritura_declaracion(ctx)
+
+        def declaracion():
+            v = valor()
+            escribir(v)
+            return v
+        return declaracion
+
+    def _escritura_declaracion(self, ctx:DSLParser.DeclaracionContext):
+        nombre = ctx.ID().getText()
+        if ctx.getChild(0).getText() == 'global':
+            if not self.resolutor.scopes and not self.resolutor.en_funcion():
+                self.resolutor.globales.add(nombre)
+            return self.compilar_escritura((GLOBAL,), nombre)
+        return self.compilar_escritura(self.resolutor.declarar(nombre), nombre)
+
+    def compilar_asignacion(self, ctx:DSLParser.AsignacionContext):
+        # Mismas semánticas que visitAsignacion: cada expresión una sola vez
+        expresiones, accion = self._partes_asignacion(ctx, self.compilar_expresion)
+
+        if len(expresiones) == 1: # ID op expresion ';'
+            valor, = expresiones
+            if ctx.operadorAsignacion().getText() != '=':
+                # La actualización retorna el valor nuevo
+                return lambda: accion(valor())
+
+            def asignacion():
+                v = valor()
+                accion(v)
+                return v
+            return asignacion
+
+        if len(expresiones) == 2: # ID '[' expresion ']' op expresion ';'
+            indice_c, valor_c = expresiones
+
+            def asignacion_lista():
+                return accion(indice_c(), valor_c())
+            return asignacion_lista
+
+        # ID '[' expresion ']' '[' expresion ']' op expresion ';'
+        fila_c, col_c, valor_c = expresiones
+
+        def asignacion_matriz():
+            return accion(fila_c(), col_c(), valor_c())
+        return asignacion_matriz
+
+    def _partes_asignacion(self, ctx:DSLParser.AsignacionContext, compilar):
+        """
+        Compila las expresiones de una asignación con 'compilar' y retorna
+        (expresiones, acción); la acción recibe sus valores y escribe
+        """
+        nombre = ctx.ID().getText()
+        expresiones = [compilar(e) for e in ctx.expresion()]
+        operador = ctx.operadorAsignacion().getText()
+        operar = None if operador == '=' else OPERADORES_BINARIOS[operador[0]]
+
+        if len(expresiones) == 1:
+            if operar is not None:
+                return expresiones, self.compilar_actualizacion(nombre, operar)
+            return expresiones, self.compilar_escritura(self.resolutor.resolver_asignacion(nombre), nombre)
+
+        obtener = self.compilar_lectura(nombre)
+
+        if len(expresiones) == 2:
+            def asignar_lista(indice, v):
+                return asignar_en_lista(nombre, obtener(), indice, v, operar)
+            return expresiones, asignar_lista
+
+        def asignar_matriz(fila, col, v):
+            return asignar_en_matriz(nombre, obtener(), fila, col, v, operar)
+        return expresiones, asignar_matriz
+
+    # --- Control Flow ---
+
+    def compilar_condicional(self, ctx:DSLParser.CondicionalContext):
+        # Pares (condición, bloque) en orden; el else queda aparte
+        ramas = []
+        otro = None
+        expr_idx = 0
+        bloque_idx = 0
+        for i in range(ctx.getChildCount()):
+            texto = ctx.getChild(i).getText()
+            if texto == 'if' or texto == 'elif':
+                ramas.append((self.compilar_expresion(ctx.expresion(expr_idx)),
+                              self.compilar_bloque(ctx.bloque(bloque_idx))))
+                expr_idx += 1
+                bloque_idx += 1
+            elif texto == 'else':
+                otro = self.compilar_bloque(ctx.bloque(bloque_idx))
+
+        def condicional():
+            for condicion, bloque in ramas:
+                if condicion():
+                    return bloque()
+            if otro is not None:
+                return otro()
+        return condicional
+
+    def compilar_ciclo_for(self, ctx:DSLParser.CicloForContext):
+        nombre_var = ctx.ID().getText()
+        contexto = self.contexto
+        marcos = contexto.scopes_locales
+        expresiones = [self.compilar_expresion(e) for e in ctx.expresion()]
+
+        # La variable de iteración vive en el slot 0 del marco del ciclo
+        nombres = self.resolutor.entrar_marco([nombre_var])
+        try:
+            nombres_cuerpo, sentencias = self._compilar_cuerpo_ciclo(ctx.bloque())
+        finally:
+            self.resolutor.salir_marco()
+        invariantes = getattr(ctx, 'invariantes', ())
+
+        if ctx.getChild(3).getText() == 'range':
+            def iterable():
+                return _rango(*[e() for e in expresiones])
+        else:
+            iterable = expresiones[0]
+
+        def ciclo_for():
+            valores = iterable()
+            for expresion in invariantes:
+                expresion.valor = SIN_VALOR
+            contexto.entrar_scope('ciclo', nombres)
+            try:
+                slots = marcos[-1].valores
+                slots[0] = 0
+                if nombres_cuerpo is None:
+                    for val in valores:
+                        slots[0] = val
+                        for sentencia in sentencias:
+                            if sentencia() is RETORNO:
+                                return RETORNO
+                    return
+
+                # Un solo marco para el cuerpo, vaciado al terminar cada iteración
+                contexto.entrar_scope('bloque', nombres_cuerpo)
+                marco = marcos[-1]
+                try:
+                    for val in valores:
+                        slots[0] = val
+                        for sentencia in sentencias:
+                            if sentencia() is RETORNO:
+                                return RETORNO
+                        marco.limpiar()
+                finally:
+                    contexto.salir_scope()
+            finally:
+                contexto.salir_scope()
+        return ciclo_for
+
+    def compilar_ciclo_while(self, ctx:DSLParser.CicloWhileContext):
+        # El scope 'ciclo' del while nunca recibe variables: no se crea marco
+        condicion = self.compilar_expresion(ctx.expresion())
+        nombres_cuerpo, sentencias = self._compilar_cuerpo_ciclo(ctx.bloque())
+        invariantes = getattr(ctx, 'invariantes', ())
+        contexto = self.contexto
+        marcos = contexto.scopes_locales
+
+        def ciclo_while():
+            for expresion in invariantes:
+                expresion.valor = SIN_VALOR
+            if nombres_cuerpo is None:
+                while condicion():
+                    for sentencia in sentencias:
+                        if sentencia() is RETORNO:
+                            return RETORNO
+                return
+
+            # El mismo marco vuelve a la pila en cada iteración (la condición
+            # se compiló sin él); se crea con entrar_scope como los demás
+            contexto.entrar_scope('bloque', nombres_cuerpo)
+            marco = marcos.pop()
+            while condicion():
+                marcos.append(marco)
+                try:
+                    for sentencia in sentencias:
+                        if sentencia() is RETORNO:
+                            return RETORNO
+                finally:
+                    marcos.pop()
+                marco.limpiar()
+        return ciclo_while
+
+    def _compilar_cuerpo_ciclo(self, ctx:DSLParser.BloqueContext, compilar=None):
+        """
+        (layout, sentencias) del cuerpo de un ciclo; layout es None si el
+        cuerpo no necesita marco. El ciclo crea un solo marco para todas
+        las iteraciones en lugar de uno por iteración (compilar_bloque).
+        compilar: cómo compilar la lista de sentencias (en modo pila,
+        _compilar_sentencias_pila)
+        """
+        if compilar is None:
+            compilar = lambda sentencias: [self.compilar_sentencia(s) for s in sentencias]
+        if not self.resolutor.necesita_marco(ctx):
+            return None, compilar(ctx.sentencia())
+
+        nombres = self.resolutor.entrar_marco()
+        try:
+            return nombres, compilar(ctx.sentencia())
+        finally:
+            self.resolutor.salir_marco()
+
+    # --- Funciones ---
+
+    def compilar_funcion_def(self, ctx:DSLParser.FuncionDefContext):
+        nombre = ctx.ID().getText()
+        parametros = []
+        if ctx.parametros():
+            parametros = [x.getText() for x in ctx.parametros().ID()]
+        cuerpo_ctx = ctx.bloque()
+        contexto = self.contexto
+
+        # Definir una función modifica la tabla de funciones
+        self._marcar_impura()
+        registro = {'impura': False, 'llamadas': set()}
+        self._registros.setdefault(nombre, []).append(registro)
+        self._pureza.append(registro)
+        try:
+            ejecutar = self._compilar_cuerpo(nombre, parametros, cuerpo_ctx)
+        finally:
+            self._pureza.pop()
+
+        puras = self._puras
+
+        perfilador = self.perfilador
+        metricas = self.visitor.metricas
+
+        def funcion_def():
+            cache = None
+            compilado = ejecutar
+            if nombre in puras and contexto.tamano_cache > 0:
+                cache = CacheLRU(contexto.tamano_cache)
+                compilado = _memoizar(ejecutar, cache)
+            if perfilador is not None:
+                compilado = perfilador.envolver_funcion(nombre, compilado)
+            if metricas is not None:
+                compilado = metricas.contar_funcion(nombre, compilado)
+            contexto.definir_funcion(nombre, parametros, cuerpo_ctx, compilado, cache, registro['llamadas'])
+            if nombre in self._recursivas:
+                contexto.marcar_recursiva(nombre)
+        return funcion_def
+
+    def _compilar_cuerpo(self, nombre, parametros, cuerpo_ctx):
+        """Compila el cuerpo de una función y retorna ejecutar(argumentos)"""
+        contexto = self.contexto
+
+        # El cuerpo se compila una vez, no en cada definición.
+        # Parámetros y variables del cuerpo comparten el marco de la función
+        nombres = self.resolutor.entrar_funcion(parametros)
+        try:
+            sentencias = [self.compilar_sentencia(s) for s in cuerpo_ctx.sentencia()]
+        finally:
+            self.resolutor.salir_funcion()
+
+        pila = contexto.call_stack
+        marcos = contexto.scopes_locales
+        marco_inicial = self._marco_inicial(parametros, nombres)
+
+        def ejecutar(argumentos):
+            """Ejecuta el cuerpo con su registro de llamada y su marco"""
+            llamada = Llamada(nombre, argumentos)
+            pila.append(llamada)
+            contexto.entrar_scope('funcion', nombres, marco_inicial(argumentos))
+            try:
+                for sentencia in sentencias:
+                    if sentencia() is RETORNO:
+                        break
+            finally:
+                marcos.pop()
+                pila.pop()
+            return llamada.valor_retorno
+
+        if nombre in self._recursivas:
+            return self._compilar_recursiva(nombre, parametros, cuerpo_ctx, ejecutar)
+        return ejecutar
+
+    def _marcar_impura(self):
+        """Marca como impura la función que se está compilando"""
+        if self._pureza:
+            self._pureza[-1]['impura'] = True
+
+    def _resolver_puras(self):
+        """
+        Una función es pura si tiene una sola definición, su cuerpo no es
+        impuro y solo llama a funciones puras (punto fijo sobre las llamadas)
+        """
+        puras = {nombre for nombre, registros in self._registros.items()
+                 if len(registros) == 1 and not registros[0]['impura']}
+        cambio = True
+        while cambio:
+            cambio = False
+            for nombre in list(puras):
+                if not self._registros[nombre][0]['llamadas'] <= puras:
+                    puras.discard(nombre)
+                    cambio = True
+        self._puras.clear()
+        self._puras.update(puras)
+
+    def _marco_inicial(self, parametros, nombres):
+        """Función que arma los valores del marco de una llamada"""
+        relleno = [SIN_VALOR] * (len(nombres) - len(parametros))
+        if len(set(parametros)) == len(parametros):
+            return lambda argumentos: argumentos + relleno
+
+        def marco_con_repetidos(argumentos):
+            valores = [SIN_VALOR] * len(nombres)
+            for param, arg in zip(parametros, argumentos):
+                valores[nombres[param]] = arg
+            return valores
+        return marco_con_repetidos
+
+    def compilar_retorno(self, ctx:DSLParser.RetornoContext):
+        valor = self.compilar_expresion(ctx.expresion()) if ctx.expresion() else (lambda: None)
+
+        if not self.resolutor.en_funcion():
+            # 'return' fuera de una función: termina el programa
+            def retorno_programa():
+                valor()
+                return RETORNO
+            return retorno_programa
+
+        pila = self.contexto.call_stack
+
+        def retorno():
+            pila[-1].valor_retorno = valor()
+            return RETORNO
+        return retorno
+
+    def compilar_funcion_llamada(self, ctx:DSLParser.FuncionLlamadaContext):
+        nombre = ctx.ID().getText()
+        argumentos_c = []
+        if ctx.argumentos():
+            argumentos_c = [self.compilar_expresion(e) for e in ctx.argumentos().expresion()]
+        if nombre in NATIVAS:
+            return self.compilar_nativa(nombre, argumentos_c)
+        if self._pureza:
+            self._pureza[-1]['llamadas'].add(nombre)
+        funciones = self.contexto.funciones
+        visitor = self.visitor
+
+        def llamada():
+            funcion_info = funciones.get(nombre)
+            if funcion_info is None:
+                print(f"Error: Función '{nombre}' no definida")
+                return None
+            parametros = funcion_info['parametros']
+            argumentos = [a() for a in argumentos_c]
+
+            if len(argumentos) != len(parametros):
+                print(f"Error: Función '{nombre}' espera {len(parametros)} argumentos, se recibieron {len(argumentos)}")
+                return None
+
+            ejecutar = funcion_info['compilado']
+            if ejecutar is not None:
+                return ejecutar(argumentos)
+            return visitor.llamar_funcion(nombre, funcion_info, argumentos)
+        return llamada
+
+    def compilar_nativa(self, nombre, argumentos_c):
+        """Llamada directa a una función nativa (resuelta al compilar)"""
+        if not es_pura(nombre):
+            self._marcar_impura()
+        nativa = NATIVAS[nombre]
+
+        if len(argumentos_c) == 1:
+            a, = argumentos_c
+            return lambda: nativa(a())
+        if len(argumentos_c) == 2:
+            a, b = argumentos_c
+            return lambda: nativa(a(), b())
+        return lambda: nativa(*[a() for a in argumentos_c])
+
+    # --- Expresiones ---
+
+    def compilar_expresion(self, ctx:DSLParser.ExpresionContext):
+        # Literales (convertidos una sola vez)
+        if ctx.NUMERO():
+            valor = float(ctx.NUMERO().getText())
+            return lambda: valor
+        if ctx.STRING():
+            valor = ctx.STRING().getText()[1:-1]
+            return lambda: valor
+        if ctx.BOOLEAN():
+            valor = ctx.BOOLEAN().getText() == 'true' or ctx.BOOLEAN().getText() == 'True'
+            return lambda: valor
+        if ctx.ID():
+            return self.compilar_lectura(ctx.ID().getText())
+        if ctx.lista():
+            return self.compilar_lista(ctx.lista())
+        if ctx.matriz():
+            return self.compilar_matriz(ctx.matriz())
+        if ctx.diccionario():
+            return self.compilar_diccionario(ctx.diccionario())
+        if ctx.conjunto():
+            return self.compilar_conjunto(ctx.conjunto())
+        if ctx.funcionLlamada():
+            return self.compilar_funcion_llamada(ctx.funcionLlamada())
+        if type(ctx) is ExpresionInvariante:
+            return self.compilar_invariante(ctx)
+        return self._compilar_partes(self._partes_expresion(ctx))
+
+    def compilar_invariante(self, ctx:ExpresionInvariante):
+        """Invariante de un ciclo: el valor queda en el nodo hasta que el ciclo vuelve a empezar"""
+        calcular = self._compilar_partes(self._partes_expresion(ctx))
+
+        def invariante():
+            valor = ctx.valor
+            if valor is SIN_VALOR:
+                valor = calcular()
+                if type(valor) in ESCALARES:
+                    ctx.valor = valor
+            return valor
+        return invariante
+
+    def _compilar_partes(self, partes):
+        """Closure de una expresión compuesta a partir de _partes_expresion"""
+        if partes is None:
+            return lambda: None
+        hijos, combinar = partes
+        if combinar is _identidad:
+            return self.compilar_expresion(hijos[0])
+
+        compilados = [self.compilar_expresion(h) for h in hijos]
+        if len(compilados) == 1:
+            a, = compilados
+            return lambda: combinar(a())
+        if len(compilados) == 2:
+            a, b = compilados
+            return lambda: combinar(a(), b())
+        a, b, c = compilados
+        return lambda: combinar(a(), b(), c())
+
+    def _partes_expresion(self, ctx):
+        """
+        Descompone una expresión compuesta en (subexpresiones, combinar):
+        su valor es combinar(*valores de las subexpresiones)
+        """
+        if isinstance(ctx, DSLParser.ListaContext):
+            return ctx.expresion(), _como_lista
+        if isinstance(ctx, DSLParser.MatrizContext):
+            return ctx.lista(), _como_lista
+        if isinstance(ctx, DSLParser.DiccionarioContext):
+            return [e for par in ctx.par() for e in par.expresion()], _como_diccionario
+        if isinstance(ctx, DSLParser.ConjuntoContext):
+            return ctx.expresion(), _como_conjunto
+        if ctx.lista():
+            return [ctx.lista()], _identidad
+        if ctx.matriz():
+            return [ctx.matriz()], _identidad
+        if ctx.diccionario():
+            return [ctx.diccionario()], _identidad
+        if ctx.conjunto():
+            return [ctx.conjunto()], _identidad
+
+        n_hijos = ctx.getChildCount()
+
+        # Paréntesis
+        if n_hijos == 3 and ctx.getChild(0).getText() == '(':
+            return [ctx.expresion(0)], _identidad
+
+        # Operaciones unarias
+        if n_hijos == 2:
+            op = OPERADORES_UNARIOS.get(ctx.getChild(0).getText())
+            if op is not None:
+                return [ctx.expresion(0)], op
+
+        # Operaciones binarias
+        if n_hijos == 3:
+            op = OPERADORES_BINARIOS.get(ctx.getChild(1).getText())
+            if op is not None:
+                return ctx.expresion(), op
+
+        # Indexación de lista/matriz
+        if n_hijos == 4 and ctx.getChild(1).getText() == '[':
+            return ctx.expresion(), _indexar
+
+        # Slicing
+        if n_hijos == 6 and ctx.getChild(1).getText() == '[' and ctx.getChild(3).getText() == ':':
+            return ctx.expresion(), _rebanar
+
+        # Indexación matriz 2D
+        if n_hijos == 7:
+            return ctx.expresion(), _indexar_2d
+
+        return None
+
+    def _compilar_nodo(self, ctx):
+        """Compila una expresión, lista, matriz, diccionario o conjunto"""
+        if isinstance(ctx, DSLParser.ListaContext):
+            return self.compilar_lista(ctx)
+        if isinstance(ctx, DSLParser.MatrizContext):
+            return self.compilar_matriz(ctx)
+        if isinstance(ctx, DSLParser.DiccionarioContext):
+            return self.compilar_diccionario(ctx)
+        if isinstance(ctx, DSLParser.ConjuntoContext):
+            return self.compilar_conjunto(ctx)
+        return self.compilar_expresion(ctx)
+
+    def compilar_lista(self, ctx:DSLParser.ListaContext):
+        elementos = [self.compilar_expresion(e) for e in ctx.expresion()]
+        return lambda: [e() for e in elementos]
+
+    def compilar_matriz(self, ctx:DSLParser.MatrizContext):
+        filas = [self.compilar_lista(l) for l in ctx.lista()]
+        return lambda: [f() for f in filas]
+
+    def compilar_diccionario(self, ctx:DSLParser.DiccionarioContext):
+        pares = [(self.compilar_expresion(p.expresion(0)), self.compilar_expresion(p.expresion(1)))
+                 for p in ctx.par()]
+        return lambda: {clave(): valor() for clave, valor in pares}
+
+    def compilar_conjunto(self, ctx:DSLParser.ConjuntoContext):
+        elementos = [self.compilar_expresion(e) for e in ctx.expresion()]
+        return lambda: {e() for e in elementos}
+
+    def compilar_impresion(self, ctx:DSLParser.ImpresionContext):
+        valor = self.compilar_expresion(ctx.expresion())
+
+        self._marcar_impura()
+
+        if ctx.getChild(0).getText() == 'print':
+            return lambda: imprimir(valor())
+        return lambda: _mostrar(valor())
+
+    def compilar_liberacion(self, ctx:DSLParser.LiberacionContext):
+        nombres = [id_.getText() for id_ in ctx.ID()]
+        liberar = self.visitor.liberar
+        # Después del 'del' la global puede no existir
+        self.resolutor.globales.difference_update(nombres)
+
+        self._marcar_impura()
+
+        def liberacion():
+            for nombre in nombres:
+                liberar(nombre)
+        return liberacion
+
+    # --- Recursión en pila explícita ---
+
+    def _compilar_recursiva(self, nombre, parametros, cuerpo_ctx, ejecutar_nativo):
+        """
+        Compila la versión en modo pila de una función recursiva.
+        Las primeras llamadas usan la recursión nativa (más rápida); pasado
+        el límite de profundidad, la recursión sigue en ejecutar_en_pila
+        """
+        contexto = self.contexto
+        pila = contexto.call_stack
+        marcos = contexto.scopes_locales
+        ejecutar_en_pila = self.ejecutar_en_pila
+
+        nombres = self.resolutor.entrar_funcion(parametros)
+        try:
+            sentencias = self._compilar_sentencias_pila(cuerpo_ctx.sentencia())
+        finally:
+            self.resolutor.salir_funcion()
+        marco_inicial = self._marco_inicial(parametros, nombres)
+
+        def generador(argumentos):
+            llamada = Llamada(nombre, argumentos)
+            pila.append(llamada)
+            contexto.entrar_scope('funcion', nombres, marco_inicial(argumentos))
+            try:
+                for suspende, sentencia in sentencias:
+                    estado = (yield from sentencia()) if suspende else sentencia()
+                    if estado is RETORNO:
+                        break
+            finally:
+                marcos.pop()
+                pila.pop()
+            return llamada.valor_retorno
+
+        # Cada nivel nativo usa a lo sumo un frame por nivel del árbol
+        # (uno más por cada envoltura del perfilador o de las métricas)
+        frames = self._profundidad(cuerpo_ctx) + 2
+        frames *= 1 + (self.perfilador is not None) + (self.visitor.metricas is not None)
+        limite = max(1, PRESUPUESTO_FRAMES // frames)
+
+        def ejecutar(argumentos):
+            if len(pila) >= limite:
+                return ejecutar_en_pila(generador(argumentos))
+            return ejecutar_nativo(argumentos)
+        ejecutar.generador = generador
+        return ejecutar
+
+    def ejecutar_en_pila(self, generador):
+        """
+        Ejecuta una llamada en modo pila: cada llamada pendiente apila un
+        generador en una lista en lugar de anidar frames de Python, y una
+        llamada de cola reemplaza al generador del llamador
+        """
+        funciones = self.contexto.funciones
+        visitor = self.visitor
+        pila = [generador]
+        valor = None
+        error = None
+
+        while True:
+            actual = pila[-1]
+            try:
+                if error is None:
+                    pedido = actual.send(valor)
+                else:
+                    excepcion, error = error, None
+                    pedido = actual.throw(excepcion)
+            except StopIteration as fin:
+                pila.pop()
+                if not pila:
+                    return fin.value
+                valor = fin.value
+                continue
+            except BaseException as excepcion:
+                # La excepción sigue en el generador que hizo la llamada
+                pila.pop()
+                if not pila:
+                    raise
+                error = excepcion
+                continue
+
+            valor = None
+            nombre = pedido.nombre
+            argumentos = pedido.argumentos
+            funcion_info = funciones[nombre]
+            parametros = funcion_info['parametros']
+            if len(argumentos) != len(parametros):
+                print(f"Error: Función '{nombre}' espera {len(parametros)} argumentos, se recibieron {len(argumentos)}")
+                continue
+
+            if pedido.cola:
+                # El llamador ya no se necesita: su marco se libera ahora
+                pila.pop().close()
+
+            siguiente = getattr(funcion_info['compilado'], 'generador', None)
+            if siguiente is not None:
+                pila.append(siguiente(argumentos))
+                continue
+
+            try:
+                valor = visitor.llamar_funcion(nombre, funcion_info, argumentos)
+            except BaseException as excepcion:
+                if not pila:
+                    raise
+                error = excepcion
+            else:
+                if not pila:
+                    return valor
+
+    def _suspende(self, ctx):
+        """Verifica si un nodo contiene una llamada a una función recursiva"""
+        clave = id(ctx)
+        resultado = self._suspensiones.get(clave)
+        if resultado is None:
+            if isinstance(ctx, DSLParser.FuncionDefContext):
+                # Una función anidada se ejecuta con su propia llamada
+                resultado = False
+            elif isinstance(ctx, DSLParser.FuncionLlamadaContext) and ctx.ID().getText() in self._recursivas:
+                resultado = True
+            else:
+                resultado = any(self._suspende(ctx.getChild(i)) for i in range(ctx.getChildCount())
+                                if isinstance(ctx.getChild(i), ParserRuleContext))
+            self._suspensiones[clave] = resultado
+        return resultado
+
+    def _profundidad(self, ctx):
+        """Altura del subárbol (cota de frames de Python por llamada nativa)"""
+        hijos = [ctx.getChild(i) for i in range(ctx.getChildCount())]
+        return 1 + max((self._profundidad(h) for h in hijos if isinstance(h, ParserRuleContext)), default=0)
+
+    def _evaluador_pila(self, ctx):
+        """(True, generador) si el nodo suspende; si no, (False, closure)"""
+        if isinstance(ctx, DSLParser.BloqueContext):
+            if self._suspende(ctx):
+                return True, self.compilar_bloque_pila(ctx)
+            return False, self.compilar_bloque(ctx)
+        if self._suspende(ctx):
+            return True, self.compilar_expresion_pila(ctx)
+        return False, self._compilar_nodo(ctx)
+
+    def _compilar_sentencias_pila(self, sentencias):
+        """Por cada sentencia: (True, generador) si suspende, (False, closure) si no"""
+        resultado = []
+        for s in sentencias:
+            generador = self.compilar_sentencia_pila(s)
+            if generador is None:
+                resultado.append((False, self.compilar_sentencia(s)))
+            else:
+                resultado.append((True, generador))
+        return resultado
+
+    def compilar_sentencia_pila(self, ctx):
+        """Compila una sentencia en modo pila; None si nunca suspende"""
+        hijo = ctx.getChild(0)
+        compilar = self._sentencias_pila.get(type(hijo))
+        if compilar is None or not self._suspende(hijo):
+            return None
+        return compilar(hijo)
+
+    def compilar_bloque_pila(self, ctx:DSLParser.BloqueContext):
+        contexto = self.contexto
+
+        if not self.resolutor.necesita_marco(ctx):
+            sentencias = self._compilar_sentencias_pila(ctx.sentencia())
+
+            def bloque_sin_marco_pila():
+                for suspende, sentencia in sentencias:
+                    estado = (yield from sentencia()) if suspende else sentencia()
+                    if estado is RETORNO:
+                        return RETORNO
+            return bloque_sin_marco_pila
+
+        nombres = self.resolutor.entrar_marco()
+        try:
+            sentencias = self._compilar_sentencias_pila(ctx.sentencia())
+        finally:
+            self.resolutor.salir_marco()
+
+        def bloque_pila():
+            contexto.entrar_scope('bloque', nombres)
+            try:
+                for suspende, sentencia in sentencias:
+                    estado = (yield from sentencia()) if suspende else sentencia()
+                    if estado is RETORNO:
+                        return RETORNO
+            finally:
+                contexto.salir_scope()
+        return bloque_pila
+
+    def compilar_declaracion_pila(self, ctx:DSLParser.DeclaracionContext):
+        valor = self.compilar_expresion_pila(ctx.expresion())
+        escribir = self._escritura_declaracion(ctx)
+
+        def declaracion_pila():
+            escribir((yield from valor()))
+        return declaracion_pila
+
+    def compilar_asignacion_pila(self, ctx:DSLParser.AsignacionContext):
+        evaluadores, accion = self._partes_asignacion(ctx, self._evaluador_pila)
+
+        def asignacion_pila():
+            valores = []
+            for suspende, evaluar in evaluadores:
+                valores.append((yield from evaluar()) if suspende else evaluar())
+            accion(*valores)
+        return asignacion_pila
+
+    def compilar_condicional_pila(self, ctx:DSLParser.CondicionalContext):
+        ramas = []
+        otro = None
+        expr_idx = 0
+        bloque_idx = 0
+        for i in range(ctx.getChildCount()):
+            texto = ctx.getChild(i).getText()
+            if texto == 'if' or texto == 'elif':
+                ramas.append((self._evaluador_pila(ctx.expresion(expr_idx)),
+                              self._evaluador_pila(ctx.bloque(bloque_idx))))
+                expr_idx += 1
+                bloque_idx += 1
+            elif texto == 'else':
+                otro = self._evaluador_pila(ctx.bloque(bloque_idx))
+
+        def condicional_pila():
+            for (suspende_c, condicion), (suspende_b, bloque) in ramas:
+                if ((yield from condicion()) if suspende_c else condicion()):
+                    return (yield from bloque()) if suspende_b else bloque()
+            if otro is not None:
+                suspende, bloque = otro
+                return (yield from bloque()) if suspende else bloque()
+        return condicional_pila
+
+    def compilar_ciclo_for_pila(self, ctx:DSLParser.CicloForContext):
+        nombre_var = ctx.ID().getText()
+        contexto = self.contexto
+        marcos = contexto.scopes_locales
+        evaluadores = [self._evaluador_pila(e) for e in ctx.expresion()]
+        es_rango = ctx.getChild(3).getText() == 'range'
+
+        nombres = self.resolutor.entrar_marco([nombre_var])
+        try:
+            nombres_cuerpo, sentencias = self._compilar_cuerpo_ciclo(ctx.bloque(), self._compilar_sentencias_pila)
+        finally:
+            self.resolutor.salir_marco()
+
+        def ciclo_for_pila():
+            limites = []
+            for suspende, evaluar in evaluadores:
+                limites.append((yield from evaluar()) if suspende else evaluar())
+            valores = _rango(*limites) if es_rango else limites[0]
+            contexto.entrar_scope('ciclo', nombres)
+            try:
+                slots = marcos[-1].valores
+                slots[0] = 0
+                if nombres_cuerpo is None:
+                    for val in valores:
+                        slots[0] = val
+                        for suspende, sentencia in sentencias:
+                            estado = (yield from sentencia()) if suspende else sentencia()
+                            if estado is RETORNO:
+                                return RETORNO
+                    return
+
+                # Un solo marco para el cuerpo, como en compilar_ciclo_for
+                contexto.entrar_scope('bloque', nombres_cuerpo)
+                marco = marcos[-1]
+                try:
+                    for val in valores:
+                        slots[0] = val
+                        for suspende, sentencia in sentencias:
+                            estado = (yield from sentencia()) if suspende else sentencia()
+                            if estado is RETORNO:
+                                return RETORNO
+                        marco.limpiar()
+                finally:
+                    contexto.salir_scope()
+            finally:
+                contexto.salir_scope()
+        return ciclo_for_pila
+
+    def compilar_ciclo_while_pila(self, ctx:DSLParser.CicloWhileContext):
+        contexto = self.contexto
+        marcos = contexto.scopes_locales
+        suspende_c, condicion = self._evaluador_pila(ctx.expresion())
+        nombres_cuerpo, sentencias = self._compilar_cuerpo_ciclo(ctx.bloque(), self._compilar_sentencias_pila)
+
+        def ciclo_while_pila():
+            if nombres_cuerpo is None:
+                while ((yield from condicion()) if suspende_c else condicion()):
+                    for suspende, sentencia in sentencias:
+                        estado = (yield from sentencia()) if suspende else sentencia()
+                        if estado is RETORNO:
+                            return RETORNO
+                return
+
+            # Como en compilar_ciclo_while: un marco que vuelve a la pila en cada iteración
+            contexto.entrar_scope('bloque', nombres_cuerpo)
+            marco = marcos.pop()
+            while ((yield from condicion()) if suspende_c else condicion()):
+                marcos.append(marco)
+                try:
+                    for suspende, sentencia in sentencias:
+                        estado = (yield from sentencia()) if suspende else sentencia()
+                        if estado is RETORNO:
+                            return RETORNO
+                finally:
+                    marcos.pop()
+                marco.limpiar()
+        return ciclo_while_pila
+
+    def compilar_retorno_pila(self, ctx:DSLParser.RetornoContext):
+        pila = self.contexto.call_stack
+        expresion = ctx.expresion()
+
+        if expresion.funcionLlamada():
+            # Llamada en posición de cola: reemplaza a la llamada actual
+            valor = self.compilar_llamada_pila(expresion.funcionLlamada(), cola=True)
+        else:
+            valor = self.compilar_expresion_pila(expresion)
+
+        def retorno_pila():
+            v = yield from valor()
+            pila[-1].valor_retorno = v
+            return RETORNO
+        return retorno_pila
+
+    def compilar_impresion_pila(self, ctx:DSLParser.ImpresionContext):
+        valor = self.compilar_expresion_pila(ctx.expresion())
+        mostrar = imprimir if ctx.getChild(0).getText() == 'print' else _mostrar
+        self._marcar_impura()
+
+        def impresion_pila():
+            mostrar((yield from valor()))
+        return impresion_pila
+
+    def compilar_expresion_pila(self, ctx):
+        """Generador que evalúa una expresión con llamadas recursivas"""
+        if isinstance(ctx, DSLParser.ExpresionContext) and ctx.funcionLlamada():
+            return self.compilar_llamada_pila(ctx.funcionLlamada())
+
+        hijos, combinar = self._partes_expresion(ctx)
+        evaluadores = [self._evaluador_pila(h) for h in hijos]
+
+        def expresion_pila():
+            valores = []
+            for suspende, evaluar in evaluadores:
+                valores.append((yield from evaluar()) if suspende else evaluar())
+            return combinar(*valores)
+        return expresion_pila
+
+    def compilar_llamada_pila(self, ctx:DSLParser.FuncionLlamadaContext, cola=False):
+        nombre = ctx.ID().getText()
+        evaluadores = []
+        if ctx.argumentos():
+            evaluadores = [self._evaluador_pila(e) for e in ctx.argumentos().expresion()]
+        if nombre in NATIVAS:
+            return self._compilar_nativa_pila(nombre, evaluadores)
+        if self._pureza:
+            self._pureza[-1]['llamadas'].add(nombre)
+        funciones = self.contexto.funciones
+
+        def llamada_pila():
+            if nombre not in funciones:
+                print(f"Error: Función '{nombre}' no definida")
+                return None
+            argumentos = []
+            for suspende, evaluar in evaluadores:
+                argumentos.append((yield from evaluar()) if suspende else evaluar())
+            # ejecutar_en_pila resuelve la llamada y envía su resultado
+            return (yield LlamadaPendiente(nombre, argumentos, cola))
+        return llamada_pila
+
+    def _compilar_nativa_pila(self, nombre, evaluadores):
+        # Los argumentos pueden suspender; la nativa se llama directo
+        if not es_pura(nombre):
+            self._marcar_impura()
+        nativa = NATIVAS[nombre]
+
+        def nativa_pila():
+            argumentos = []
+            for suspende, evaluar in evaluadores:
+                argumentos.append((yield from evaluar()) if suspende else evaluar())
+            return nativa(*argumentos)
+        return nativa_pila
@@ -1,3 +1,128 @@
+import sys
+from collections import OrderedDict
+from librerias.Nativas import NATIVAS
+from librerias.Tareas import Futuro, resolver
+
+# Marca de un slot reservado que todavía no tiene valor
+SIN_VALOR = object()
+
+
+class Marco:
+    """
+    Scope local respaldado por una lista de tamaño fijo:
+    - nombres: diccionario nombre -> slot (compartido entre todos los marcos
+      del mismo bloque cuando viene del compilador)
+    - valores: un slot por variable (SIN_VALOR si aún no se definió)
+    Conserva la interfaz de diccionario para las búsquedas por nombre
+    """
+    __slots__ = ('nombres', 'valores', 'tipo', '_propio')
+
+    def __init__(self, tipo='bloque', nombres=None, valores=None):
+        self.tipo = tipo
+        self._propio = nombres is None
+        self.nombres = {} if nombres is None else nombres
+        self.valores = valores if valores is not None else [SIN_VALOR] * len(self.nombres)
+
+    def __contains__(self, nombre):
+        slot = self.nombres.get(nombre)
+        return slot is not None and self.valores[slot] is not SIN_VALOR
+
+    def __getitem__(self, nombre):
+        slot = self.nombres.get(nombre)
+        if slot is None or self.valores[slot] is SIN_VALOR:
+            raise KeyError(nombre)
+        return self.valores[slot]
+
+    def __setitem__(self, nombre, valor):
+        slot = self.nombres.get(nombre)
+        if slot is None:
+            # Variable no prevista: copiar el layout antes de extenderlo
+            if not self._propio:
+                self.nombres = dict(self.nombres)
+                self._propio = True
+            slot = len(self.valores)
+            self.nombres[nombre] = slot
+            self.valores.append(SIN_VALOR)
+        self.valores[slot] = valor
+
+    def __len__(self):
+        return sum(1 for v in self.valores if v is not SIN_VALOR)
+
+    def items(self):
+        """Pares (nombre, valor) de las variables definidas"""
+        return [(n, self.valores[s]) for n, s in self.nombres.items()
+                if self.valores[s] is not SIN_VALOR]
+
+    def copy(self):
+        """Copia como diccionario"""
+        return dict(self.items())
+
+    def limpiar(self):
+        """Deja todos los slots sin valor (para reutilizar el marco)"""
+        valores = self.valores
+        for i in range(len(valores)):
+            valores[i] = SIN_VALOR
+
+
+class Llamada:
+    """Registro ligero de una llamada a función en el call stack"""
+    __slots__ = ('funcion', 'argumentos', 'valor_retorno')
+
+    def __init__(self, funcion, argumentos):
+        self.funcion = funcion
+        self.argumentos = argumentos
+        self.valor_retorno = None
+
+
+class Globales(dict):
+    """Scope global: leer una variable inexistente es un NameError del DSL"""
+
+    def __missing__(self, nombre):
+        raise NameError(f"Variable '{nombre}' no está definida")
+
+
+class CacheLRU:
+    """
+    Caché acotada que descarta la entrada usada hace más tiempo;
+    cuenta aciertos y fallos
+    """
+    __slots__ = ('tamano', 'datos', 'aciertos', 'fallos')
+
+    def __init__(self, tamano=1024):
+        self.tamano = tamano
+        self.datos = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        """Retorna el valor guardado o SIN_VALOR"""
+        valor = self.datos.get(clave, SIN_VALOR)
+        if valor is SIN_VALOR:
+            self.fallos += 1
+        else:
+            self.aciertos += 1
+            self.datos.move_to_end(clave)
+        return valor
+
+    def guardar(self, clave, valor):
+        self.datos[clave] = valor
+        self.datos.move_to_end(clave)
+        if len(self.datos) > self.tamano:
+            self.datos.popitem(last=False)
+
+    def limpiar(self):
+        self.datos.clear()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __str__(self):
+        return f"{len(self.datos)}/{self.tamano} entradas, {self.aciertos} aciertos, {self.fallos} fallos"
+
+
+# Funciones del usuario con nombre de nativa ya avisadas (una vez por proceso)
+_avisadas = set()
+
+
 class Contexto:
     """
     Gestión de contexto de ejecución con scope completo:
@@ -8,9 +133,9 @@ class Contexto:
     
     def __init__(self):
         # Scope global (siempre presente)
-        self.scope_global = {}
+        self.scope_global = Globales()
         
-        # Pila de scopes locales (cada elemento es un diccionario)
+        # Pila de scopes locales (cada elemento es un Marco)
         # Cada función, bloque, ciclo tiene su propio scope
         self.scopes_locales = []
         
@@ -19,9 +144,9 @@ class Contexto:
         
         # Pila de llamadas (para debugging y recursión)
         self.call_stack = []
-        
-        # Registro de tipos de scope (para debugging)
-        self.tipos_scope = []  # 'funcion', 'ciclo', 'condicional', 'bloque'
+
+        # Entradas de la caché LRU de cada función pura (0 la desactiva)
+        self.tamano_cache = 1024
     
     # gestion de variables globales
 
@@ -99,13 +224,22 @@ class Contexto:
         4. Si no existe, lanza error
         """
         # Buscar en scopes locales (del más interno al más externo)
-        for scope in reversed(self.scopes_locales):
-            if nombre in scope:
-                return scope[nombre]
+        for marco in reversed(self.scopes_locales):
+            slot = marco.nombres.get(nombre)
+            if slot is not None:
+                valor = marco.valores[slot]
+                if valor is not SIN_VALOR:
+                    # Variable de un 'spawn': se espera el resultado
+                    if type(valor) is Futuro:
+                        return valor.resultado()
+                    return valor
         
         # Buscar en scope global
         if nombre in self.scope_global:
-            return self.scope_global[nombre]
+            valor = self.scope_global[nombre]
+            if type(valor) is Futuro:
+                return valor.resultado()
+            return valor
         
         # No encontrada
         raise NameError(f"Variable '{nombre}' no está definida")
@@ -128,9 +262,10 @@ class Contexto:
         - Si no existe en ningún lado, la crea en el scope actual
         """
         # Buscar en scopes locales (del más interno al más externo)
-        for scope in reversed(self.scopes_locales):
-            if nombre in scope:
-                scope[nombre] = valor
+        for marco in reversed(self.scopes_locales):
+            slot = marco.nombres.get(nombre)
+            if slot is not None and marco.valores[slot] is not SIN_VALOR:
+                marco.valores[slot] = valor
                 return
         
         # Buscar en scope global
@@ -141,6 +276,26 @@ class Contexto:
         # Si no existe, crearla en el scope actual
         self.definir_variable(nombre, valor)
     
+    def operar_variable(self, nombre, operar, valor):
+        """
+        Asignación compuesta (x += v): busca la variable una sola vez y
+        escribe operar(actual, valor); si no existe, lanza error. Si tiene
+        el Futuro de un 'spawn', opera sobre su resultado
+        """
+        for marco in reversed(self.scopes_locales):
+            slot = marco.nombres.get(nombre)
+            if slot is not None:
+                actual = marco.valores[slot]
+                if actual is not SIN_VALOR:
+                    marco.valores[slot] = actual = operar(resolver(actual), valor)
+                    return actual
+
+        if nombre in self.scope_global:
+            self.scope_global[nombre] = actual = operar(resolver(self.scope_global[nombre]), valor)
+            return actual
+
+        raise NameError(f"Variable '{nombre}' no está definida")
+
     def forzar_global(self, nombre, valor):
         """
         Declara explícitamente una variable como global
@@ -148,21 +303,40 @@ class Contexto:
         """
         self.scope_global[nombre] = valor
 
+    def eliminar_variable(self, nombre):
+        """
+        Quita la variable del scope más interno que la tiene (en un marco,
+        su slot queda sin valor); retorna False si no existe
+        """
+        for marco in reversed(self.scopes_locales):
+            slot = marco.nombres.get(nombre)
+            if slot is not None and marco.valores[slot] is not SIN_VALOR:
+                marco.valores[slot] = SIN_VALOR
+                return True
+        return self.scope_global.pop(nombre, SIN_VALOR) is not SIN_VALOR
+
     # gestion de scopes
     
-    def entrar_scope(self, tipo='bloque'):
+    def entrar_scope(self, tipo='bloque', nombres=None, valores=None):
         """
         Crea un nuevo scope local
         tipo: 'funcion', 'ciclo', 'condicional', 'bloque'
+        nombres: layout nombre -> slot resuelto por el compilador (opcional)
+        valores: valores iniciales de los slots (opcional)
         """
-        self.scopes_locales.append({})
-        self.tipos_scope.append(tipo)
+        self.scopes_locales.append(Marco(tipo, nombres, valores))
     
+    def vaciar_scope(self):
+        """
+        Vacía el scope actual en lugar de crear otro: los ciclos usan un
+        solo scope para el cuerpo en todas sus iteraciones
+        """
+        self.scopes_locales[-1].limpiar()
+
     def salir_scope(self):
         """Sale del scope local actual"""
         if len(self.scopes_locales) > 0:
             self.scopes_locales.pop()
-            self.tipos_scope.pop()
         else:
             raise RuntimeError("No se puede salir del scope global")
     
@@ -174,8 +348,8 @@ class Contexto:
     
     def obtener_tipo_scope_actual(self):
         """Retorna el tipo del scope actual"""
-        if len(self.tipos_scope) > 0:
-            return self.tipos_scope[-1]
+        if len(self.scopes_locales) > 0:
+            return self.scopes_locales[-1].tipo
         return 'global'
     
     def nivel_scope(self):
@@ -188,18 +362,50 @@ class Contexto:
     
     # gestion de funciones
     
-    def definir_funcion(self, nombre, parametros, cuerpo_ctx):
+    def definir_funcion(self, nombre, parametros, cuerpo_ctx, compilado=None, cache=None, llamadas=()):
         """
         Define una función
         parametros: lista de nombres de parámetros
         cuerpo_ctx: contexto de ANTLR con el cuerpo de la función
+        compilado: cuerpo ya compilado a closure (opcional)
+        cache: CacheLRU de resultados si la función es pura (opcional)
+        llamadas: funciones del usuario que llama (para invalidar su caché)
         """
+        if nombre in NATIVAS and nombre not in _avisadas:
+            # Las llamadas buscan primero las nativas: esta definición no se usa
+            _avisadas.add(nombre)
+            print(f"Advertencia: la función '{nombre}' tiene el nombre de una nativa; "
+                  f"las llamadas a '{nombre}' usan la nativa", file=sys.stderr)
+        if nombre in self.funciones:
+            self.invalidar_dependientes(nombre)
         self.funciones[nombre] = {
             'parametros': parametros,
             'cuerpo': cuerpo_ctx,
+            'compilado': compilado,
             'nombre': nombre,
-            'es_recursiva': False
+            'es_recursiva': False,
+            'cache': cache,
+            'llamadas': llamadas
         }
+
+    def invalidar_dependientes(self, nombre):
+        """
+        Al redefinir 'nombre', las funciones que la llaman (directa o
+        indirectamente) vacían su caché y no guardan más resultados: su
+        pureza se decidió con la definición anterior
+        """
+        pendientes = [nombre]
+        vistas = {nombre}
+        while pendientes:
+            llamada = pendientes.pop()
+            for info in self.funciones.values():
+                if llamada in info['llamadas'] and info['nombre'] not in vistas:
+                    vistas.add(info['nombre'])
+                    pendientes.append(info['nombre'])
+                    cache = info['cache']
+                    if cache is not None:
+                        cache.limpiar()
+                        cache.tamano = 0
     
     def obtener_funcion(self, nombre):
         """Obtiene la definición de una función"""
@@ -219,12 +425,10 @@ class Contexto:
     # gestión de llamadas
     
     def entrar_llamada(self, nombre_funcion, argumentos):
-        """Registra una llamada a función"""
-        self.call_stack.append({
-            'funcion': nombre_funcion,
-            'argumentos': argumentos,
-            'variables_locales': {}
-        })
+        """Registra una llamada a función y retorna su registro"""
+        llamada = Llamada(nombre_funcion, argumentos)
+        self.call_stack.append(llamada)
+        return llamada
     
     def salir_llamada(self):
         """Sale de una llamada a función"""
@@ -248,7 +452,7 @@ class Contexto:
         if len(self.call_stack) == 0:
             print("  (vacío)")
         for i, llamada in enumerate(self.call_stack):
-            print(f"  {i}: {llamada['funcion']}({llamada['argumentos']})")
+            print(f"  {i}: {llamada.funcion}({llamada.argumentos})")
         print()
     
     # tutoriales de debugg
@@ -272,8 +476,8 @@ class Contexto:
         # Variables locales
         if len(self.scopes_locales) > 0:
             print("\nSCOPES LOCALES:")
-            for i, (scope, tipo) in enumerate(zip(self.scopes_locales, self.tipos_scope)):
-                print(f"\n  Nivel {i+1} ({tipo}):")
+            for i, scope in enumerate(self.scopes_locales):
+                print(f"\n  Nivel {i+1} ({scope.tipo}):")
                 if len(scope) == 0:
                     print("    (vacío)")
                 for nombre, valor in scope.items():
@@ -293,7 +497,8 @@ class Contexto:
         for nombre, info in self.funciones.items():
             params = ', '.join(info['parametros'])
             recursiva = " [RECURSIVA]" if info['es_recursiva'] else ""
-            print(f"  {nombre}({params}){recursiva}")
+            pura = f" [PURA: {info['cache']}]" if info.get('cache') is not None else ""
+            print(f"  {nombre}({params}){recursiva}{pura}")
         print()
     
     def mostrar_estado_completo(self):
@@ -342,17 +547,16 @@ class Contexto:
     
     def limpiar(self):
         """Limpia todo el contexto (mantiene solo scope global vacío)"""
-        self.scope_global = {}
-        self.scopes_locales = []
-        self.funciones = {}
-        self.call_stack = []
-        self.tipos_scope = []
+        # Se vacían en el lugar: el código compilado guarda referencias
+        self.scope_global.clear()
+        self.scopes_locales.clear()
+        self.funciones.clear()
+        self.call_stack.clear()
     
     def limpiar_locales(self):
         """Limpia solo los scopes locales, mantiene globales"""
-        self.scopes_locales = []
-        self.tipos_scope = []
-        self.call_stack = []
+        self.scopes_locales.clear()
+        self.call_stack.clear()
     
     def exportar_estado(self):
         """Exporta el estado actual del contexto"""
@@ -513,13 +717,16 @@ class GestorModelos:
         """Obtiene un modelo guardado"""
         if nombre not in self.modelos:
             raise KeyError(f"Modelo '{nombre}' no existe")
-        return self.modelos[nombre]['modelo']
+        return self.obtener_info_modelo(nombre)['modelo']
     
     def obtener_info_modelo(self, nombre):
         """Obtiene información completa de un modelo"""
         if nombre not in self.modelos:
             raise KeyError(f"Modelo '{nombre}' no existe")
-        return self.modelos[nombre]
+        info = self.modelos[nombre]
+        # Modelo lanzado con 'spawn': se guarda ya entrenado
+        info['modelo'] = resolver(info['modelo'])
+        return info
     
     def listar_modelos(self):
         """Lista todos los modelos guardados"""
@@ -0,0 +1,188 @@
+import math
+from librerias.Aritmetica import Aritmetica
+from librerias.Matrices import Matrices
+from librerias.Texto import ConstructorTexto, como_texto, unir, formatear
+from librerias.Vistas import LISTAS, desprender
+from librerias.Vectores import SECUENCIAS, crear_vector, vectorizar
+
+# Funciones nativas del DSL: nombre -> función de Python.
+# Una llamada las busca antes que las funciones del usuario
+NATIVAS = {}
+
+# Nativas con efectos (imprimen, modifican sus argumentos...): una función
+# del usuario que las llama no se memoiza
+IMPURAS = set()
+
+
+def registrar(nombre, funcion=None, pura=True):
+    """
+    Registra 'funcion' como nativa con 'nombre'; recibe los argumentos
+    ya evaluados y retorna el valor de la llamada. Sin 'funcion' se usa
+    como decorador:
+
+        @registrar('doble')
+        def doble(x):
+            return 2 * x
+    """
+    def agregar(funcion):
+        NATIVAS[nombre] = funcion
+        if pura:
+            IMPURAS.discard(nombre)
+        else:
+            IMPURAS.add(nombre)
+        return funcion
+
+    if funcion is None:
+        return agregar
+    return agregar(funcion)
+
+
+def es_pura(nombre):
+    return nombre not in IMPURAS
+
+
+# --- Longitud y agregaciones ---
+
+def _valores(argumentos):
+    # min(lista) o min(a, b, ...)
+    if len(argumentos) == 1 and isinstance(argumentos[0], SECUENCIAS):
+        return argumentos[0]
+    return argumentos
+
+def longitud(x):
+    # Los números del DSL son float
+    return float(len(x))
+
+def suma(lista):
+    return sum(lista, 0.0)
+
+def minimo(*argumentos):
+    return min(_valores(argumentos))
+
+def maximo(*argumentos):
+    return max(_valores(argumentos))
+
+def promedio(lista):
+    return sum(lista, 0.0) / len(lista)
+
+
+# --- Construcción de listas ---
+
+def _lleno(valor, filas, columnas=None):
+    if columnas is None:
+        return [valor] * int(filas)
+    return [[valor] * int(columnas) for _ in range(int(filas))]
+
+def ceros(filas, columnas=None):
+    return _lleno(0.0, filas, columnas)
+
+def unos(filas, columnas=None):
+    return _lleno(1.0, filas, columnas)
+
+def rango(inicio, fin=None, paso=1.0):
+    """arange: como range, con paso decimal"""
+    if fin is None:
+        inicio, fin = 0.0, inicio
+    if paso == 0:
+        raise ValueError("arange: el paso no puede ser 0")
+    n = max(0, math.ceil((fin - inicio) / paso))
+    return [inicio + i * paso for i in range(n)]
+
+
+# --- Listas que crecen en el lugar (sin reconstruirlas con '+') ---
+
+def _lista(nombre, lista):
+    # Lista (o vista) a punto de modificarse en el lugar
+    if not isinstance(lista, LISTAS):
+        raise TypeError(f"{nombre}: se esperaba una lista, se recibió {type(lista).__name__}")
+    desprender(lista)
+    return lista
+
+# append/extend también agregan a un ConstructorTexto (builder())
+
+def agregar(lista, valor):
+    if isinstance(lista, ConstructorTexto):
+        lista.agregar(valor)
+        return
+    _lista('append', lista).append(valor)
+
+def extender(lista, otra):
+    if isinstance(lista, ConstructorTexto):
+        lista.extender(otra)
+        return
+    _lista('extend', lista).extend(otra)
+
+def quitar(lista, indice=-1):
+    """pop: retorna el elemento quitado (por defecto el último)"""
+    return _lista('pop', lista).pop(int(indice))
+
+def insertar(lista, indice, valor):
+    _lista('insert', lista).insert(int(indice), valor)
+
+def como_lista(valores):
+    """tolist(v): lista con los valores de un vector (o de cualquier secuencia)"""
+    return list(valores)
+
+def crear_lista(n=0, relleno=0.0):
+    """list(n, relleno): lista preasignada de n elementos"""
+    if isinstance(relleno, LISTAS):
+        # Cada elemento es una copia (no la misma lista n veces)
+        return [list(relleno) for _ in range(int(n))]
+    return [relleno] * int(n)
+
+
+for _nombre, _funcion in {
+    'len': longitud,
+    'sum': suma,
+    'min': minimo,
+    'max': maximo,
+    'mean': promedio,
+    'abs': abs,
+    'sqrt': vectorizar(math.sqrt),
+    'zeros': ceros,
+    'ones': unos,
+    'arange': rango,
+    # Texto
+    'builder': ConstructorTexto,
+    'str': como_texto,
+    'join': unir,
+    'format': formatear,
+    # Vectores
+    'vector': crear_vector,
+    'tolist': como_lista,
+    'any': any,
+    'all': all,
+    # Aritmetica (con un vector se aplican a cada elemento). factorial no:
+    # es recursiva en Python y retorna enteros; se escribe en el DSL
+    'raiz': vectorizar(Aritmetica.raiz),
+    'logaritmo': Aritmetica.logaritmo,
+    'ln': vectorizar(Aritmetica.ln),
+    'redondear': vectorizar(Aritmetica.redondear),
+    'truncar': vectorizar(Aritmetica.truncar),
+    'seno': vectorizar(Aritmetica.seno),
+    'coseno': vectorizar(Aritmetica.coseno),
+    'tangente': vectorizar(Aritmetica.tangente),
+    'cotangente': vectorizar(Aritmetica.cotangente),
+    'secante': vectorizar(Aritmetica.secante),
+    'cosecante': vectorizar(Aritmetica.cosecante),
+    # Matrices
+    'sumar_matrices': Matrices.sumar_matrices,
+    'restar_matrices': Matrices.resta_matrices,
+    'multiplicar_escalar': Matrices.multiplicar_escalar,
+    'multiplicar_matrices': Matrices.multiplicar_matrices,
+    'transpuesta': Matrices.transpuesta,
+    'inversa': Matrices.inversa,
+}.items():
+    registrar(_nombre, _funcion)
+
+registrar('list', crear_lista)
+
+# Modifican la lista que reciben
+for _nombre, _funcion in {
+    'append': agregar,
+    'extend': extender,
+    'pop': quitar,
+    'insert': insertar,
+    'mostrar_matriz': Matrices.mostrar_matriz,
+}.items():
+    registrar(_nombre, _funcion, pura=False)
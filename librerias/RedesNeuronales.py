@@ -1,5 +1,6 @@
 from librerias.Matrices import Matrices
 from librerias.Aritmetica import Aritmetica
+from librerias.Vectores import SECUENCIAS
 
 class RedesNeuronales:
     """
@@ -187,7 +188,7 @@ class RedesNeuronales:
             
             for muestra_idx in range(n_muestras):
                 entrada = X[muestra_idx]
-                objetivo = y[muestra_idx] if isinstance(y[muestra_idx], list) else [y[muestra_idx]]
+                objetivo = y[muestra_idx] if isinstance(y[muestra_idx], SECUENCIAS) else [y[muestra_idx]]
                 
                 # Forward pass
                 resultado = RedesNeuronales.forward_mlp(red, entrada)
@@ -0,0 +1,101 @@
+import contextlib
+import io
+import pickle
+import sys
+from concurrent.futures import Future, ProcessPoolExecutor
+
+# Pool de procesos compartido (se crea con el primer 'spawn', un proceso por núcleo)
+_pool = None
+
+# Marca de un Futuro cuyo resultado todavía no se leyó
+_PENDIENTE = object()
+
+# True en los procesos del pool: heredan (fork) el _pool del intérprete,
+# que no sirve ahí; un 'spawn' o 'pfor' dentro de ellos corre en el lugar.
+# También en los procesos de lote.py, que ya ocupan todos los núcleos
+_en_pool = False
+
+
+def sin_pool():
+    """Hace que 'spawn' y 'pfor' corran en el lugar en este proceso"""
+    global _en_pool
+    _en_pool = True
+
+
+def en_proceso_del_pool():
+    return _en_pool
+
+
+def pool_procesos():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(initializer=sin_pool)
+    return _pool
+
+
+def _ejecutar(datos):
+    # En el proceso del pool: la salida (p. ej. el progreso de train) se
+    # guarda y se imprime en el intérprete al resolver el Futuro
+    funcion, argumentos, opciones = pickle.loads(datos)
+    salida = io.StringIO()
+    with contextlib.redirect_stdout(salida):
+        valor = funcion(*argumentos, **opciones)
+    return valor, salida.getvalue()
+
+
+class Futuro:
+    """
+    Resultado de una operación lanzada con 'spawn'. La variable destino
+    queda con el Futuro hasta que se lee (o se espera con 'await'): ahí
+    se bloquea hasta que la operación termina. Con imprimir=False la
+    salida queda en 'salida' (la escribe quien la ordena)
+    """
+    __slots__ = ('_futuro', '_valor', 'imprimir', 'salida')
+
+    def __init__(self, futuro):
+        self._futuro = futuro
+        self._valor = _PENDIENTE
+        self.imprimir = True
+        self.salida = ''
+
+    def listo(self):
+        return self._valor is not _PENDIENTE or self._futuro.done()
+
+    def resultado(self):
+        """Espera la operación; su salida se imprime una sola vez"""
+        if self._valor is _PENDIENTE:
+            valor, self.salida = self._futuro.result()
+            if self.imprimir and self.salida:
+                sys.stdout.write(self.salida)
+            self._valor = valor
+        return self._valor
+
+    def __repr__(self):
+        if self._valor is _PENDIENTE:
+            return "<futuro pendiente>"
+        return repr(self._valor)
+
+
+def lanzar(funcion, *argumentos, **opciones):
+    """
+    Ejecuta funcion(*argumentos, **opciones) en el pool y retorna un
+    Futuro. Los argumentos se serializan acá: modificarlos después no
+    cambia lo que recibe la operación
+    """
+    datos = pickle.dumps((funcion, argumentos, opciones))
+    if _en_pool:
+        # Ya en un proceso del pool: se ejecuta acá; un error se ve al leerlo
+        futuro = Future()
+        try:
+            futuro.set_result(_ejecutar(datos))
+        except Exception as error:
+            futuro.set_exception(error)
+        return Futuro(futuro)
+    return Futuro(pool_procesos().submit(_ejecutar, datos))
+
+
+def resolver(valor):
+    """El valor, esperando el resultado si es un Futuro"""
+    if type(valor) is Futuro:
+        return valor.resultado()
+    return valor
@@ -0,0 +1,80 @@
+import sys
+from librerias.Vistas import LISTAS
+
+# Listas con más elementos que esto se imprimen por bloques
+TAMANO_BLOQUE = 4096
+
+
+class ConstructorTexto:
+    """
+    Texto que se arma por partes (append) sin copiar lo ya escrito en
+    cada concatenación: las partes se unen una sola vez, al leerlo
+    """
+    __slots__ = ('partes', 'longitud')
+
+    def __init__(self, inicial=''):
+        self.partes = [inicial] if inicial else []
+        self.longitud = len(inicial)
+
+    def agregar(self, valor):
+        texto = valor if isinstance(valor, str) else str(valor)
+        self.partes.append(texto)
+        self.longitud += len(texto)
+
+    def extender(self, valores):
+        for valor in valores:
+            self.agregar(valor)
+
+    def __str__(self):
+        if len(self.partes) > 1:
+            self.partes = [''.join(self.partes)]
+        return self.partes[0] if self.partes else ''
+
+    def __repr__(self):
+        return repr(str(self))
+
+    def __len__(self):
+        return self.longitud
+
+    # '+' con un constructor da un string (como con cualquier string)
+    def __add__(self, otro):
+        return str(self) + str(otro)
+
+    def __radd__(self, otro):
+        return str(otro) + str(self)
+
+
+def como_texto(valor):
+    return valor if isinstance(valor, str) else str(valor)
+
+
+def unir(lista, separador=''):
+    """join(lista, separador): convierte cada elemento una sola vez"""
+    return separador.join(map(como_texto, lista))
+
+
+def formatear(plantilla, *valores):
+    """format("{} = {:.2f}", a, b), con la sintaxis de str.format"""
+    return plantilla.format(*valores)
+
+
+def imprimir(valor):
+    """
+    print del DSL: un ConstructorTexto se escribe parte por parte y las
+    listas grandes por bloques, sin armar todo el texto en memoria
+    """
+    if isinstance(valor, ConstructorTexto):
+        salida = sys.stdout
+        salida.writelines(valor.partes)
+        salida.write('\n')
+    elif isinstance(valor, LISTAS) and len(valor) > TAMANO_BLOQUE:
+        # Mismo texto que repr(lista)
+        salida = sys.stdout
+        salida.write('[')
+        for inicio in range(0, len(valor), TAMANO_BLOQUE):
+            if inicio:
+                salida.write(', ')
+            salida.write(', '.join(map(repr, valor[inicio:inicio + TAMANO_BLOQUE])))
+        salida.write(']\n')
+    else:
+        print(valor)
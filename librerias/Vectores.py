@@ -0,0 +1,158 @@
+import operator
+from array import array
+from itertools import compress, repeat
+from librerias.Vistas import LISTAS
+
+# Escalares que se operan con cada elemento (bool es int)
+NUMEROS = (int, float)
+
+
+class Vector:
+    """
+    Vector numérico compacto: los valores viven en un array('d') (sin un
+    float de Python por elemento). Los operadores + - * / % ** y las
+    comparaciones son elemento a elemento, con un número o con otro
+    vector (o lista) del mismo largo; las comparaciones dan una máscara
+    de 1.0 / 0.0 que sirve de índice: v[v > 0]
+    """
+    __slots__ = ('datos',)
+
+    def __init__(self, valores=()):
+        self.datos = valores if type(valores) is array else array('d', valores)
+
+    # lectura
+
+    def __len__(self):
+        return len(self.datos)
+
+    def __iter__(self):
+        return iter(self.datos)
+
+    def __getitem__(self, indice):
+        if type(indice) is slice:
+            return Vector(self.datos[indice])
+        if isinstance(indice, (Vector, *LISTAS)):
+            return Vector(array('d', compress(self.datos, _mascara(self, indice))))
+        return self.datos[int(indice)]
+
+    def __setitem__(self, indice, valor):
+        if isinstance(indice, (Vector, *LISTAS)):
+            # v[mascara] = x: un número o un valor por elemento elegido
+            posiciones = list(compress(range(len(self.datos)), _mascara(self, indice)))
+            valores = [valor] * len(posiciones) if isinstance(valor, NUMEROS) else list(valor)
+            if len(valores) != len(posiciones):
+                raise ValueError(f"se asignan {len(valores)} valores a {len(posiciones)} posiciones")
+            datos = self.datos
+            for posicion, v in zip(posiciones, valores):
+                datos[posicion] = v
+        else:
+            self.datos[int(indice)] = valor
+
+    def __repr__(self):
+        return f"vector({self.datos.tolist()})"
+
+    def __bool__(self):
+        if len(self.datos) == 1:
+            return bool(self.datos[0])
+        raise ValueError("el valor de verdad de un vector de varios elementos es ambiguo (usar any / all)")
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (Vector, (self.datos,))
+
+    # operadores
+
+    def __neg__(self):
+        return Vector(array('d', map(operator.neg, self.datos)))
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return Vector(array('d', map(abs, self.datos)))
+
+
+def _mascara(vector, mascara):
+    if len(mascara) != len(vector):
+        raise ValueError(f"máscara de {len(mascara)} elementos para un vector de {len(vector)}")
+    return mascara
+
+
+def _operando(vector, otro):
+    """Iterable de valores que se combina con los del vector, o None"""
+    if isinstance(otro, NUMEROS):
+        return repeat(otro)
+    if isinstance(otro, (Vector, *LISTAS)):
+        if len(otro) != len(vector):
+            raise ValueError(f"vectores de distinto largo: {len(vector)} y {len(otro)}")
+        return otro.datos if type(otro) is Vector else otro
+    return None
+
+
+def _elemento_a_elemento(funcion):
+    def directo(self, otro):
+        valores = _operando(self, otro)
+        if valores is None:
+            return NotImplemented
+        return Vector(array('d', map(funcion, self.datos, valores)))
+
+    def reflejado(self, otro):
+        valores = _operando(self, otro)
+        if valores is None:
+            return NotImplemented
+        return Vector(array('d', map(funcion, valores, self.datos)))
+    return directo, reflejado
+
+
+for _nombre, _funcion in {
+    'add': operator.add,
+    'sub': operator.sub,
+    'mul': operator.mul,
+    'truediv': operator.truediv,
+    'mod': operator.mod,
+    'pow': operator.pow,
+}.items():
+    _directo, _reflejado = _elemento_a_elemento(_funcion)
+    setattr(Vector, f'__{_nombre}__', _directo)
+    setattr(Vector, f'__r{_nombre}__', _reflejado)
+
+# Comparaciones: a < b con a escalar llega como b > a (Python las refleja solo)
+for _nombre, _funcion in {
+    'lt': operator.lt,
+    'le': operator.le,
+    'gt': operator.gt,
+    'ge': operator.ge,
+    'eq': operator.eq,
+    'ne': operator.ne,
+}.items():
+    setattr(Vector, f'__{_nombre}__', _elemento_a_elemento(_funcion)[0])
+
+
+# Listas y vectores: lo que las funciones de las librerías recorren como secuencia
+SECUENCIAS = (*LISTAS, Vector)
+
+
+def crear_vector(valores=0, relleno=0.0):
+    """vector(lista) o vector(n, relleno)"""
+    if isinstance(valores, NUMEROS):
+        return Vector(array('d', [relleno]) * int(valores))
+    if type(valores) is Vector:
+        return Vector(array('d', valores.datos))
+    return Vector(valores)
+
+
+def vectorizar(funcion):
+    """
+    funcion(x, ...) que, si x es un Vector, se aplica a cada elemento
+    y retorna otro Vector
+    """
+    def vectorizada(valor, *argumentos):
+        if type(valor) is Vector:
+            if argumentos:
+                return Vector(array('d', (funcion(x, *argumentos) for x in valor.datos)))
+            return Vector(array('d', map(funcion, valor.datos)))
+        return funcion(valor, *argumentos)
+    vectorizada.__name__ = funcion.__name__
+    vectorizada.__doc__ = funcion.__doc__
+    return vectorizada
@@ -0,0 +1,161 @@
+import weakref
+from collections.abc import MutableSequence
+from itertools import islice
+
+# Rebanadas más cortas que esto se copian (una vista no ahorraría nada)
+TAMANO_MINIMO = 64
+
+# id(lista) -> {id(vista): referencia débil a la vista} de las vistas que
+# leen de esa lista (las listas no admiten referencias débiles). Una vista
+# sale al morir o al materializarse, y la lista cuando no le quedan vistas
+_vistas = {}
+
+
+def _registrar(vista):
+    clave_base = id(vista._base)
+
+    def morir(referencia):
+        _quitar(clave_base, id_vista, referencia)
+    id_vista = id(vista)
+    _vistas.setdefault(clave_base, {})[id_vista] = weakref.ref(vista, morir)
+
+
+def _quitar(clave_base, id_vista, referencia=None):
+    vistas = _vistas.get(clave_base)
+    if vistas is None or id_vista not in vistas:
+        return
+    if referencia is None or vistas[id_vista] is referencia:
+        del vistas[id_vista]
+        if not vistas:
+            del _vistas[clave_base]
+
+
+class VistaLista(MutableSequence):
+    """
+    Rebanada lista[inicio:fin] que no copia los elementos: los lee de la
+    lista original. Se copia (materializa) recién cuando se modifica ella
+    o la lista original, así que se comporta igual que la copia
+    """
+    __slots__ = ('_base', '_inicio', '_fin', '_propia', '__weakref__')
+
+    def __init__(self, base, inicio, fin):
+        self._base = base
+        self._inicio = inicio
+        self._fin = fin
+        self._propia = False
+        _registrar(self)
+
+    def materializar(self):
+        """Copia los elementos: la vista deja de depender de la lista original"""
+        if not self._propia:
+            _quitar(id(self._base), id(self))
+            self._base = self._base[self._inicio:self._fin]
+            self._inicio = 0
+            self._fin = len(self._base)
+            self._propia = True
+
+    def _lista_propia(self):
+        # Lista que la vista puede modificar (las vistas de ella se desprenden)
+        self.materializar()
+        desprender(self._base)
+        return self._base
+
+    # lectura
+
+    def __len__(self):
+        return self._fin - self._inicio
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            inicio, fin, paso = indice.indices(len(self))
+            if paso != 1:
+                return self._base[self._inicio:self._fin][indice]
+            return rebanar(self, inicio, fin)
+        n = self._fin - self._inicio
+        if indice < 0:
+            indice += n
+        if not 0 <= indice < n:
+            raise IndexError("list index out of range")
+        return self._base[self._inicio + indice]
+
+    def __iter__(self):
+        return islice(self._base, self._inicio, self._fin)
+
+    def __eq__(self, otra):
+        if isinstance(otra, LISTAS):
+            return len(self) == len(otra) and all(a == b for a, b in zip(self, otra))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __add__(self, otra):
+        if isinstance(otra, LISTAS):
+            return list(self) + list(otra)
+        return NotImplemented
+
+    def __radd__(self, otra):
+        if isinstance(otra, LISTAS):
+            return list(otra) + list(self)
+        return NotImplemented
+
+    def __mul__(self, n):
+        return list(self) * n
+
+    __rmul__ = __mul__
+
+    def __reduce__(self):
+        # Se guarda (pickle, copy) como una lista común
+        return (list, (list(self),))
+
+    # escritura (copia al escribir)
+
+    def __setitem__(self, indice, valor):
+        lista = self._lista_propia()
+        lista[indice] = valor
+        self._fin = len(lista)
+
+    def __delitem__(self, indice):
+        lista = self._lista_propia()
+        del lista[indice]
+        self._fin = len(lista)
+
+    def insert(self, indice, valor):
+        lista = self._lista_propia()
+        lista.insert(indice, valor)
+        self._fin = len(lista)
+
+
+# Lo que el intérprete trata como lista
+LISTAS = (list, VistaLista)
+
+
+def desprender(lista):
+    """
+    Antes de modificar 'lista' en el lugar: las vistas que leen de ella
+    copian sus elementos
+    """
+    vistas = _vistas.pop(id(lista), None)
+    if vistas:
+        for referencia in list(vistas.values()):
+            vista = referencia()
+            if vista is not None and vista._base is lista:
+                vista.materializar()
+
+
+def rebanar(lista, inicio, fin):
+    """lista[inicio:fin]; si la rebanada es larga retorna una VistaLista"""
+    inicio, fin = int(inicio), int(fin)
+    if isinstance(lista, LISTAS):
+        inicio, fin, _ = slice(inicio, fin).indices(len(lista))
+        fin = max(fin, inicio)
+        if type(lista) is VistaLista:
+            base, inicio, fin = lista._base, lista._inicio + inicio, lista._inicio + fin
+        else:
+            base = lista
+        if fin - inicio >= TAMANO_MINIMO:
+            return VistaLista(base, inicio, fin)
+        return base[inicio:fin]
+    return lista[inicio:fin]
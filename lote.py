@@ -0,0 +1,154 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import main
+from librerias.Tareas import sin_pool
+
+
+def ejecutar_script(archivo, compilar=True, usar_cache=True):
+    """
+    Ejecuta un script en el proceso actual (cada main() crea su propio
+    Visitor) y retorna su salida, su tiempo y el error si lo hubo
+    """
+    salida = io.StringIO()
+    error = None
+    inicio = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(salida):
+            main.main(archivo, compilar=compilar, usar_cache=usar_cache)
+    except Exception:
+        error = traceback.format_exc()
+    return {
+        'archivo': archivo,
+        'ok': error is None,
+        'salida': salida.getvalue(),
+        'error': error,
+        'tiempo': time.perf_counter() - inicio,
+    }
+
+
+def expandir(patrones):
+    """Lista de scripts a partir de rutas y globs (sin repetir, en orden)"""
+    archivos = []
+    for patron in patrones:
+        encontrados = sorted(glob.glob(patron, recursive=True)) if glob.has_magic(patron) else [patron]
+        for archivo in encontrados:
+            if archivo not in archivos:
+                archivos.append(archivo)
+    return archivos
+
+
+def ejecutar_lote(archivos, procesos=None, compilar=True, usar_cache=True, al_terminar=None):
+    """
+    Ejecuta los scripts en un pool de procesos y retorna los resultados
+    en el orden de 'archivos'; al_terminar(resultado) se llama a medida
+    que cada script termina.
+    Si un script mata a su proceso (memoria, recursión en C, ...), el pool
+    se rompe y todos los que no terminaron fallan con él: esos se repiten
+    de a uno, cada uno en un pool nuevo, y solo el que lo vuelve a romper
+    queda como fallido
+    """
+    resultados = {}
+    sin_resultado = _ejecutar_en_pool(archivos, procesos, compilar, usar_cache, al_terminar, resultados)
+    for archivo in sin_resultado:
+        inicio = time.perf_counter()
+        if _ejecutar_en_pool([archivo], 1, compilar, usar_cache, al_terminar, resultados):
+            resultado = {
+                'archivo': archivo,
+                'ok': False,
+                'salida': '',
+                'error': "BrokenProcessPool: el proceso que ejecutaba el script terminó abruptamente\n",
+                'tiempo': time.perf_counter() - inicio,
+            }
+            resultados[archivo] = resultado
+            if al_terminar:
+                al_terminar(resultado)
+    return [resultados[archivo] for archivo in archivos]
+
+
+def _ejecutar_en_pool(archivos, procesos, compilar, usar_cache, al_terminar, resultados):
+    """
+    Ejecuta los scripts en un pool nuevo; retorna los que se quedaron sin
+    resultado porque el pool se rompió
+    """
+    sin_resultado = []
+    # Cada proceso ejecuta sus 'spawn' y 'pfor' en el lugar: con un pool
+    # propio por script habría hasta procesos × núcleos procesos
+    with ProcessPoolExecutor(max_workers=procesos, initializer=sin_pool) as pool:
+        futuros = {pool.submit(ejecutar_script, archivo, compilar, usar_cache): archivo
+                   for archivo in archivos}
+        for futuro in as_completed(futuros):
+            try:
+                resultado = futuro.result()
+            except BrokenProcessPool:
+                sin_resultado.append(futuros[futuro])
+                continue
+            resultados[futuros[futuro]] = resultado
+            if al_terminar:
+                al_terminar(resultado)
+    # En el orden de 'archivos' (as_completed no lo conserva)
+    return [archivo for archivo in archivos if archivo in sin_resultado]
+
+
+def guardar_salidas(resultados, directorio):
+    """Escribe la salida (y el error) de cada script en 'directorio'"""
+    os.makedirs(directorio, exist_ok=True)
+    for i, resultado in enumerate(resultados):
+        base = f"{i:04d}_{os.path.basename(resultado['archivo'])}"
+        with open(os.path.join(directorio, base + '.out'), 'w', encoding='utf-8') as f:
+            f.write(resultado['salida'])
+        if resultado['error']:
+            with open(os.path.join(directorio, base + '.err'), 'w', encoding='utf-8') as f:
+                f.write(resultado['error'])
+
+
+def mostrar_resultado(resultado):
+    estado = "OK   " if resultado['ok'] else "FALLO"
+    print(f"{estado} {resultado['tiempo']:8.3f} s  {resultado['archivo']}", flush=True)
+
+
+def mostrar_resumen(resultados, tiempo_total):
+    fallidos = [r for r in resultados if not r['ok']]
+    suma = sum(r['tiempo'] for r in resultados)
+    print("\n--- Resumen del Lote ---")
+    print(f"Scripts: {len(resultados)}  Fallidos: {len(fallidos)}")
+    print(f"Tiempo total: {tiempo_total:.3f} s (suma por script: {suma:.3f} s)")
+    for resultado in fallidos:
+        ultima = resultado['error'].strip().splitlines()[-1]
+        print(f"  {resultado['archivo']}: {ultima}")
+
+
+if __name__ == '__main__':
+    opciones = argparse.ArgumentParser(description="Ejecuta muchos scripts DSL en paralelo")
+    opciones.add_argument('scripts', nargs='+', help="rutas o globs ('scripts/**/*.txt')")
+    opciones.add_argument('--procesos', type=int, default=os.cpu_count(),
+                          help="procesos del pool (por defecto, uno por núcleo)")
+    opciones.add_argument('--salidas', help="directorio donde guardar la salida de cada script")
+    opciones.add_argument('--json', help="archivo donde guardar el reporte en JSON")
+    opciones.add_argument('--interpretar', action='store_true',
+                          help="ejecutar con el Visitor, sin compilar")
+    opciones.add_argument('--sin-cache', action='store_true',
+                          help="no usar la caché de árboles en .dsl_cache")
+    args = opciones.parse_args()
+
+    archivos = expandir(args.scripts)
+    inicio = time.perf_counter()
+    resultados = ejecutar_lote(archivos, args.procesos, not args.interpretar,
+                               not args.sin_cache, mostrar_resultado)
+    tiempo_total = time.perf_counter() - inicio
+
+    if args.salidas:
+        guardar_salidas(resultados, args.salidas)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'tiempo_total': tiempo_total, 'resultados': resultados}, f, indent=2)
+    mostrar_resumen(resultados, tiempo_total)
+    sys.exit(0 if all(r['ok'] for r in resultados) else 1)
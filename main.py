@@ -1,18 +1,149 @@
+import argparse
+import sys
+import time
 from antlr4 import *
-from DSLLexer import DSLLexer
-from DSLParser import DSLParser
 from visitor import Visitor
+from compilador import Compilador
+from cache_arbol import CacheArbol
+from analizador import parsear
+from perfilador import Perfilador
+from transpilador import preparar_programa
+from optimizador import Optimizador
+from planificador import Planificador
+from metricas import Metricas
+
+def main(archivo, compilar=True, tamano_cache=1024, usar_cache=True, mostrar_tiempos=False,
+         perfilar=False, perfil_json=None, transpilar=False, optimizar=True, paralelo=False,
+         liberar_memoria=True, metricas_json=None, metricas_prometheus=None):
+    tiempos = {}
+    if usar_cache:
+        # Árbol guardado en .dsl_cache si el script y la gramática no cambiaron
+        tree = CacheArbol().obtener_arbol(archivo, tiempos)
+    else:
+        tree, _ = parsear(FileStream(archivo, encoding='utf-8'), tiempos)
+
+    if optimizar:
+        # Plegado de constantes, ramas muertas e invariantes de ciclos
+        inicio = time.perf_counter()
+        Optimizador().optimizar(tree)
+        tiempos['optimizacion'] = time.perf_counter() - inicio
 
-def main(archivo):
-    input_stream = FileStream(archivo, encoding='utf-8')
-    lexer = DSLLexer(input_stream)
-    stream = CommonTokenStream(lexer)
-    parser = DSLParser(stream)
-    tree = parser.programa()
-    
     visitor = Visitor()
-    visitor.visit(tree)
+    # Entradas de la caché de cada función pura (0 desactiva la memoización)
+    visitor.contexto.tamano_cache = tamano_cache
+    # Cada variable del nivel superior se libera después de su último uso
+    visitor.liberar_memoria = liberar_memoria
+
+    # El perfilador mide las closures compiladas
+    perfilador = None
+    if perfilar or perfil_json:
+        with open(archivo, encoding='utf-8') as f:
+            perfilador = Perfilador(f.read())
+        compilar = True
+        transpilar = False
+
+    # Contadores del Visitor, de Contexto y de las librerías (las
+    # sentencias se cuentan en las closures compiladas)
+    metricas = None
+    if metricas_json or metricas_prometheus:
+        metricas = Metricas().instrumentar(visitor)
+        transpilar = False
+
+    if paralelo:
+        # El planificador ejecuta las closures de cada sentencia del Compilador
+        transpilar = False
+
+    try:
+        inicio = time.perf_counter()
+        if transpilar:
+            # Módulo de Python generado (en .dsl_cache); si el script no es
+            # transpilable se usan las closures del Compilador
+            programa = preparar_programa(archivo, tree, visitor, optimizar)
+            tiempos['compilacion'] = time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            programa()
+        elif paralelo:
+            # Las sentencias independientes del nivel superior corren en
+            # paralelo (las operaciones de ML en el pool de procesos)
+            compilador = Compilador(visitor, perfilador)
+            compilador.compilar_programa(tree)
+            tiempos['compilacion'] = time.perf_counter() - inicio
+            if perfilador:
+                perfilador.iniciar()
+            inicio = time.perf_counter()
+            Planificador(visitor).ejecutar(tree, compilador.sentencias_programa)
+        elif compilar:
+            # Compila el árbol a closures y lo ejecuta (el Visitor queda de respaldo)
+            programa = Compilador(visitor, perfilador).compilar_programa(tree)
+            tiempos['compilacion'] = time.perf_counter() - inicio
+            if perfilador:
+                perfilador.iniciar()
+            inicio = time.perf_counter()
+            programa()
+        else:
+            # El Visitor anida frames de Python por cada llamada: la
+            # recursión profunda solo la soportan los modos compilados
+            try:
+                visitor.visit(tree)
+            except RecursionError:
+                print("Error: recursión demasiado profunda para --interpretar; "
+                      "ejecute sin --interpretar (usa una pila explícita)")
+    finally:
+        tiempos['ejecucion'] = time.perf_counter() - inicio
+        if perfilador:
+            perfilador.detener()
+            if perfil_json:
+                perfilador.guardar_json(perfil_json)
+            if perfilar:
+                perfilador.mostrar()
+        if metricas:
+            metricas.detener()
+            metricas.fases.update(tiempos)
+            if metricas_json:
+                metricas.guardar_json(metricas_json)
+            if metricas_prometheus:
+                metricas.guardar_prometheus(metricas_prometheus)
+        if mostrar_tiempos:
+            reportar_tiempos(tiempos)
+
+def reportar_tiempos(tiempos):
+    """Imprime en stderr el tiempo de cada fase (en milisegundos)"""
+    print("\n--- Tiempos ---", file=sys.stderr)
+    for fase in ('cache', 'lexer', 'parser', 'optimizacion', 'compilacion', 'ejecucion'):
+        if fase in tiempos:
+            print(f"  {fase:<12} {tiempos[fase] * 1000:10.2f} ms", file=sys.stderr)
 
 if __name__ == '__main__':
-    archivo = "prueba.txt"
-    main(archivo)
+    opciones = argparse.ArgumentParser(description="Intérprete del DSL")
+    opciones.add_argument('archivo', nargs='?', default="prueba.txt")
+    opciones.add_argument('--interpretar', action='store_true',
+                          help="ejecutar con el Visitor, sin compilar")
+    opciones.add_argument('--sin-cache', action='store_true',
+                          help="no usar la caché de árboles en .dsl_cache")
+    opciones.add_argument('--tamano-cache', type=int, default=1024,
+                          help="entradas de la caché de cada función pura (0 la desactiva)")
+    opciones.add_argument('--tiempos', action='store_true',
+                          help="reportar tiempos de lexer, parser y ejecución")
+    opciones.add_argument('--perfilar', action='store_true',
+                          help="reporte de tiempo, llamadas y memoria por línea, función y operación")
+    opciones.add_argument('--perfil-json', metavar='ARCHIVO',
+                          help="guardar el perfil en JSON")
+    opciones.add_argument('--transpilar', action='store_true',
+                          help="traducir a un módulo de Python (guardado en .dsl_cache) y ejecutarlo")
+    opciones.add_argument('--sin-optimizar', action='store_true',
+                          help="no plegar constantes ni recordar invariantes de ciclos")
+    opciones.add_argument('--paralelo', action='store_true',
+                          help="ejecutar en paralelo las sentencias independientes (ML en un pool de procesos)")
+    opciones.add_argument('--sin-liberar', action='store_true',
+                          help="no liberar las variables (y sus dataframes) después de su último uso")
+    opciones.add_argument('--metricas-json', metavar='ARCHIVO',
+                          help="guardar al terminar los contadores de ejecución en JSON")
+    opciones.add_argument('--metricas-prometheus', metavar='ARCHIVO',
+                          help="guardar al terminar los contadores de ejecución en formato de texto de Prometheus")
+    args = opciones.parse_args()
+    main(args.archivo, compilar=not args.interpretar, tamano_cache=args.tamano_cache,
+         usar_cache=not args.sin_cache, mostrar_tiempos=args.tiempos,
+         perfilar=args.perfilar, perfil_json=args.perfil_json, transpilar=args.transpilar,
+         optimizar=not args.sin_optimizar, paralelo=args.paralelo,
+         liberar_memoria=not args.sin_liberar, metricas_json=args.metricas_json,
+         metricas_prometheus=args.metricas_prometheus)
@@ -0,0 +1,265 @@
+import json
+import time
+from antlr4 import ParserRuleContext
+from DSLParser import DSLParser
+from librerias.RedesNeuronales import RedesNeuronales
+from librerias.Agrupamiento import Agrupamiento
+from librerias.ManejoArchivos import ManejoArchivos
+from librerias.Graficos import Graficos
+
+# Funciones de las librerías que llama el Visitor y que se miden
+# (las internas, como sigmoid, no: se llaman miles de veces)
+FUNCIONES_MEDIDAS = {
+    RedesNeuronales: ('perceptron_simple', 'predecir_perceptron', 'crear_mlp', 'entrenar_mlp',
+                      'predecir_mlp', 'regresion_lineal_multiple', 'predecir_regresion',
+                      'precision', 'error_cuadratico_medio', 'matriz_confusion'),
+    Agrupamiento: ('kmeans', 'predecir_kmeans', 'dbscan', 'agrupamiento_jerarquico'),
+    ManejoArchivos: ('leer_archivo', 'leer_lineas', 'escribir_archivo', 'añadir_linea',
+                     'leer_csv', 'escribir_csv'),
+    Graficos: ('plot', 'scatter', 'bar', 'regresion_lineal', 'histograma', 'funcion'),
+}
+
+# Límites (le) del histograma de profundidad de las búsquedas en Prometheus
+LIMITES_PROFUNDIDAD = (0, 1, 2, 4, 8, 16)
+
+
+# Clase de contexto -> nombre de su regla
+_reglas = {}
+
+
+def regla_de(ctx):
+    """Nombre de la regla de la gramática de un nodo ('cicloFor', 'expresion', ...)"""
+    tipo = type(ctx)
+    regla = _reglas.get(tipo)
+    if regla is None:
+        # Nodos que agrega el Optimizador: cuentan como su clase de DSLParser
+        clase = tipo
+        while not hasattr(DSLParser, clase.__name__):
+            clase = clase.__base__
+        nombre = clase.__name__[:-len('Context')]
+        regla = _reglas[tipo] = nombre[0].lower() + nombre[1:]
+    return regla
+
+
+class Temporizador:
+    """Llamadas y tiempo acumulado de una función de librería"""
+    __slots__ = ('llamadas', 'segundos')
+
+    def __init__(self):
+        self.llamadas = 0
+        self.segundos = 0.0
+
+
+class Metricas:
+    """
+    Contadores de ejecución del intérprete:
+    - visitas: nodos que visita el Visitor, por regla
+    - sentencias: sentencias compiladas ejecutadas, por regla
+    - scopes: marcos creados con Contexto.entrar_scope, por tipo
+    - busquedas: búsquedas de variables por nombre (Contexto.obtener_variable)
+      por profundidad (marcos recorridos hasta encontrarla)
+    - llamadas: llamadas a cada función del usuario
+    - librerias: llamadas y tiempo de las funciones de ML, archivos y gráficos
+    - fases: tiempos de main (lexer, parser, ejecución, ...)
+    Instrumentar reemplaza métodos en las instancias: sin Metricas, el
+    intérprete no paga nada
+    """
+
+    def __init__(self):
+        self.visitas = {}
+        self.sentencias = {}
+        self.scopes = {}
+        self.busquedas = {}
+        self.llamadas = {}
+        self.librerias = {}
+        self.fases = {}
+        self._originales = []
+        self._en_libreria = False
+
+    # instrumentación
+
+    def instrumentar(self, visitor):
+        """Mide el Visitor, su Contexto y las librerías (hasta detener())"""
+        visitor.metricas = self
+        self._instrumentar_visitor(visitor)
+        self._instrumentar_contexto(visitor.contexto)
+        for clase, nombres in FUNCIONES_MEDIDAS.items():
+            for nombre in nombres:
+                funcion = getattr(clase, nombre)
+                self._originales.append((clase, nombre, clase.__dict__[nombre]))
+                setattr(clase, nombre, staticmethod(self._medir(f"{clase.__name__}.{nombre}", funcion)))
+        return self
+
+    def detener(self):
+        """Restaura las funciones originales de las librerías"""
+        for clase, nombre, original in reversed(self._originales):
+            setattr(clase, nombre, original)
+        self._originales = []
+
+    def _instrumentar_visitor(self, visitor):
+        visitas = self.visitas
+        visitar = visitor.visit
+        visitar_hijos = visitor.visitChildren
+
+        def visit(tree):
+            if isinstance(tree, ParserRuleContext):
+                regla = regla_de(tree)
+                visitas[regla] = visitas.get(regla, 0) + 1
+            return visitar(tree)
+
+        def visitChildren(node):
+            # ANTLR visita los hijos con accept(), sin pasar por visit()
+            for hijo in node.children or ():
+                if isinstance(hijo, ParserRuleContext):
+                    regla = regla_de(hijo)
+                    visitas[regla] = visitas.get(regla, 0) + 1
+            return visitar_hijos(node)
+
+        visitor.visit = visit
+        visitor.visitChildren = visitChildren
+
+    def _instrumentar_contexto(self, contexto):
+        scopes = self.scopes
+        busquedas = self.busquedas
+        llamadas = self.llamadas
+        marcos = contexto.scopes_locales
+        entrar_scope = contexto.entrar_scope
+        obtener_variable = contexto.obtener_variable
+        entrar_llamada = contexto.entrar_llamada
+
+        def entrar_scope_contado(tipo='bloque', nombres=None, valores=None):
+            scopes[tipo] = scopes.get(tipo, 0) + 1
+            return entrar_scope(tipo, nombres, valores)
+
+        def obtener_variable_contado(nombre):
+            profundidad = 0
+            for marco in reversed(marcos):
+                if nombre in marco:
+                    break
+                profundidad += 1
+            busquedas[profundidad] = busquedas.get(profundidad, 0) + 1
+            return obtener_variable(nombre)
+
+        def entrar_llamada_contada(nombre_funcion, argumentos):
+            llamadas[nombre_funcion] = llamadas.get(nombre_funcion, 0) + 1
+            return entrar_llamada(nombre_funcion, argumentos)
+
+        contexto.entrar_scope = entrar_scope_contado
+        contexto.obtener_variable = obtener_variable_contado
+        contexto.entrar_llamada = entrar_llamada_contada
+
+    def _medir(self, clave, funcion):
+        temporizador = self.librerias.setdefault(clave, Temporizador())
+        reloj = time.perf_counter
+
+        def medida(*argumentos, **opciones):
+            # Solo la llamada más externa (una librería puede usar otra)
+            if self._en_libreria:
+                return funcion(*argumentos, **opciones)
+            self._en_libreria = True
+            inicio = reloj()
+            try:
+                return funcion(*argumentos, **opciones)
+            finally:
+                temporizador.llamadas += 1
+                temporizador.segundos += reloj() - inicio
+                self._en_libreria = False
+        # Mismo nombre calificado: pickle (spawn) la encuentra en la clase
+        medida.__name__ = funcion.__name__
+        medida.__qualname__ = funcion.__qualname__
+        medida.__module__ = funcion.__module__
+        medida.__doc__ = funcion.__doc__
+        return medida
+
+    def contar_sentencia(self, regla, sentencia):
+        """Envuelve la closure de una sentencia compilada"""
+        sentencias = self.sentencias
+        sentencias.setdefault(regla, 0)
+
+        def contada():
+            sentencias[regla] += 1
+            return sentencia()
+        return contada
+
+    def contar_funcion(self, nombre, funcion):
+        """Envuelve una función compilada (recibe la lista de argumentos)"""
+        llamadas = self.llamadas
+
+        def contada(argumentos):
+            llamadas[nombre] = llamadas.get(nombre, 0) + 1
+            return funcion(argumentos)
+        # Las llamadas en la pila explícita usan la versión en generadores
+        generador = getattr(funcion, 'generador', None)
+        if generador is not None:
+            def generador_contado(argumentos):
+                llamadas[nombre] = llamadas.get(nombre, 0) + 1
+                return generador(argumentos)
+            contada.generador = generador_contado
+        return contada
+
+    # reportes
+
+    def exportar(self):
+        """Métricas como diccionario"""
+        ordenar = lambda tabla: dict(sorted(tabla.items(), key=lambda par: par[1], reverse=True))
+        return {
+            'visitas': ordenar(self.visitas),
+            'sentencias': ordenar({r: n for r, n in self.sentencias.items() if n}),
+            'scopes': ordenar(self.scopes),
+            'busquedas': {
+                'total': sum(self.busquedas.values()),
+                'profundidad': {str(p): n for p, n in sorted(self.busquedas.items())},
+            },
+            'llamadas': ordenar(self.llamadas),
+            'librerias': {clave: {'llamadas': t.llamadas, 'segundos': t.segundos}
+                          for clave, t in sorted(self.librerias.items(), key=lambda par: -par[1].segundos)
+                          if t.llamadas},
+            'fases': dict(self.fases),
+        }
+
+    def guardar_json(self, ruta):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.exportar(), f, indent=2, ensure_ascii=False)
+
+    def prometheus(self):
+        """Métricas en el formato de texto de Prometheus"""
+        reporte = self.exportar()
+        lineas = []
+
+        def metrica(nombre, tipo, ayuda, etiqueta, valores):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for clave, valor in valores.items():
+                lineas.append(f'{nombre}{{{etiqueta}="{_escapar(clave)}"}} {valor}')
+
+        metrica('dsl_visitas_total', 'counter', "Nodos visitados por el Visitor.", 'regla', reporte['visitas'])
+        metrica('dsl_sentencias_total', 'counter', "Sentencias compiladas ejecutadas.", 'regla', reporte['sentencias'])
+        metrica('dsl_scopes_total', 'counter', "Marcos creados por tipo de scope.", 'tipo', reporte['scopes'])
+
+        lineas.append("# HELP dsl_busqueda_variable_profundidad Marcos recorridos por cada búsqueda de variable por nombre.")
+        lineas.append("# TYPE dsl_busqueda_variable_profundidad histogram")
+        for limite in LIMITES_PROFUNDIDAD:
+            acumulado = sum(n for p, n in self.busquedas.items() if p <= limite)
+            lineas.append(f'dsl_busqueda_variable_profundidad_bucket{{le="{limite}"}} {acumulado}')
+        total = sum(self.busquedas.values())
+        lineas.append(f'dsl_busqueda_variable_profundidad_bucket{{le="+Inf"}} {total}')
+        lineas.append(f"dsl_busqueda_variable_profundidad_sum {sum(p * n for p, n in self.busquedas.items())}")
+        lineas.append(f"dsl_busqueda_variable_profundidad_count {total}")
+
+        metrica('dsl_llamadas_funcion_total', 'counter', "Llamadas a funciones del usuario.", 'funcion', reporte['llamadas'])
+        librerias = reporte['librerias']
+        metrica('dsl_libreria_llamadas_total', 'counter', "Llamadas a funciones de librerías.", 'funcion',
+                {clave: t['llamadas'] for clave, t in librerias.items()})
+        metrica('dsl_libreria_segundos_total', 'counter', "Tiempo en funciones de librerías.", 'funcion',
+                {clave: t['segundos'] for clave, t in librerias.items()})
+        metrica('dsl_fase_segundos', 'gauge', "Tiempo de cada fase de main.", 'fase', reporte['fases'])
+        return "\n".join(lineas) + "\n"
+
+    def guardar_prometheus(self, ruta):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus())
+
+
+def _escapar(valor):
+    # Valores de etiquetas: \ " y saltos de línea se escapan
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,316 @@
+from antlr4 import ParserRuleContext
+from antlr4.Token import CommonToken
+from antlr4.tree.Tree import TerminalNodeImpl
+from DSLParser import DSLParser
+from librerias.Contexto import SIN_VALOR
+from librerias.Nativas import NATIVAS, es_pura
+
+# Tipos de los valores que se pueden escribir como literal
+# (int no: el DSL solo tiene números float)
+LITERALES = (float, str, bool)
+
+# Mismas semánticas que visitExpresion
+OPERADORES_BINARIOS = {
+    '**': lambda a, b: a ** b,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: a / b,
+    '%': lambda a, b: a % b,
+    '+': lambda a, b: str(a) + str(b) if isinstance(a, str) or isinstance(b, str) else a + b,
+    '-': lambda a, b: a - b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    'in': lambda a, b: a in b,
+    'and': lambda a, b: a and b,
+    'or': lambda a, b: a or b,
+}
+
+OPERADORES_UNARIOS = {
+    '-': lambda a: -a,
+    'not': lambda a: not a,
+}
+
+# Sentencias que pueden llamar funciones del usuario o cambiar variables
+# por fuera de lo que se ve en el árbol (también las nativas impuras:
+# append(a, v) modifica la lista de cualquier variable que la comparta)
+SENTENCIAS_OPACAS = (DSLParser.FuncionLlamadaContext, DSLParser.FuncionDefContext,
+                     DSLParser.OperacionMLContext, DSLParser.OperacionArchivosContext,
+                     DSLParser.OperacionGraficoContext)
+
+
+class ExpresionInvariante(DSLParser.ExpresionContext):
+    """
+    Expresión que no cambia mientras se ejecuta un ciclo: se evalúa la
+    primera vez que se alcanza (queda en 'valor') y el ciclo la olvida
+    al empezar
+    """
+    __slots__ = ('valor',)
+
+    def accept(self, visitor):
+        return visitor.visitExpresionInvariante(self)
+
+
+class CicloForOptimizado(DSLParser.CicloForContext):
+    """cicloFor con la lista de sus expresiones invariantes"""
+    __slots__ = ('invariantes',)
+
+
+class CicloWhileOptimizado(DSLParser.CicloWhileContext):
+    """cicloWhile con la lista de sus expresiones invariantes"""
+    __slots__ = ('invariantes',)
+
+
+def olvidar_invariantes(ciclo):
+    """Al empezar un ciclo sus expresiones invariantes vuelven a evaluarse"""
+    for expresion in getattr(ciclo, 'invariantes', ()):
+        expresion.valor = SIN_VALOR
+
+
+class Optimizador:
+    """
+    Pasada sobre el árbol de parseo (lo modifica en el lugar):
+    - Pliega operaciones entre literales (aritmética, comparaciones,
+      concatenación de strings); si la evaluación falla se deja tal cual
+    - Elimina las ramas de if/elif/else con condición constante
+    - Reemplaza las expresiones puras invariantes de cada cicloFor/cicloWhile
+      por ExpresionInvariante y el ciclo por CicloForOptimizado /
+      CicloWhileOptimizado, que las lista en 'invariantes'
+    Los nodos marcados son instancias nuevas de subclases: los backends
+    los reconocen por su tipo
+    """
+
+    def optimizar(self, tree):
+        self._plegar(tree)
+        self._invariantes(tree)
+        return tree
+
+    # --- Plegado de constantes y ramas muertas ---
+
+    def _plegar(self, ctx):
+        for hijo in list(ctx.children or ()):
+            if isinstance(hijo, ParserRuleContext):
+                self._plegar(hijo)
+
+        if isinstance(ctx, DSLParser.ExpresionContext):
+            self._plegar_expresion(ctx)
+        elif isinstance(ctx, DSLParser.CondicionalContext):
+            self._podar_condicional(ctx)
+
+    def _plegar_expresion(self, ctx):
+        n_hijos = ctx.getChildCount()
+        if n_hijos == 3 and ctx.getChild(0).getText() == '(':
+            operandos, operar = [ctx.expresion(0)], lambda a: a
+        elif n_hijos == 2 and ctx.getChild(0).getText() in OPERADORES_UNARIOS:
+            operandos, operar = [ctx.expresion(0)], OPERADORES_UNARIOS[ctx.getChild(0).getText()]
+        elif n_hijos == 3 and ctx.getChild(1).getText() in OPERADORES_BINARIOS:
+            operandos, operar = ctx.expresion(), OPERADORES_BINARIOS[ctx.getChild(1).getText()]
+        else:
+            return
+
+        valores = [constante(e) for e in operandos]
+        if any(v is SIN_VALOR for v in valores):
+            return
+        try:
+            valor = operar(*valores)
+        except Exception:
+            return  # el error se reporta al ejecutar, como antes
+        if type(valor) in LITERALES:
+            _reemplazar_por_literal(ctx, valor)
+
+    def _podar_condicional(self, ctx):
+        # Ramas (palabra, condición, bloque); el else tiene condición None
+        ramas = []
+        expr_idx = 0
+        bloque_idx = 0
+        for i in range(ctx.getChildCount()):
+            hijo = ctx.getChild(i)
+            texto = hijo.getText()
+            if texto == 'if' or texto == 'elif':
+                ramas.append((hijo, ctx.expresion(expr_idx), ctx.bloque(bloque_idx)))
+                expr_idx += 1
+                bloque_idx += 1
+            elif texto == 'else':
+                ramas.append((hijo, None, ctx.bloque(bloque_idx)))
+
+        vivas = []
+        for palabra, condicion, bloque in ramas:
+            valor = constante(condicion) if condicion is not None else True
+            if valor is SIN_VALOR:
+                vivas.append((palabra, condicion, bloque))
+            elif valor:
+                # Siempre verdadera: es el else y lo que sigue no se alcanza
+                vivas.append((palabra, None, bloque))
+                break
+        if vivas == ramas:
+            return
+
+        sentencia = ctx.parentCtx
+        if not vivas:
+            # Ninguna rama puede ejecutarse
+            sentencia.parentCtx.children.remove(sentencia)
+            return
+        if vivas[0][1] is None:
+            # Solo queda un bloque: la sentencia pasa a ser ese bloque
+            bloque = vivas[0][2]
+            bloque.parentCtx = sentencia
+            sentencia.children = [bloque]
+            return
+
+        hijos = []
+        for i, (palabra, condicion, bloque) in enumerate(vivas):
+            if condicion is None:
+                hijos.extend([_token_como(palabra, 'else'), bloque])
+                continue
+            if i == 0 and palabra.getText() != 'if':
+                palabra = _token_como(palabra, 'if')
+            hijos.extend([palabra, _token_como(palabra, '('), condicion, _token_como(palabra, ')'), bloque])
+        for hijo in hijos:
+            hijo.parentCtx = ctx
+        ctx.children = hijos
+        ctx.stop = bloque.stop
+
+    # --- Expresiones invariantes de ciclos ---
+
+    def _invariantes(self, ctx):
+        es_for = isinstance(ctx, DSLParser.CicloForContext)
+        if (es_for or isinstance(ctx, DSLParser.CicloWhileContext)) and not _contiene_opacas(ctx):
+            escritas = set()
+            _variables_escritas(ctx, escritas)
+            marcadas = []
+            # El rango del for se evalúa una sola vez
+            for nodo in ([ctx.bloque()] if es_for else [ctx.expresion(), ctx.bloque()]):
+                self._marcar(nodo, escritas, marcadas)
+            if marcadas:
+                if not isinstance(ctx, (CicloForOptimizado, CicloWhileOptimizado)):
+                    ctx = _convertir(ctx, CicloForOptimizado if es_for else CicloWhileOptimizado)
+                    ctx.invariantes = []
+                ctx.invariantes.extend(marcadas)
+
+        for hijo in list(ctx.children or ()):
+            if isinstance(hijo, ParserRuleContext):
+                self._invariantes(hijo)
+
+    def _marcar(self, ctx, escritas, marcadas):
+        if isinstance(ctx, ExpresionInvariante):
+            return  # ya la olvida un ciclo más externo
+        if isinstance(ctx, DSLParser.ExpresionContext) and _es_compuesta(ctx) and _invariante(ctx, escritas):
+            invariante = _convertir(ctx, ExpresionInvariante)
+            invariante.valor = SIN_VALOR
+            marcadas.append(invariante)
+            return
+        for hijo in ctx.children or ():
+            if isinstance(hijo, ParserRuleContext):
+                self._marcar(hijo, escritas, marcadas)
+
+
+def constante(ctx):
+    """Valor de un literal (NUMERO, STRING, BOOLEAN) o SIN_VALOR"""
+    if not isinstance(ctx, DSLParser.ExpresionContext) or ctx.getChildCount() != 1:
+        return SIN_VALOR
+    if ctx.NUMERO():
+        return float(ctx.NUMERO().getText())
+    if ctx.STRING():
+        return ctx.STRING().getText()[1:-1]
+    if ctx.BOOLEAN():
+        return ctx.BOOLEAN().getText() == 'true' or ctx.BOOLEAN().getText() == 'True'
+    return SIN_VALOR
+
+
+def _reemplazar_por_literal(ctx, valor):
+    """Convierte la expresión en un literal con el mismo valor"""
+    if isinstance(valor, bool):
+        tipo, texto = DSLParser.BOOLEAN, 'true' if valor else 'false'
+    elif isinstance(valor, str):
+        tipo, texto = DSLParser.STRING, '"' + valor + '"'
+    else:
+        tipo, texto = DSLParser.NUMERO, repr(valor)
+    token = CommonToken(type=tipo)
+    token.text = texto
+    token.line = ctx.start.line
+    token.column = ctx.start.column
+    hoja = TerminalNodeImpl(token)
+    hoja.parentCtx = ctx
+    ctx.children = [hoja]
+    ctx.start = ctx.stop = token
+
+
+def _convertir(ctx, clase):
+    """Reemplaza 'ctx' en el árbol por un nodo de 'clase' con sus mismos hijos"""
+    nuevo = clase(None, ctx.parentCtx)
+    nuevo.invokingState = ctx.invokingState
+    nuevo.start, nuevo.stop, nuevo.exception = ctx.start, ctx.stop, ctx.exception
+    nuevo.children = ctx.children
+    for hijo in nuevo.children or ():
+        hijo.parentCtx = nuevo
+    hermanos = ctx.parentCtx.children
+    hermanos[hermanos.index(ctx)] = nuevo
+    return nuevo
+
+
+def _token_como(hoja, texto):
+    """Hoja con la palabra 'texto', en la posición de 'hoja'"""
+    token = CommonToken(type=DSLParser.literalNames.index(f"'{texto}'"))
+    token.text = texto
+    token.line = hoja.symbol.line
+    token.column = hoja.symbol.column
+    return TerminalNodeImpl(token)
+
+
+def _contiene_opacas(ctx):
+    """
+    Si el ciclo puede cambiar datos que el árbol no muestra como escritos.
+    Por ejemplo, sin contar append como opaca, la condición quedaría
+    guardada y el ciclo no terminaría nunca:
+        while (not (meta in visitados)) { append(visitados, n); n += 1; }
+    Una asignación a un elemento (t[k] = v) también: modifica la lista o
+    el diccionario de cualquier variable que lo comparta (t = s antes del
+    ciclo), y 'k in s' o 's == u' quedarían con el valor viejo
+    """
+    if isinstance(ctx, DSLParser.AsignacionContext) and ctx.getChild(1).getText() == '[':
+        return True
+    if isinstance(ctx, SENTENCIAS_OPACAS):
+        if not isinstance(ctx, DSLParser.FuncionLlamadaContext):
+            return True
+        nombre = ctx.ID().getText()
+        if nombre not in NATIVAS or not es_pura(nombre):
+            return True
+    return any(_contiene_opacas(h) for h in ctx.children or () if isinstance(h, ParserRuleContext))
+
+
+def _variables_escritas(ctx, escritas):
+    """Nombres que declara, asigna, itera o libera algo dentro de 'ctx'"""
+    if isinstance(ctx, (DSLParser.DeclaracionContext, DSLParser.AsignacionContext,
+                        DSLParser.CicloForContext, DSLParser.CicloParaleloContext)):
+        escritas.add(ctx.ID().getText())
+    elif isinstance(ctx, DSLParser.LiberacionContext):
+        escritas.update(id_.getText() for id_ in ctx.ID())
+    for hijo in ctx.children or ():
+        if isinstance(hijo, ParserRuleContext):
+            _variables_escritas(hijo, escritas)
+
+
+def _es_compuesta(ctx):
+    """Operación (no un literal ni una variable sola)"""
+    return ctx.getChildCount() > 1
+
+
+def _invariante(ctx, escritas):
+    """
+    Solo literales, variables que el ciclo no escribe y operadores:
+    sin llamadas, listas ni indexación (leen datos mutables)
+    """
+    if ctx.getChildCount() == 1:
+        if ctx.ID():
+            return ctx.ID().getText() not in escritas
+        return constante(ctx) is not SIN_VALOR
+    n_hijos = ctx.getChildCount()
+    if n_hijos == 3 and ctx.getChild(0).getText() == '(':
+        return _invariante(ctx.expresion(0), escritas)
+    if n_hijos == 2 and ctx.getChild(0).getText() in OPERADORES_UNARIOS:
+        return _invariante(ctx.expresion(0), escritas)
+    if n_hijos == 3 and ctx.getChild(1).getText() in OPERADORES_BINARIOS:
+        return all(_invariante(e, escritas) for e in ctx.expresion())
+    return False
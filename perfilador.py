@@ -0,0 +1,191 @@
+import json
+import time
+import tracemalloc
+from antlr4.tree.Tree import TerminalNodeImpl
+from DSLParser import DSLParser
+from resolutor import define_variable
+
+
+def linea_de(ctx):
+    """Línea del script donde empieza un nodo"""
+    if getattr(ctx, 'start', None) is not None:
+        return ctx.start.line
+    while not isinstance(ctx, TerminalNodeImpl):
+        if not ctx.children:
+            return 0
+        ctx = ctx.children[0]
+    return ctx.symbol.line
+
+
+def nombre_operacion(ctx):
+    """
+    Palabra clave de una sentencia de ML / archivos / gráficos
+    ('kmeans', 'read_csv', 'plot', ...)
+    """
+    if isinstance(ctx, DSLParser.LanzamientoContext):
+        return 'spawn ' + nombre_operacion(ctx.operacionML())
+    hoja = ctx.getChild(0)
+    if define_variable(hoja):
+        return hoja.getChild(2).getText()
+    return hoja.getChild(0).getText()
+
+
+class Estadistica:
+    """Mediciones acumuladas de un punto del programa"""
+    __slots__ = ('llamadas', 'acumulado', 'propio', 'memoria', 'activos')
+
+    def __init__(self):
+        self.llamadas = 0
+        self.acumulado = 0.0  # segundos, incluyendo lo que se llama desde ahí
+        self.propio = 0.0     # segundos, sin contar otros puntos medidos
+        self.memoria = 0      # bytes (variación de la memoria asignada)
+        self.activos = 0      # ejecuciones en curso (recursión)
+
+
+class Perfilador:
+    """
+    Mide tiempo acumulado y propio, cantidad de llamadas y variación de
+    memoria por línea del script, por función del usuario y por sentencia
+    de ML / E/S. El Compilador envuelve las closures de esos puntos
+    """
+
+    def __init__(self, fuente=None, memoria=True):
+        self.lineas_fuente = fuente.splitlines() if fuente else []
+        self.memoria = memoria
+        self.lineas = {}       # número de línea -> Estadistica
+        self.funciones = {}    # nombre -> Estadistica
+        self.operaciones = {}  # (operación, línea) -> Estadistica
+        self._hijos = []       # tiempo de los puntos medidos anidados
+
+    def iniciar(self):
+        if self.memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def detener(self):
+        if self.memoria and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    # instrumentación
+
+    def envolver_linea(self, linea, funcion):
+        return self._envolver(self.lineas.setdefault(linea, Estadistica()), funcion)
+
+    def envolver_funcion(self, nombre, funcion):
+        estadistica = self.funciones.setdefault(nombre, Estadistica())
+        medida = self._envolver(estadistica, funcion)
+        # Las llamadas en la pila explícita (las recursivas más allá de
+        # PRESUPUESTO_FRAMES) usan la versión en generador: también se mide
+        generador = getattr(funcion, 'generador', None)
+        if generador is not None:
+            medida.generador = self._envolver_generador(estadistica, generador)
+        return medida
+
+    def envolver_operacion(self, operacion, linea, funcion):
+        return self._envolver(self.operaciones.setdefault((operacion, linea), Estadistica()), funcion)
+
+    def _envolver(self, estadistica, funcion):
+        empezar, terminar = self._medidor(estadistica)
+
+        def medida(*argumentos):
+            inicio = empezar()
+            try:
+                return funcion(*argumentos)
+            finally:
+                terminar(inicio)
+        return medida
+
+    def _envolver_generador(self, estadistica, generador):
+        empezar, terminar = self._medidor(estadistica)
+
+        def medida_generador(*argumentos):
+            # Mientras está suspendido corren las llamadas que hizo: su
+            # tiempo se descuenta del propio como en _envolver
+            inicio = empezar()
+            try:
+                return (yield from generador(*argumentos))
+            finally:
+                terminar(inicio)
+        return medida_generador
+
+    def _medidor(self, estadistica):
+        """(empezar, terminar) de una medición de 'estadistica'"""
+        hijos = self._hijos
+        reloj = time.perf_counter
+        memoria = tracemalloc.get_traced_memory if self.memoria else None
+
+        def empezar():
+            estadistica.llamadas += 1
+            estadistica.activos += 1
+            hijos.append(0.0)
+            memoria_inicio = memoria()[0] if memoria else 0
+            return reloj(), memoria_inicio
+
+        def terminar(inicio):
+            transcurrido = reloj() - inicio[0]
+            estadistica.propio += transcurrido - hijos.pop()
+            estadistica.activos -= 1
+            # En la recursión solo cuenta la ejecución más externa
+            if estadistica.activos == 0:
+                estadistica.acumulado += transcurrido
+                if memoria:
+                    estadistica.memoria += memoria()[0] - inicio[1]
+            if hijos:
+                hijos[-1] += transcurrido
+        return empezar, terminar
+
+    # reportes
+
+    def exportar(self):
+        """Reporte como diccionario (ordenado por tiempo acumulado)"""
+        def filas(tabla, describir):
+            resultado = []
+            for clave, e in tabla.items():
+                fila = describir(clave)
+                fila.update({'llamadas': e.llamadas, 'acumulado': e.acumulado,
+                             'propio': e.propio, 'memoria': e.memoria})
+                resultado.append(fila)
+            resultado.sort(key=lambda f: f['acumulado'], reverse=True)
+            return resultado
+
+        return {
+            'lineas': filas(self.lineas, lambda n: {'linea': n, 'codigo': self._codigo(n)}),
+            'funciones': filas(self.funciones, lambda nombre: {'funcion': nombre}),
+            'operaciones': filas(self.operaciones, lambda c: {'operacion': c[0], 'linea': c[1]}),
+        }
+
+    def guardar_json(self, ruta):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.exportar(), f, indent=2, ensure_ascii=False)
+
+    def mostrar(self, limite=20):
+        """Imprime las tablas del perfil, de mayor a menor tiempo acumulado"""
+        reporte = self.exportar()
+        encabezado = f"{'llamadas':>9} {'acum (ms)':>11} {'propio (ms)':>12} {'memoria (KB)':>13}"
+
+        def fila(f):
+            return (f"{f['llamadas']:>9} {f['acumulado'] * 1000:>11.2f} "
+                    f"{f['propio'] * 1000:>12.2f} {f['memoria'] / 1024:>13.1f}")
+
+        print("\n--- Perfil por Línea ---")
+        print(f"{'línea':>6} {encabezado}  código")
+        for f in reporte['lineas'][:limite]:
+            print(f"{f['linea']:>6} {fila(f)}  {f['codigo']}")
+
+        if reporte['funciones']:
+            print("\n--- Perfil por Función ---")
+            print(f"{'función':<20} {encabezado}")
+            for f in reporte['funciones'][:limite]:
+                print(f"{f['funcion']:<20} {fila(f)}")
+
+        if reporte['operaciones']:
+            print("\n--- Perfil de Operaciones ML / E/S ---")
+            print(f"{'operación':<20} {'línea':>6} {encabezado}")
+            for f in reporte['operaciones'][:limite]:
+                print(f"{f['operacion']:<20} {f['linea']:>6} {fila(f)}")
+        print()
+
+    def _codigo(self, linea):
+        if 0 < linea <= len(self.lineas_fuente):
+            codigo = self.lineas_fuente[linea - 1].strip()
+            return codigo if len(codigo) <= 60 else codigo[:57] + "..."
+        return ""
@@ -0,0 +1,206 @@
+import contextlib
+import io
+import sys
+from collections import deque
+from antlr4.tree.Tree import TerminalNodeImpl
+from DSLParser import DSLParser
+from visitor import RETORNO, LANZABLES
+from resolutor import define_variable, variables_muertas
+from librerias.Nativas import NATIVAS, es_pura
+
+# Sentencias que leen o escriben un archivo (su ruta es el STRING)
+LECTURAS_ARCHIVO = (DSLParser.LeerArchivoContext, DSLParser.LeerCSVContext)
+ESCRITURAS_ARCHIVO = (DSLParser.EscribirArchivoContext, DSLParser.EscribirCSVContext)
+
+# Sentencias con efectos fuera del programa: no corren antes de que
+# termine (o falle) una operación lanzada antes
+EFECTOS = ESCRITURAS_ARCHIVO + (DSLParser.GuardarModeloContext, DSLParser.OperacionGraficoContext)
+
+
+class Accesos:
+    """
+    Lo que lee y escribe una sentencia del nivel superior: nombres de
+    variables (y de modelos, que usan el mismo nombre) y ('archivo', ruta).
+    'opaca' si puede tocar cualquier cosa (llama funciones del usuario),
+    'efectos' si escribe archivos o muestra gráficos
+    """
+    __slots__ = ('lee', 'escribe', 'opaca', 'efectos')
+
+    def __init__(self, ctx):
+        self.lee = set()
+        self.escribe = set()
+        self.opaca = False
+        self.efectos = False
+        self._recorrer(ctx)
+
+    def _recorrer(self, ctx):
+        if isinstance(ctx, TerminalNodeImpl):
+            if ctx.symbol.type == DSLParser.ID:
+                # Todo identificador cuenta como lectura (de más no es un error)
+                self.lee.add(ctx.getText())
+            return
+        if isinstance(ctx, DSLParser.FuncionDefContext):
+            # Definirla no lee nada; las llamadas son opacas
+            return
+        if isinstance(ctx, (DSLParser.FuncionLlamadaContext, DSLParser.GraficoFuncionContext)):
+            nombre = ctx.getChild(0).getText() if isinstance(ctx, DSLParser.FuncionLlamadaContext) else None
+            if nombre not in NATIVAS:
+                self.opaca = True
+            elif not es_pura(nombre) and ctx.argumentos():
+                # append(l, v) etc. modifican sus argumentos
+                for argumento in ctx.argumentos().expresion():
+                    self._escritas(argumento)
+        elif isinstance(ctx, (DSLParser.RetornoContext, DSLParser.EsperaContext)):
+            self.opaca = True
+        elif isinstance(ctx, (DSLParser.DeclaracionContext, DSLParser.AsignacionContext,
+                              DSLParser.CicloForContext)):
+            self.escribe.add(ctx.ID().getText())
+        elif isinstance(ctx, DSLParser.MlpEntrenarContext):
+            self.escribe.add(ctx.ID().getText())
+        elif isinstance(ctx, DSLParser.LiberacionContext):
+            self.escribe.update(id_.getText() for id_ in ctx.ID())
+        elif isinstance(ctx, (DSLParser.OperacionMLContext, DSLParser.OperacionArchivosContext)):
+            nombre = define_variable(ctx.getChild(0))
+            if nombre:
+                self.escribe.add(nombre)
+        if isinstance(ctx, EFECTOS):
+            self.efectos = True
+        if isinstance(ctx, LECTURAS_ARCHIVO):
+            self.lee.add(('archivo', _ruta(ctx)))
+        elif isinstance(ctx, ESCRITURAS_ARCHIVO):
+            self.escribe.add(('archivo', _ruta(ctx)))
+
+        for hijo in ctx.children or ():
+            self._recorrer(hijo)
+
+    def _escritas(self, ctx):
+        if isinstance(ctx, TerminalNodeImpl):
+            if ctx.symbol.type == DSLParser.ID:
+                self.escribe.add(ctx.getText())
+            return
+        for hijo in ctx.children or ():
+            self._escritas(hijo)
+
+    def depende_de(self, escritas):
+        """Si tiene que esperar a una sentencia que escribe 'escritas'"""
+        return (self.opaca or self.efectos
+                or not escritas.isdisjoint(self.lee) or not escritas.isdisjoint(self.escribe))
+
+
+def _ruta(ctx):
+    # El primer STRING de la sentencia es la ruta del archivo
+    for hijo in ctx.children:
+        if isinstance(hijo, TerminalNodeImpl) and hijo.symbol.type == DSLParser.STRING:
+            return hijo.getText()[1:-1]
+    return None
+
+
+def operacion_lanzable(ctx):
+    """Operación de ML de la sentencia si se puede ejecutar en el pool, o None"""
+    hijo = ctx.getChild(0)
+    if not isinstance(hijo, DSLParser.OperacionMLContext):
+        return None
+    operacion = hijo.getChild(0)
+    if not isinstance(operacion, LANZABLES):
+        return None
+    if not isinstance(operacion, DSLParser.MlpEntrenarContext) and not operacion.ID():
+        return None
+    return operacion
+
+
+class Pendiente:
+    """Operación del nivel superior que corre en el pool"""
+    __slots__ = ('futuro', 'nombre', 'escribe')
+
+    def __init__(self, futuro, nombre, escribe):
+        self.futuro = futuro
+        self.nombre = nombre
+        self.escribe = escribe
+
+
+class Planificador:
+    """
+    Ejecuta las sentencias del nivel superior según sus dependencias:
+    - Las operaciones de ML que entrenan se lanzan al pool de procesos
+      (como con 'spawn') y el programa sigue con la próxima sentencia
+    - Una sentencia que lee o escribe lo que escribe una operación
+      pendiente (o que es opaca, o escribe archivos o muestra gráficos)
+      la espera antes de ejecutarse
+    - Un error de una operación lanzada corta el programa en la primera
+      sentencia que empieza después de que falló (las que no dependen de
+      ella pueden haber corrido, pero ninguna con efectos afuera)
+    - La salida sale en el orden del programa: mientras haya operaciones
+      pendientes antes, lo que imprime una sentencia se guarda
+    """
+
+    def __init__(self, visitor):
+        self.visitor = visitor
+        self.contexto = visitor.contexto
+        self.pendientes = []
+        # Salida en orden: Futuro (su salida al terminar) o texto ya impreso
+        self.cola = deque()
+
+    def ejecutar(self, ctx:DSLParser.ProgramaContext, sentencias):
+        """sentencias: closures de cada sentencia de ctx (Compilador.sentencias_programa)"""
+        muertas = variables_muertas(ctx) if self.visitor.liberar_memoria else [()] * len(sentencias)
+        try:
+            for sentencia_ctx, sentencia, nombres in zip(ctx.sentencia(), sentencias, muertas):
+                accesos = Accesos(sentencia_ctx)
+                # Las terminadas también: si fallaron, el error sale acá
+                self._esperar([p for p in self.pendientes
+                               if p.futuro.listo() or accesos.depende_de(p.escribe)])
+
+                operacion = operacion_lanzable(sentencia_ctx)
+                if operacion is not None:
+                    # La operación ya tiene sus argumentos: sus variables se pueden liberar
+                    self._lanzar(operacion, accesos)
+                elif self._ejecutar(sentencia) is RETORNO:
+                    break
+                if nombres:
+                    self.visitor.liberar_muertas(nombres)
+                self._vaciar()
+        finally:
+            self._esperar(list(self.pendientes))
+            self.visitor.esperar_tareas()
+            self._vaciar()
+
+    def _lanzar(self, operacion, accesos):
+        # Variable destino (en train, el modelo que se entrena)
+        nombre = operacion.ID().getText()
+        futuro = self.visitor.lanzar_operacion(operacion)
+        futuro.imprimir = False
+        self.pendientes.append(Pendiente(futuro, nombre, accesos.escribe))
+        self.cola.append(futuro)
+
+    def _ejecutar(self, sentencia):
+        if not self.cola:
+            return sentencia()
+        # Hay salida anterior que todavía no se puede escribir
+        salida = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(salida):
+                return sentencia()
+        finally:
+            self.cola.append(salida.getvalue())
+
+    def _esperar(self, pendientes):
+        """Espera las operaciones y deja su resultado en la variable destino"""
+        for pendiente in pendientes:
+            valor = pendiente.futuro.resultado()
+            if self.contexto.scope_global.get(pendiente.nombre) is pendiente.futuro:
+                self.contexto.scope_global[pendiente.nombre] = valor
+            self.pendientes.remove(pendiente)
+
+    def _vaciar(self):
+        """Escribe la salida del principio de la cola que ya está completa"""
+        cola = self.cola
+        while cola:
+            entrada = cola[0]
+            if isinstance(entrada, str):
+                sys.stdout.write(entrada)
+            elif entrada.listo():
+                entrada.resultado()
+                sys.stdout.write(entrada.salida)
+            else:
+                break
+            cola.popleft()
@@ -0,0 +1,282 @@
+from antlr4 import ParserRuleContext
+from DSLParser import DSLParser
+from librerias.Nativas import NATIVAS
+
+# Tipos de resolución de una variable
+LOCAL = 'local'         # (LOCAL, profundidad, slot) dentro de los marcos de la función
+GLOBAL = 'global'       # directamente en scope_global
+DINAMICO = 'dinamico'   # búsqueda por nombre en Contexto (scoping dinámico)
+
+
+def define_variable(ctx):
+    """
+    Nombre que define una sentencia delegada al Visitor
+    (ID '=' 'kmeans' ..., ID '=' 'read_csv' ..., etc.) o None
+    """
+    if isinstance(ctx, DSLParser.LanzamientoContext):
+        return define_variable(ctx.operacionML().getChild(0))
+    if ctx.getChildCount() > 1 and ctx.getChild(1).getText() == '=':
+        return ctx.getChild(0).getText()
+    return None
+
+
+def variables_lanzadas(ctx, nombres=None):
+    """Nombres de las variables que pueden quedar con el Futuro de un 'spawn'"""
+    if nombres is None:
+        nombres = set()
+    if isinstance(ctx, DSLParser.LanzamientoContext):
+        operacion = ctx.operacionML().getChild(0)
+        if isinstance(operacion, DSLParser.MlpEntrenarContext):
+            nombres.add(operacion.ID().getText())
+        else:
+            nombre = define_variable(operacion)
+            if nombre:
+                nombres.add(nombre)
+    for i in range(ctx.getChildCount()):
+        hijo = ctx.getChild(i)
+        if isinstance(hijo, ParserRuleContext):
+            variables_lanzadas(hijo, nombres)
+    return nombres
+
+
+def _usadas(ctx, nombres, en_funciones):
+    """
+    IDs de 'ctx': los de afuera de las funciones van a 'nombres' y los
+    de adentro (con el nombre de la función) a 'en_funciones'
+    """
+    if isinstance(ctx, DSLParser.FuncionDefContext):
+        nombres = en_funciones
+    for i in range(ctx.getChildCount()):
+        hijo = ctx.getChild(i)
+        if isinstance(hijo, ParserRuleContext):
+            _usadas(hijo, nombres, en_funciones)
+        elif hijo.symbol.type == DSLParser.ID:
+            nombres.add(hijo.getText())
+
+
+def variables_muertas(ctx:DSLParser.ProgramaContext):
+    """
+    Vivacidad: por cada sentencia del nivel superior, las variables cuyo
+    último uso es esa sentencia (se pueden liberar después de ejecutarla).
+    Los nombres que aparecen en una función no se liberan nunca: cualquier
+    llamada puede leerlos (como globales o por scoping dinámico)
+    """
+    sentencias = ctx.sentencia()
+    en_funciones = set()
+    ultimo_uso = {}
+    for i, sentencia in enumerate(sentencias):
+        nombres = set()
+        _usadas(sentencia, nombres, en_funciones)
+        for nombre in nombres:
+            ultimo_uso[nombre] = i
+
+    muertas = [[] for _ in sentencias]
+    for nombre, i in ultimo_uso.items():
+        if nombre not in en_funciones:
+            muertas[i].append(nombre)
+    if muertas:
+        # Después de la última sentencia el programa termina
+        muertas[-1] = []
+    return [tuple(sorted(nombres)) for nombres in muertas]
+
+
+class Resolutor:
+    """
+    Resuelve cada variable a una dirección (profundidad, slot) al momento
+    de su definición:
+    - Cada marco en tiempo de ejecución tiene un layout nombre -> slot fijo
+    - La profundidad cuenta marcos desde el actual hacia afuera
+    - Lo que no se puede resolver estáticamente queda como búsqueda dinámica
+    """
+
+    def __init__(self):
+        # Layouts de los marcos visibles (del más externo al más interno)
+        self.scopes = []
+
+        # Por cada marco, nombres que quizá se crearon por asignación
+        # a una variable inexistente (su valor solo se sabe al ejecutar)
+        self.dudosos = []
+
+        # Índices del primer marco de cada función en compilación
+        self.funciones = []
+
+        # Globales que seguro existen (definidas en el nivel superior)
+        self.globales = set()
+
+        # Nombres que algún scope local del programa puede definir
+        self.locales_programa = set()
+
+    # análisis previo
+
+    def analizar_programa(self, ctx):
+        """Registra todos los nombres que pueden vivir en un scope local"""
+        self._registrar_locales(ctx, False)
+
+    def _registrar_locales(self, ctx, dentro):
+        if isinstance(ctx, DSLParser.FuncionDefContext):
+            if ctx.parametros():
+                for param in ctx.parametros().ID():
+                    self.locales_programa.add(param.getText())
+            dentro = True
+        elif isinstance(ctx, DSLParser.CicloForContext):
+            self.locales_programa.add(ctx.ID().getText())
+        elif dentro:
+            if isinstance(ctx, DSLParser.DeclaracionContext):
+                if ctx.getChild(0).getText() == 'var':
+                    self.locales_programa.add(ctx.ID().getText())
+            elif isinstance(ctx, (DSLParser.AsignacionContext, DSLParser.OperacionMLContext,
+                                  DSLParser.OperacionArchivosContext)):
+                hoja = ctx if isinstance(ctx, DSLParser.AsignacionContext) else ctx.getChild(0)
+                nombre = define_variable(hoja)
+                if nombre:
+                    self.locales_programa.add(nombre)
+        if isinstance(ctx, DSLParser.BloqueContext):
+            dentro = True
+
+        for i in range(ctx.getChildCount()):
+            hijo = ctx.getChild(i)
+            if isinstance(hijo, ParserRuleContext):
+                self._registrar_locales(hijo, dentro)
+
+    def funciones_recursivas(self, ctx):
+        """
+        Nombres de las funciones que están en un ciclo del grafo de llamadas
+        (recursión directa o mutua)
+        """
+        grafo = {}
+        self._registrar_llamadas(ctx, None, grafo)
+
+        recursivas = set()
+        for inicio in grafo:
+            # DFS desde los llamados de 'inicio' buscando volver a él
+            pendientes = list(grafo[inicio])
+            vistos = set()
+            while pendientes:
+                nombre = pendientes.pop()
+                if nombre == inicio:
+                    recursivas.add(inicio)
+                    break
+                if nombre not in vistos:
+                    vistos.add(nombre)
+                    pendientes.extend(grafo.get(nombre, ()))
+        return recursivas
+
+    def _registrar_llamadas(self, ctx, actual, grafo):
+        if isinstance(ctx, DSLParser.FuncionDefContext):
+            # Las funciones anidadas tienen sus propias aristas
+            actual = ctx.ID().getText()
+            grafo.setdefault(actual, set())
+        elif isinstance(ctx, DSLParser.FuncionLlamadaContext) and actual is not None:
+            # Las nativas tienen prioridad: nunca llaman a una función del usuario
+            if ctx.ID().getText() not in NATIVAS:
+                grafo[actual].add(ctx.ID().getText())
+
+        for i in range(ctx.getChildCount()):
+            hijo = ctx.getChild(i)
+            if isinstance(hijo, ParserRuleContext):
+                self._registrar_llamadas(hijo, actual, grafo)
+
+    # gestion de marcos estáticos
+
+    def en_funcion(self):
+        """Verifica si se está compilando el cuerpo de una función"""
+        return len(self.funciones) > 0
+
+    def entrar_marco(self, nombres=()):
+        """Abre un marco y retorna su layout (el mismo que usará Contexto)"""
+        layout = {}
+        for nombre in nombres:
+            layout.setdefault(nombre, len(layout))
+        self.scopes.append(layout)
+        self.dudosos.append(set())
+        return layout
+
+    def salir_marco(self):
+        self.scopes.pop()
+        self.dudosos.pop()
+
+    def entrar_funcion(self, parametros):
+        """Abre el marco de una función: solo ve sus propios marcos"""
+        self.funciones.append(len(self.scopes))
+        return self.entrar_marco(parametros)
+
+    def salir_funcion(self):
+        self.salir_marco()
+        self.funciones.pop()
+
+    # resolución
+
+    def declarar(self, nombre):
+        """
+        Declara una variable en el marco actual
+        Retorna (LOCAL, 0, slot) o (GLOBAL,) si no hay marco
+        """
+        if not self.scopes:
+            self.globales.add(nombre)
+            return (GLOBAL,)
+        layout = self.scopes[-1]
+        slot = layout.setdefault(nombre, len(layout))
+        self.dudosos[-1].discard(nombre)
+        return (LOCAL, 0, slot)
+
+    def resolver(self, nombre):
+        """Resuelve una lectura de variable"""
+        base = self.funciones[-1] if self.funciones else 0
+        for i in range(len(self.scopes) - 1, base - 1, -1):
+            if nombre in self.dudosos[i]:
+                return (DINAMICO,)
+            slot = self.scopes[i].get(nombre)
+            if slot is not None:
+                return (LOCAL, len(self.scopes) - 1 - i, slot)
+
+        # Dentro de una función, un llamador podría tener la variable
+        if self.funciones and nombre in self.locales_programa:
+            return (DINAMICO,)
+        return (GLOBAL,)
+
+    def resolver_asignacion(self, nombre):
+        """
+        Resuelve una asignación (actualizar_variable):
+        si no se sabe dónde existe, la variable puede crearse en el marco actual
+        """
+        resolucion = self.resolver(nombre)
+        if resolucion[0] == LOCAL:
+            return resolucion
+        if not self.scopes:
+            # Sin marcos, actualizar_variable crea o actualiza la global
+            self.globales.add(nombre)
+            return (GLOBAL,)
+        if resolucion[0] == GLOBAL and self._global_conocida(nombre):
+            return (GLOBAL,)
+        self.scopes[-1].setdefault(nombre, len(self.scopes[-1]))
+        self.dudosos[-1].add(nombre)
+        return (DINAMICO,)
+
+    def _global_conocida(self, nombre):
+        # Fuera de funciones ningún marco desconocido puede ocultar la global
+        return not self.funciones and nombre in self.globales
+
+    def necesita_marco(self, ctx:DSLParser.BloqueContext):
+        """
+        Verifica si un bloque puede definir variables propias;
+        si no, se ejecuta sin crear un marco
+        """
+        for sentencia in ctx.sentencia():
+            hoja = sentencia.getChild(0)
+            if isinstance(hoja, DSLParser.DeclaracionContext):
+                if hoja.getChild(0).getText() == 'var':
+                    return True
+            elif isinstance(hoja, DSLParser.AsignacionContext):
+                # Solo '=' puede crear la variable ('+=' etc. la requieren)
+                if hoja.getChildCount() == 4 and hoja.operadorAsignacion().getText() == '=':
+                    nombre = hoja.ID().getText()
+                    resolucion = self.resolver(nombre)
+                    if resolucion[0] == DINAMICO or (resolucion[0] == GLOBAL and not self._global_conocida(nombre)):
+                        return True
+            elif isinstance(hoja, (DSLParser.OperacionMLContext, DSLParser.OperacionArchivosContext)):
+                if define_variable(hoja.getChild(0)):
+                    return True
+            elif isinstance(hoja, DSLParser.LanzamientoContext):
+                if define_variable(hoja):
+                    return True
+        return False
@@ -0,0 +1,162 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import socketserver
+import threading
+import time
+import traceback
+from antlr4 import InputStream
+from visitor import Visitor
+from compilador import Compilador
+from cache_arbol import CacheArbol
+from analizador import parsear, ErroresSintaxis
+from optimizador import Optimizador
+from librerias.Contexto import CacheLRU, SIN_VALOR
+from cliente import SOCKET_POR_DEFECTO
+
+
+class ServidorDSL(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Intérprete residente que ejecuta scripts recibidos por un socket Unix:
+    - Los módulos, la gramática y la caché de árboles quedan cargados
+    - Las sesiones con nombre conservan su Visitor (globales, funciones,
+      dataframes y modelos) entre pedidos
+    - Protocolo: una línea JSON por pedido y una línea JSON por respuesta
+    """
+    daemon_threads = True
+
+    def __init__(self, ruta_socket=SOCKET_POR_DEFECTO, compilar=True, tamano_cache=1024):
+        if os.path.exists(ruta_socket):
+            os.unlink(ruta_socket)
+        self.ruta_socket = ruta_socket
+        self.compilar = compilar
+        self.tamano_cache = tamano_cache
+        self.sesiones = {}
+        self.arboles = CacheArbol()
+        self.arboles_codigo = CacheLRU(256)
+
+        # stdout es global al proceso: los scripts se ejecutan de a uno
+        self.candado = threading.Lock()
+        super().__init__(ruta_socket, ManejadorDSL)
+        os.chmod(ruta_socket, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.ruta_socket):
+            os.unlink(self.ruta_socket)
+
+    # pedidos
+
+    def atender(self, pedido):
+        """Ejecuta un pedido y retorna la respuesta (diccionario)"""
+        comando = pedido.get('comando', 'ejecutar')
+        if comando == 'ejecutar':
+            return self.ejecutar(pedido)
+        if comando == 'sesiones':
+            return {'ok': True, 'sesiones': sorted(self.sesiones)}
+        if comando == 'cerrar_sesion':
+            existia = self.sesiones.pop(pedido.get('sesion'), None) is not None
+            return {'ok': existia}
+        if comando == 'detener':
+            # El manejador detiene el servidor después de responder
+            return {'ok': True, 'detenido': True}
+        return {'ok': False, 'error': f"Comando desconocido: '{comando}'"}
+
+    def ejecutar(self, pedido):
+        tiempos = {}
+        salida = io.StringIO()
+        error = None
+        with self.candado:
+            inicio = time.perf_counter()
+            try:
+                errores = ErroresSintaxis()
+                tree = self.obtener_arbol(pedido, tiempos, errores)
+                if errores.mensajes:
+                    # Los errores van al cliente; el programa no se ejecuta
+                    error = "Errores de sintaxis:\n" + "\n".join(errores.mensajes)
+                else:
+                    self.ejecutar_arbol(tree, pedido, salida)
+            except Exception:
+                error = traceback.format_exc()
+            tiempos['total'] = time.perf_counter() - inicio
+        return {'ok': error is None, 'salida': salida.getvalue(), 'error': error, 'tiempos': tiempos}
+
+    def ejecutar_arbol(self, tree, pedido, salida):
+        visitor = self.obtener_visitor(pedido.get('sesion'))
+        with contextlib.redirect_stdout(salida):
+            try:
+                if pedido.get('compilar', self.compilar):
+                    Compilador(visitor).compilar_programa(tree)()
+                else:
+                    visitor.visit(tree)
+            finally:
+                # Un error a mitad de una llamada no debe dejar
+                # marcos abiertos en la sesión
+                visitor.contexto.limpiar_locales()
+
+    def obtener_arbol(self, pedido, tiempos, errores):
+        """
+        Árbol optimizado desde 'archivo' (caché en disco) o desde 'codigo'
+        (caché en memoria); 'errores' (ErroresSintaxis) recibe los errores
+        de sintaxis
+        """
+        if 'archivo' in pedido:
+            return Optimizador().optimizar(self.arboles.obtener_arbol(pedido['archivo'], tiempos, errores))
+
+        codigo = pedido['codigo']
+        clave = hashlib.sha256(codigo.encode('utf-8')).hexdigest()
+        tree = self.arboles_codigo.obtener(clave)
+        if tree is SIN_VALOR:
+            tree, _ = parsear(InputStream(codigo), tiempos, errores)
+            Optimizador().optimizar(tree)
+            if not errores.mensajes:
+                self.arboles_codigo.guardar(clave, tree)
+        return tree
+
+    def obtener_visitor(self, sesion):
+        """Visitor de la sesión (se crea la primera vez) o uno nuevo sin sesión"""
+        if sesion is not None and sesion in self.sesiones:
+            return self.sesiones[sesion]
+        visitor = Visitor()
+        visitor.contexto.tamano_cache = self.tamano_cache
+        if sesion is not None:
+            self.sesiones[sesion] = visitor
+        return visitor
+
+
+class ManejadorDSL(socketserver.StreamRequestHandler):
+    """Atiende una conexión: una línea JSON por pedido"""
+
+    def handle(self):
+        for linea in self.rfile:
+            if not linea.strip():
+                continue
+            try:
+                respuesta = self.server.atender(json.loads(linea))
+            except (ValueError, KeyError) as e:
+                respuesta = {'ok': False, 'error': f"Pedido inválido: {e}"}
+            self.wfile.write(json.dumps(respuesta).encode('utf-8') + b'\n')
+            self.wfile.flush()
+            if respuesta.get('detenido'):
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+if __name__ == '__main__':
+    opciones = argparse.ArgumentParser(description="Servidor residente del intérprete DSL")
+    opciones.add_argument('--socket', default=SOCKET_POR_DEFECTO)
+    opciones.add_argument('--interpretar', action='store_true',
+                          help="ejecutar con el Visitor, sin compilar")
+    opciones.add_argument('--tamano-cache', type=int, default=1024,
+                          help="entradas de la caché de cada función pura (0 la desactiva)")
+    args = opciones.parse_args()
+
+    with ServidorDSL(args.socket, not args.interpretar, args.tamano_cache) as servidor:
+        print(f"Servidor DSL escuchando en {args.socket}")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
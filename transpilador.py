@@ -0,0 +1,588 @@
+import hashlib
+import marshal
+import os
+import sys
+from antlr4.tree.Tree import TerminalNodeImpl
+from DSLParser import DSLParser
+from compilador import Compilador, _memoizar
+from optimizador import CicloForOptimizado, CicloWhileOptimizado, ExpresionInvariante
+from resolutor import Resolutor, LOCAL, GLOBAL, define_variable, variables_muertas
+from librerias.Contexto import CacheLRU
+from librerias.Nativas import NATIVAS
+from cache_arbol import directorio_cache, version_gramatica
+
+# Cambia si cambia el código que se genera
+VERSION = 8
+
+# Operadores que se escriben tal cual en Python ('+' y 'and'/'or' no:
+# concatenan strings / evalúan ambos lados)
+OPERADORES_BINARIOS = {
+    '**': '**', '*': '*', '/': '/', '%': '%', '-': '-',
+    '<': '<', '<=': '<=', '>': '>', '>=': '>=', '==': '==', '!=': '!=', 'in': 'in',
+}
+FUNCIONES_BINARIAS = {'+': '_sumar', 'and': '_y', 'or': '_o'}
+
+ENCABEZADO = '''\
+from compilador import (_sumar, _indexar, _rebanar, _indexar_2d, _rango, _mostrar,
+                        asignar_en_lista, asignar_en_matriz, OPERADORES_BINARIOS)
+from librerias.Nativas import NATIVAS
+from librerias.Texto import imprimir
+
+_y = OPERADORES_BINARIOS['and']
+_o = OPERADORES_BINARIOS['or']
+'''
+
+
+class NoSoportado(Exception):
+    """El programa usa algo que el transpilador no traduce"""
+
+
+def _ruta_de(ctx):
+    """Posición de un nodo como índices de hijos desde la raíz"""
+    ruta = []
+    while ctx.parentCtx is not None:
+        padre = ctx.parentCtx
+        ruta.append(padre.children.index(ctx))
+        ctx = padre
+    return tuple(reversed(ruta))
+
+
+class Transpilador:
+    """
+    Traduce el árbol a código fuente de Python:
+    - Cada función del DSL es un 'def' y sus variables son locales de Python
+      (el Resolutor decide las direcciones, igual que en el Compilador)
+    - 'for ... in range' es un for nativo sobre range()
+    - Las globales viven en contexto.scope_global
+    - ML, archivos y gráficos del nivel superior se delegan al Visitor, y
+      las funciones recursivas a las closures del Compilador (pila explícita)
+    Lo que no puede traducirse sin cambiar la semántica (scoping dinámico,
+    funciones anidadas, ML dentro de bloques) lanza NoSoportado
+    """
+
+    def __init__(self):
+        self.resolutor = Resolutor()
+        self._recursivas = set()
+        self._definiciones = {}   # nombre -> cantidad de funcionDef
+        self._unicas = {}         # nombre -> cantidad de parámetros
+        self._locales = {}        # (id(layout), slot) -> identificador
+        self._layouts = []        # mantiene vivos los layouts (sus id)
+        self._rutas = {}          # ruta de un nodo -> identificador
+        self._en_programa = True  # nivel superior (programa) o cuerpo de un def
+
+        self._funciones = []      # líneas de los def
+        self._programa = []       # líneas de programa()
+        self._lineas = self._programa
+        self._nivel = 2
+
+        self._sentencias = {
+            DSLParser.DeclaracionContext: self.declaracion,
+            DSLParser.AsignacionContext: self.asignacion,
+            DSLParser.CondicionalContext: self.condicional,
+            DSLParser.CicloContext: lambda ctx: self.sentencia(ctx),
+            DSLParser.CicloForContext: self.ciclo_for,
+            DSLParser.CicloWhileContext: self.ciclo_while,
+            DSLParser.FuncionDefContext: self.funcion_def,
+            DSLParser.RetornoContext: self.retorno,
+            DSLParser.ImpresionContext: self.impresion,
+            DSLParser.BloqueContext: self.bloque,
+            DSLParser.ExpresionContext: lambda ctx: self._emitir(self.expresion(ctx)),
+            # Nodos que reemplaza el Optimizador (en Python no hace falta
+            # recordar las invariantes: son locales o lecturas de g)
+            CicloForOptimizado: self.ciclo_for,
+            CicloWhileOptimizado: self.ciclo_while,
+            ExpresionInvariante: lambda ctx: self._emitir(self.expresion(ctx)),
+        }
+
+    def transpilar(self, ctx:DSLParser.ProgramaContext, nombre="<dsl>"):
+        """Código fuente de un módulo con crear(entorno) -> programa()"""
+        self.resolutor.analizar_programa(ctx)
+        self._recursivas = self.resolutor.funciones_recursivas(ctx)
+        self._contar_definiciones(ctx)
+
+        muertas = variables_muertas(ctx)
+        for k, sentencia in enumerate(ctx.sentencia()):
+            self._indice = k
+            self.sentencia(sentencia)
+            if muertas[k]:
+                # Último uso de estas variables (rt.liberar no hace nada
+                # si el Visitor no libera memoria)
+                self._emitir(f"_liberar({muertas[k]!r})")
+
+        lineas = [f"# Generado por transpilador.py a partir de {nombre!r}: no editar", ENCABEZADO, "",
+                  "def crear(rt):",
+                  "    g = rt.globales",
+                  "    _llamar = rt.funcion",
+                  "    _no_definida = rt.no_definida",
+                  "    _liberar = rt.liberar",
+                  "    _s = rt.sentencias"]
+        for ruta, identificador in self._rutas.items():
+            accion = 'definidor' if identificador.startswith('_d') else 'visitar'
+            lineas.append(f"    {identificador} = rt.{accion}({ruta!r})")
+        celdas = sorted(f"c_{nombre}" for nombre in self._unicas)
+        for celda in celdas:
+            lineas.append(f"    {celda} = None")
+        lineas.append("")
+        lineas.extend(self._funciones)
+        lineas.append("    def programa():")
+        if celdas:
+            lineas.append(f"        nonlocal {', '.join(celdas)}")
+        lineas.extend(self._programa)
+        lineas.append("        pass")
+        lineas.append("    return programa")
+        return "\n".join(lineas) + "\n"
+
+    def _contar_definiciones(self, ctx):
+        if isinstance(ctx, DSLParser.FuncionDefContext):
+            nombre = ctx.ID().getText()
+            self._definiciones[nombre] = self._definiciones.get(nombre, 0) + 1
+        for i in range(ctx.getChildCount()):
+            hijo = ctx.getChild(i)
+            if not isinstance(hijo, TerminalNodeImpl):
+                self._contar_definiciones(hijo)
+
+    # --- Emisión ---
+
+    def _emitir(self, linea):
+        self._lineas.append("    " * self._nivel + linea)
+
+    def _cuerpo(self, traducir):
+        """Traduce un cuerpo indentado (con 'pass' si quedó vacío)"""
+        self._nivel += 1
+        antes = len(self._lineas)
+        try:
+            traducir()
+        finally:
+            if len(self._lineas) == antes:
+                self._emitir("pass")
+            self._nivel -= 1
+
+    def _local(self, layout, slot, nombre):
+        clave = (id(layout), slot)
+        identificador = self._locales.get(clave)
+        if identificador is None:
+            identificador = f"v{len(self._locales)}_{nombre}"
+            self._locales[clave] = identificador
+        return identificador
+
+    def _marco(self, nombres=()):
+        layout = self.resolutor.entrar_marco(nombres)
+        self._layouts.append(layout)
+        return layout
+
+    def _nodo(self, ctx, prefijo):
+        """Identificador del nodo en el módulo (el Entorno lo ubica por su ruta)"""
+        ruta = _ruta_de(ctx)
+        identificador = self._rutas.get(ruta)
+        if identificador is None:
+            identificador = f"{prefijo}{len(self._rutas)}"
+            self._rutas[ruta] = identificador
+        return identificador
+
+    # --- Sentencias ---
+
+    def sentencia(self, ctx):
+        hijo = ctx.getChild(0)
+        traducir = self._sentencias.get(type(hijo))
+        if traducir is not None:
+            return traducir(hijo)
+
+        # ML, archivos, gráficos y del: el Visitor usa el scope global; dentro
+        # de marcos o funciones necesitaría los marcos de Contexto
+        if self.resolutor.scopes:
+            raise NoSoportado(f"línea {ctx.start.line}: operación dentro de un bloque con variables")
+        if isinstance(hijo, (DSLParser.LanzamientoContext, DSLParser.EsperaContext)):
+            # Las lecturas de g no esperan los Futuros
+            raise NoSoportado(f"línea {ctx.start.line}: spawn / await")
+        if isinstance(hijo, (DSLParser.OperacionMLContext, DSLParser.OperacionArchivosContext)):
+            nombre = define_variable(hijo.getChild(0))
+            if nombre:
+                self.resolutor.declarar(nombre)
+        elif isinstance(hijo, DSLParser.LiberacionContext):
+            self.resolutor.globales.difference_update(id_.getText() for id_ in hijo.ID())
+        self._emitir(f"{self._nodo(hijo, '_n')}()")
+
+    def bloque(self, ctx:DSLParser.BloqueContext):
+        if not self.resolutor.necesita_marco(ctx):
+            for s in ctx.sentencia():
+                self.sentencia(s)
+            return
+
+        self._marco()
+        try:
+            for s in ctx.sentencia():
+                self.sentencia(s)
+        finally:
+            self.resolutor.salir_marco()
+
+    def _lectura(self, nombre):
+        resolucion = self.resolutor.resolver(nombre)
+        if resolucion[0] == LOCAL:
+            layout = self.resolutor.scopes[-1 - resolucion[1]]
+            return self._local(layout, resolucion[2], nombre)
+        if resolucion[0] == GLOBAL:
+            return f"g[{nombre!r}]"
+        raise NoSoportado(f"'{nombre}' depende del scoping dinámico")
+
+    def _escritura(self, resolucion, nombre):
+        if resolucion[0] == LOCAL:
+            layout = self.resolutor.scopes[-1 - resolucion[1]]
+            return self._local(layout, resolucion[2], nombre)
+        if resolucion[0] == GLOBAL:
+            return f"g[{nombre!r}]"
+        raise NoSoportado(f"'{nombre}' depende del scoping dinámico")
+
+    def declaracion(self, ctx:DSLParser.DeclaracionContext):
+        valor = self.expresion(ctx.expresion())
+        nombre = ctx.ID().getText()
+        if ctx.getChild(0).getText() == 'global':
+            if not self.resolutor.scopes and not self.resolutor.en_funcion():
+                self.resolutor.globales.add(nombre)
+            destino = self._escritura((GLOBAL,), nombre)
+        else:
+            destino = self._escritura(self.resolutor.declarar(nombre), nombre)
+        self._emitir(f"{destino} = {valor}")
+
+    def asignacion(self, ctx:DSLParser.AsignacionContext):
+        # Misma semántica que compilar_asignacion (cada expresión una sola vez)
+        nombre = ctx.ID().getText()
+        expresiones = [self.expresion(e) for e in ctx.expresion()]
+        operador = ctx.operadorAsignacion().getText()
+
+        if len(expresiones) == 1:
+            if operador == '=':
+                destino = self._escritura(self.resolutor.resolver_asignacion(nombre), nombre)
+                self._emitir(f"{destino} = {expresiones[0]}")
+                return
+            # x op= v: la variable debe existir (se lee y se escribe en el mismo lugar)
+            destino = self._lectura(nombre)
+            self._emitir(f"{destino} = {self._binaria(operador[0], destino, expresiones[0])}")
+            return
+
+        lista = self._lectura(nombre)
+        temporales = [f"_t{i}" for i in range(len(expresiones))]
+        for temporal, expresion in zip(temporales, expresiones):
+            self._emitir(f"{temporal} = {expresion}")
+        if operador != '=':
+            temporales.append(f"OPERADORES_BINARIOS[{operador[0]!r}]")
+        asignar = 'asignar_en_lista' if len(expresiones) == 2 else 'asignar_en_matriz'
+        self._emitir(f"{asignar}({nombre!r}, {lista}, {', '.join(temporales)})")
+
+    def condicional(self, ctx:DSLParser.CondicionalContext):
+        expr_idx = 0
+        bloque_idx = 0
+        for i in range(ctx.getChildCount()):
+            texto = ctx.getChild(i).getText()
+            if texto == 'if' or texto == 'elif':
+                condicion = self.expresion(ctx.expresion(expr_idx))
+                self._emitir(f"{texto} {condicion}:")
+                self._cuerpo(lambda b=ctx.bloque(bloque_idx): self.bloque(b))
+                expr_idx += 1
+                bloque_idx += 1
+            elif texto == 'else':
+                self._emitir("else:")
+                self._cuerpo(lambda b=ctx.bloque(bloque_idx): self.bloque(b))
+
+    def ciclo_for(self, ctx:DSLParser.CicloForContext):
+        nombre_var = ctx.ID().getText()
+        expresiones = [self.expresion(e) for e in ctx.expresion()]
+        if ctx.getChild(3).getText() == 'range':
+            iterable = f"_rango({', '.join(expresiones)})"
+        else:
+            iterable = expresiones[0]
+
+        layout = self._marco([nombre_var])
+        try:
+            self._emitir(f"for {self._local(layout, 0, nombre_var)} in {iterable}:")
+            self._cuerpo(lambda: self.bloque(ctx.bloque()))
+        finally:
+            self.resolutor.salir_marco()
+
+    def ciclo_while(self, ctx:DSLParser.CicloWhileContext):
+        self._emitir(f"while {self.expresion(ctx.expresion())}:")
+        self._cuerpo(lambda: self.bloque(ctx.bloque()))
+
+    def funcion_def(self, ctx:DSLParser.FuncionDefContext):
+        nombre = ctx.ID().getText()
+        if self.resolutor.scopes:
+            raise NoSoportado(f"función '{nombre}' definida dentro de otra función o bloque")
+
+        if nombre in self._recursivas:
+            # Recursiva: la define la closure del Compilador (pila explícita)
+            if ctx.parentCtx.parentCtx.parentCtx is not None:
+                raise NoSoportado(f"función recursiva '{nombre}' fuera del nivel superior")
+            self._emitir(f"_s[{self._indice}]()")
+            return
+
+        parametros = []
+        if ctx.parametros():
+            parametros = [x.getText() for x in ctx.parametros().ID()]
+        if len(set(parametros)) != len(parametros):
+            raise NoSoportado(f"función '{nombre}' con parámetros repetidos")
+
+        identificador = f"f{len(self._rutas)}_{nombre}"
+        definir = self._nodo(ctx, '_d')
+
+        # El def va al nivel de crear(); programa() lo registra en su lugar
+        lineas, nivel, en_programa = self._lineas, self._nivel, self._en_programa
+        layout = self.resolutor.entrar_funcion(parametros)
+        self._layouts.append(layout)
+        self._lineas, self._nivel, self._en_programa = self._funciones, 1, False
+        try:
+            argumentos = [self._local(layout, i, p) for i, p in enumerate(parametros)]
+            self._emitir(f"def {identificador}({', '.join(argumentos)}):")
+            self._cuerpo(lambda: [self.sentencia(s) for s in ctx.bloque().sentencia()])
+            self._emitir("")
+        finally:
+            self.resolutor.salir_funcion()
+            self._lineas, self._nivel, self._en_programa = lineas, nivel, en_programa
+
+        if self._definiciones[nombre] == 1:
+            self._unicas[nombre] = len(parametros)
+            self._emitir(f"c_{nombre} = {definir}({identificador})")
+        else:
+            self._emitir(f"{definir}({identificador})")
+
+    def retorno(self, ctx:DSLParser.RetornoContext):
+        valor = self.expresion(ctx.expresion()) if ctx.expresion() else "None"
+        if self._en_programa:
+            # 'return' fuera de una función: termina el programa
+            self._emitir(valor)
+            self._emitir("return")
+        else:
+            self._emitir(f"return {valor}")
+
+    def impresion(self, ctx:DSLParser.ImpresionContext):
+        valor = self.expresion(ctx.expresion())
+        funcion = 'imprimir' if ctx.getChild(0).getText() == 'print' else '_mostrar'
+        self._emitir(f"{funcion}({valor})")
+
+    # --- Expresiones ---
+
+    def expresion(self, ctx):
+        """Expresión de Python equivalente (siempre entre paréntesis si es compuesta)"""
+        if isinstance(ctx, DSLParser.ListaContext):
+            return f"[{', '.join(self.expresion(e) for e in ctx.expresion())}]"
+        if isinstance(ctx, DSLParser.MatrizContext):
+            return f"[{', '.join(self.expresion(l) for l in ctx.lista())}]"
+        if isinstance(ctx, DSLParser.DiccionarioContext):
+            pares = (f"{self.expresion(p.expresion(0))}: {self.expresion(p.expresion(1))}" for p in ctx.par())
+            return f"{{{', '.join(pares)}}}"
+        if isinstance(ctx, DSLParser.ConjuntoContext):
+            return f"{{{', '.join(self.expresion(e) for e in ctx.expresion())}}}"
+
+        if ctx.NUMERO():
+            return repr(float(ctx.NUMERO().getText()))
+        if ctx.STRING():
+            return repr(ctx.STRING().getText()[1:-1])
+        if ctx.BOOLEAN():
+            return repr(ctx.BOOLEAN().getText() in ('true', 'True'))
+        if ctx.ID():
+            return self._lectura(ctx.ID().getText())
+        if ctx.lista():
+            return self.expresion(ctx.lista())
+        if ctx.matriz():
+            return self.expresion(ctx.matriz())
+        if ctx.diccionario():
+            return self.expresion(ctx.diccionario())
+        if ctx.conjunto():
+            return self.expresion(ctx.conjunto())
+        if ctx.funcionLlamada():
+            return self.llamada(ctx.funcionLlamada())
+
+        n_hijos = ctx.getChildCount()
+        if n_hijos == 3 and ctx.getChild(0).getText() == '(':
+            return self.expresion(ctx.expresion(0))
+
+        if n_hijos == 2:
+            op = ctx.getChild(0).getText()
+            if op == '-' or op == 'not':
+                return f"({op} {self.expresion(ctx.expresion(0))})"
+
+        if n_hijos == 3:
+            op = ctx.getChild(1).getText()
+            if op in OPERADORES_BINARIOS or op in FUNCIONES_BINARIAS:
+                return self._binaria(op, *[self.expresion(e) for e in ctx.expresion()])
+
+        if n_hijos == 4 and ctx.getChild(1).getText() == '[':
+            return f"_indexar({', '.join(self.expresion(e) for e in ctx.expresion())})"
+        if n_hijos == 6 and ctx.getChild(1).getText() == '[' and ctx.getChild(3).getText() == ':':
+            return f"_rebanar({', '.join(self.expresion(e) for e in ctx.expresion())})"
+        if n_hijos == 7:
+            return f"_indexar_2d({', '.join(self.expresion(e) for e in ctx.expresion())})"
+        return "None"
+
+    def _binaria(self, op, izquierda, derecha):
+        if op in FUNCIONES_BINARIAS:
+            return f"{FUNCIONES_BINARIAS[op]}({izquierda}, {derecha})"
+        return f"({izquierda} {OPERADORES_BINARIOS[op]} {derecha})"
+
+    def llamada(self, ctx:DSLParser.FuncionLlamadaContext):
+        nombre = ctx.ID().getText()
+        argumentos = []
+        if ctx.argumentos():
+            argumentos = [self.expresion(e) for e in ctx.argumentos().expresion()]
+        argumentos = ', '.join(argumentos)
+
+        if nombre in NATIVAS:
+            return f"NATIVAS[{nombre!r}]({argumentos})"
+
+        # La existencia se verifica antes de evaluar los argumentos. Si está
+        # definida una sola vez con la misma aridad se llama directo al def
+        if self._unicas.get(nombre) == len(ctx.argumentos().expresion() if ctx.argumentos() else ()):
+            return f"(c_{nombre}({argumentos}) if c_{nombre} is not None else _no_definida({nombre!r}))"
+        return f"(_f({argumentos}) if (_f := _llamar({nombre!r})) is not None else None)"
+
+
+class Entorno:
+    """Lo que un módulo generado toma del intérprete al ejecutarse"""
+
+    def __init__(self, compilador, tree):
+        self.contexto = compilador.contexto
+        self.visitor = compilador.visitor
+        self.globales = self.contexto.scope_global
+        self.sentencias = compilador.sentencias_programa
+        self.puras = compilador._puras
+        self.registros = compilador._registros
+        self.tree = tree
+        if not self.visitor.liberar_memoria:
+            self.liberar = lambda nombres: None
+
+    def nodo(self, ruta):
+        ctx = self.tree
+        for i in ruta:
+            ctx = ctx.getChild(i)
+        return ctx
+
+    def visitar(self, ruta):
+        """Sentencia delegada al Visitor"""
+        visitor = self.visitor
+        ctx = self.nodo(ruta)
+        return lambda: visitor.visit(ctx)
+
+    def definidor(self, ruta):
+        """
+        Función que registra un def generado en Contexto (memoizado si la
+        función es pura) y retorna lo que deben llamar los demás def
+        """
+        ctx = self.nodo(ruta)
+        nombre = ctx.ID().getText()
+        parametros = [x.getText() for x in ctx.parametros().ID()] if ctx.parametros() else []
+        cuerpo_ctx = ctx.bloque()
+        contexto = self.contexto
+        puras = self.puras
+        llamadas = set().union(*(registro['llamadas'] for registro in self.registros.get(nombre, ())))
+
+        def definir(funcion):
+            compilado = lambda argumentos: funcion(*argumentos)
+            cache = None
+            llamable = funcion
+            if nombre in puras and contexto.tamano_cache > 0:
+                cache = CacheLRU(contexto.tamano_cache)
+                compilado = _memoizar(compilado, cache)
+                llamable = lambda *argumentos: compilado(argumentos)
+            contexto.definir_funcion(nombre, parametros, cuerpo_ctx, compilado, cache, llamadas)
+            return llamable
+        return definir
+
+    def funcion(self, nombre):
+        """Llamada por nombre, con las mismas verificaciones que el Compilador"""
+        funcion_info = self.contexto.funciones.get(nombre)
+        if funcion_info is None:
+            return self.no_definida(nombre)  # None: los argumentos no se evalúan
+        parametros = funcion_info['parametros']
+        visitor = self.visitor
+
+        def llamar(*argumentos):
+            argumentos = list(argumentos)
+            if len(argumentos) != len(parametros):
+                print(f"Error: Función '{nombre}' espera {len(parametros)} argumentos, se recibieron {len(argumentos)}")
+                return None
+            ejecutar = funcion_info['compilado']
+            if ejecutar is not None:
+                return ejecutar(argumentos)
+            return visitor.llamar_funcion(nombre, funcion_info, argumentos)
+        return llamar
+
+    def liberar(self, nombres):
+        """Libera las variables del nivel superior después de su último uso"""
+        self.visitor.liberar_muertas(nombres)
+
+    def no_definida(self, nombre):
+        print(f"Error: Función '{nombre}' no definida")
+        return None
+
+
+class CacheTranspilacion:
+    """
+    Módulos generados en disco ('.dsl_cache' junto al script):
+    - <hash>.py es el código generado (para leerlo)
+    - <hash>.bytecode es su código objeto con marshal (lo que se ejecuta)
+    - <hash>.sin_transpilar marca los scripts que usan el Compilador
+    La clave es el hash del script, de la gramática y de VERSION
+    """
+
+    def __init__(self, directorio=None):
+        self.directorio = directorio
+
+    def base(self, archivo, fuente, optimizado=False):
+        h = hashlib.sha256()
+        h.update(fuente)
+        h.update(b'optimizado' if optimizado else b'')
+        h.update(version_gramatica().encode('utf-8'))
+        # El código generado llama a las nativas registradas por nombre
+        h.update(','.join(sorted(NATIVAS)).encode('utf-8'))
+        h.update(f"{VERSION}:{marshal.version}:{sys.version_info[:2]}".encode('utf-8'))
+        directorio = self.directorio if self.directorio is not None else directorio_cache(archivo)
+        return os.path.join(directorio, h.hexdigest())
+
+    def obtener_codigo(self, archivo, tree, optimizado=False):
+        """
+        Código objeto del módulo generado, o None si no es transpilable;
+        'optimizado' indica si el árbol pasó por el Optimizador
+        """
+        with open(archivo, 'rb') as f:
+            base = self.base(archivo, f.read(), optimizado)
+
+        if os.path.exists(base + '.sin_transpilar'):
+            return None
+        try:
+            with open(base + '.bytecode', 'rb') as f:
+                return marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+
+        try:
+            fuente = Transpilador().transpilar(tree, os.path.basename(archivo))
+            codigo = compile(fuente, base + '.py', 'exec')
+        except (NoSoportado, SyntaxError, RecursionError) as e:
+            self._escribir(base + '.sin_transpilar', str(e).encode('utf-8'))
+            return None
+        self._escribir(base + '.py', fuente.encode('utf-8'))
+        self._escribir(base + '.bytecode', marshal.dumps(codigo))
+        return codigo
+
+    def _escribir(self, ruta, datos):
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            temporal = f"{ruta}.{os.getpid()}.tmp"
+            with open(temporal, 'wb') as f:
+                f.write(datos)
+            os.replace(temporal, ruta)
+        except OSError:
+            pass  # sin permisos de escritura: se transpila en cada ejecución
+
+
+def preparar_programa(archivo, tree, visitor, optimizado=False, cache=None):
+    """
+    Programa listo para ejecutar: el módulo transpilado si es posible,
+    si no las closures del Compilador
+    """
+    compilador = Compilador(visitor)
+    compilado = compilador.compilar_programa(tree)
+    codigo = (cache or CacheTranspilacion()).obtener_codigo(archivo, tree, optimizado)
+    if codigo is None:
+        return compilado
+    modulo = {'__name__': 'dsl_transpilado'}
+    exec(codigo, modulo)
+    return modulo['crear'](Entorno(compilador, tree))
@@ -1,26 +1,55 @@
 from antlr4 import *
 from DSLParser import DSLParser
 from DSLVisitor import DSLVisitor
-from librerias.Contexto import Contexto, MemoriaDataframes, GestorModelos
+from librerias.Contexto import Contexto, MemoriaDataframes, GestorModelos, SIN_VALOR
 from librerias.RedesNeuronales import RedesNeuronales
 from librerias.Agrupamiento import Agrupamiento
 from librerias.Graficos import Graficos
 from librerias.ManejoArchivos import ManejoArchivos
 from librerias.Matrices import Matrices
 from librerias.Aritmetica import Aritmetica
-
-class ReturnException(Exception):
-    def __init__(self, value):
-        self.value=value
+from librerias.Nativas import NATIVAS
+from librerias.Texto import imprimir
+from librerias.Vistas import LISTAS, desprender, rebanar
+from librerias.Vectores import Vector
+from librerias.Tareas import lanzar
+from optimizador import olvidar_invariantes, LITERALES, OPERADORES_BINARIOS
+from ciclo_paralelo import ejecutar_ciclo_paralelo
+from resolutor import variables_muertas
+
+# Estado que propagan bloques y ciclos cuando se ejecuta un 'return'
+# (el valor queda en el registro de la llamada actual)
+RETORNO = object()
+
+# Operaciones de ML que se pueden lanzar con 'spawn' (las que entrenan)
+LANZABLES = (DSLParser.RegresionLinealContext, DSLParser.PerceptronSimpleContext,
+             DSLParser.MlpEntrenarContext, DSLParser.KmeansContext,
+             DSLParser.DbscanContext, DSLParser.JerarquicoContext)
 
 class Visitor(DSLVisitor):
     def __init__(self):
         self.contexto=Contexto()
         self.dataframes=MemoriaDataframes()
         self.modelos=GestorModelos()
+        # Futuros de las operaciones lanzadas con 'spawn'
+        self.tareas=[]
+        # Operación de ML que se está lanzando (ejecutar_ml la envía al pool)
+        self._lanzamiento=None
+        # Liberar cada variable del nivel superior después de su último
+        # uso (no en una sesión, donde el próximo programa puede leerlas)
+        self.liberar_memoria=False
+        # Metricas que cuentan lo que ejecuta el intérprete (None: sin medir)
+        self.metricas=None
         
     def visitPrograma(self, ctx:DSLParser.ProgramaContext):
-        return self.visitChildren(ctx)
+        sentencias = ctx.sentencia()
+        muertas = variables_muertas(ctx) if self.liberar_memoria else [()] * len(sentencias)
+        for sentencia, nombres in zip(sentencias, muertas):
+            if self.visit(sentencia) is RETORNO:
+                break
+            if nombres:
+                self.liberar_muertas(nombres)
+        self.esperar_tareas()
 
     def visitSentencia(self, ctx:DSLParser.SentenciaContext):
         return self.visitChildren(ctx)
@@ -29,7 +58,8 @@ class Visitor(DSLVisitor):
         self.contexto.entrar_scope('bloque')
         try:
             for sentencia in ctx.sentencia():
-                self.visit(sentencia)
+                if self.visit(sentencia) is RETORNO:
+                    return RETORNO
         finally:
             self.contexto.salir_scope()
 
@@ -47,35 +77,54 @@ class Visitor(DSLVisitor):
 
     def visitAsignacion(self, ctx:DSLParser.AsignacionContext):
         nombre=ctx.ID().getText()
-        valor=self.visit(ctx.expresion(0)) 
-        # asignacion : ID '=' expresion ';'
-        #            | ID '[' expresion ']' '=' expresion ';'
-        #            | ID '[' expresion ']' '[' expresion ']' '=' expresion ';'
-        
-        if ctx.getChildCount()==4: # ID '=' expresion ';'
+        # asignacion : ID op expresion ';'
+        #            | ID '[' expresion ']' op expresion ';'
+        #            | ID '[' expresion ']' '[' expresion ']' op expresion ';'
+        # op es '=' o compuesto ('+=', '-=', '*=', '/='): opera con el valor actual
+        # Cada expresión se evalúa una sola vez
+        operador=ctx.operadorAsignacion().getText()
+        operar=None if operador=='=' else OPERADORES_BINARIOS[operador[0]]
+        
+        if ctx.getChildCount()==4: # ID op expresion ';'
             valor=self.visit(ctx.expresion(0))
-            self.contexto.actualizar_variable(nombre, valor)
+            if operar is None:
+                self.contexto.actualizar_variable(nombre, valor)
+            else:
+                valor=self.contexto.operar_variable(nombre, operar, valor)
             
-        elif ctx.getChildCount()==7: # ID '[' expresion ']' '=' expresion ';'
+        elif ctx.getChildCount()==7: # ID '[' expresion ']' op expresion ';'
             indice=self.visit(ctx.expresion(0))
             valor=self.visit(ctx.expresion(1))
             lista=self.contexto.obtener_variable(nombre)
-            if isinstance(lista, list):
+            if isinstance(lista, LISTAS):
                 if 0<= indice <len(lista):
+                    indice=int(indice)
+                    if operar is not None:
+                        valor=operar(lista[indice], valor)
+                    desprender(lista)
                     lista[indice]=valor
                 else:
                     print(f"Error: Indice {indice} fuera de rango para lista '{nombre}'")
+            elif isinstance(lista, dict) or type(lista) is Vector:
+                if operar is not None:
+                    valor=operar(lista[indice], valor)
+                lista[indice]=valor
             else:
                 print(f"Error: Variable '{nombre}' no es una lista")
                 
-        elif ctx.getChildCount()==10: # ID '[' expresion ']' '[' expresion ']' '=' expresion ';'
+        elif ctx.getChildCount()==10: # ID '[' expresion ']' '[' expresion ']' op expresion ';'
             fila=self.visit(ctx.expresion(0))
             col=self.visit(ctx.expresion(1))
             valor=self.visit(ctx.expresion(2))
             matriz=self.contexto.obtener_variable(nombre)
-            if isinstance(matriz, list) and isinstance(matriz[0], list):
+            if isinstance(matriz, LISTAS) and isinstance(matriz[0], LISTAS):
                 if 0<= fila <len(matriz) and 0<= col <len(matriz[0]):
-                    matriz[fila][col]=valor
+                    elemento=matriz[int(fila)]
+                    col=int(col)
+                    if operar is not None:
+                        valor=operar(elemento[col], valor)
+                    desprender(elemento)
+                    elemento[col]=valor
                 else:
                     print(f"Error: Indices [{fila}][{col}] fuera de rango para matriz '{nombre}'")
             else:
@@ -89,8 +138,7 @@ class Visitor(DSLVisitor):
         # 'if' '(' expresion ')' bloque ('elif' '(' expresion ')' bloque)* ('else' bloque)?
         condicion=self.visit(ctx.expresion(0))
         if condicion:
-            self.visit(ctx.bloque(0))
-            return
+            return self.visit(ctx.bloque(0))
 
         i=1
         expr_idx=1
@@ -102,19 +150,45 @@ class Visitor(DSLVisitor):
                 cond_elif=self.visit(ctx.expresion(expr_idx))
                 expr_idx+=1
                 if cond_elif:
-                    self.visit(ctx.bloque(bloque_idx))
-                    return
+                    return self.visit(ctx.bloque(bloque_idx))
                 bloque_idx+=1
             elif child.getText()=='else':
-                self.visit(ctx.bloque(bloque_idx))
-                return
+                return self.visit(ctx.bloque(bloque_idx))
             i+=1
 
     def visitCicloFor(self, ctx:DSLParser.CicloForContext):
         # 'for' ID 'in' 'range' '(' expresion (',' expresion (',' expresion)?)? ')' bloque
         # 'for' ID 'in' expresion bloque
         nombre_var=ctx.ID().getText()
-        
+        iterable=self._iterable(ctx)
+            
+        olvidar_invariantes(ctx)
+        self.contexto.entrar_scope('ciclo')
+        try:
+            # Definir la variable de iteración en el scope del ciclo
+            self.contexto.definir_local(nombre_var, 0) 
+            # y asignarla directo en su slot (sin buscarla en cada iteración)
+            marco=self.contexto.scopes_locales[-1]
+            valores=marco.valores
+            slot=marco.nombres[nombre_var]
+            sentencias=ctx.bloque().sentencia()
+
+            # Un solo scope para el cuerpo, vaciado al terminar cada iteración
+            self.contexto.entrar_scope('bloque')
+            try:
+                for val in iterable:
+                    valores[slot]=val
+                    for sentencia in sentencias:
+                        if self.visit(sentencia) is RETORNO:
+                            return RETORNO
+                    self.contexto.vaciar_scope()
+            finally:
+                self.contexto.salir_scope()
+        finally:
+            self.contexto.salir_scope()
+
+    def _iterable(self, ctx):
+        # Lo que recorre un for / pfor: range(...) o el valor de la expresión
         if ctx.getChild(3).getText()=='range':
             start=0
             step=1
@@ -128,32 +202,32 @@ class Visitor(DSLVisitor):
                 stop=self.visit(ctx.expresion(1))
                 step=self.visit(ctx.expresion(2))
             
-            iterable=range(int(start), int(stop), int(step))
-        else:
-            iterable=self.visit(ctx.expresion(0))
-            
-        self.contexto.entrar_scope('ciclo')
-        try:
-            # Definir la variable de iteración en el scope del ciclo
-            self.contexto.definir_local(nombre_var, 0) 
-            
-            for val in iterable:
-                self.contexto.actualizar_variable(nombre_var, val)
-                try:
-                    self.visit(ctx.bloque())
-                except Exception as e:
-                    raise e
-        finally:
-            self.contexto.salir_scope()
+            return range(int(start), int(stop), int(step))
+        return self.visit(ctx.expresion(0))
+
+    def visitCicloParalelo(self, ctx:DSLParser.CicloParaleloContext):
+        # 'pfor' ID 'in' ... ('chunk' '=' expresion)? ('reduce' '(' ID ':' ID, ... ')')? bloque
+        # Las iteraciones corren en el pool de procesos (ver ciclo_paralelo.py)
+        opciones=ctx.opcionesParalelo()
+        chunk=self.visit(opciones.expresion()) if opciones.expresion() else None
+        reducciones=[(r.ID(0).getText(), r.ID(1).getText()) for r in opciones.reduccion()]
+        return ejecutar_ciclo_paralelo(self, ctx, ctx.ID().getText(), self._iterable(ctx), chunk, reducciones)
 
     def visitCicloWhile(self, ctx:DSLParser.CicloWhileContext):
+        olvidar_invariantes(ctx)
         self.contexto.entrar_scope('ciclo')
         try:
-            while self.visit(ctx.expresion()):
-                try:
-                    self.visit(ctx.bloque())
-                except Exception as e:
-                    raise e
+            sentencias=ctx.bloque().sentencia()
+            # La condición se evalúa con el scope del cuerpo vacío: no ve nada de él
+            self.contexto.entrar_scope('bloque')
+            try:
+                while self.visit(ctx.expresion()):
+                    for sentencia in sentencias:
+                        if self.visit(sentencia) is RETORNO:
+                            return RETORNO
+                    self.contexto.vaciar_scope()
+            finally:
+                self.contexto.salir_scope()
         finally:
             self.contexto.salir_scope()
 
@@ -172,17 +246,25 @@ class Visitor(DSLVisitor):
         valor = None
         if ctx.expresion():
             valor = self.visit(ctx.expresion())
-        raise ReturnException(valor)
+        llamada = self.contexto.obtener_llamada_actual()
+        if llamada:
+            llamada.valor_retorno = valor
+        return RETORNO
 
     def visitFuncionLlamada(self, ctx:DSLParser.FuncionLlamadaContext):
         nombre = ctx.ID().getText()
+        # Las nativas (len, sum, sqrt...) se buscan antes que las del usuario
+        nativa = NATIVAS.get(nombre)
+        if nativa is not None:
+            argumentos = [self.visit(e) for e in ctx.argumentos().expresion()] if ctx.argumentos() else []
+            return nativa(*argumentos)
+
         if not self.contexto.existe_funcion(nombre):
             print(f"Error: Función '{nombre}' no definida")
             return None
             
         funcion_info = self.contexto.obtener_funcion(nombre)
         parametros = funcion_info['parametros']
-        cuerpo = funcion_info['cuerpo']
         
         argumentos = []
         if ctx.argumentos():
@@ -192,25 +274,35 @@ class Visitor(DSLVisitor):
             print(f"Error: Función '{nombre}' espera {len(parametros)} argumentos, se recibieron {len(argumentos)}")
             return None
             
+        return self.llamar_funcion(nombre, funcion_info, argumentos)
+
+    def llamar_funcion(self, nombre, funcion_info, argumentos):
+        """
+        Ejecuta una función ya validada y retorna su valor de retorno.
+        Sin cuerpo compilado cada llamada anida varios frames de Python,
+        así que --interpretar admite pocos niveles de recursión (unas
+        decenas); la pila explícita es del Compilador
+        """
+        # Si el compilador dejó el cuerpo compilado, se usa directamente
+        if funcion_info.get('compilado') is not None:
+            return funcion_info['compilado'](argumentos)
+
         # Crear nuevo scope para la función
-        self.contexto.entrar_llamada(nombre, argumentos)
+        llamada = self.contexto.entrar_llamada(nombre, argumentos)
         self.contexto.entrar_scope('funcion')
         
         try:
             # Asignar argumentos a parámetros
-            for param, arg in zip(parametros, argumentos):
+            for param, arg in zip(funcion_info['parametros'], argumentos):
                 self.contexto.definir_local(param, arg)
                 
             # Ejecutar cuerpo
-            self.visit(cuerpo)
-            
-        except ReturnException as e:
-            return e.value
+            self.visit(funcion_info['cuerpo'])
         finally:
             self.contexto.salir_scope()
             self.contexto.salir_llamada()
             
-        return None
+        return llamada.valor_retorno
 
     # --- Expresiones ---
 
@@ -228,6 +320,10 @@ class Visitor(DSLVisitor):
             return self.visit(ctx.lista())
         if ctx.matriz():
             return self.visit(ctx.matriz())
+        if ctx.diccionario():
+            return self.visit(ctx.diccionario())
+        if ctx.conjunto():
+            return self.visit(ctx.conjunto())
         if ctx.funcionLlamada():
             return self.visit(ctx.funcionLlamada())
             
@@ -263,16 +359,22 @@ class Visitor(DSLVisitor):
             if op == '>=': return left >= right
             if op == '==': return left == right
             if op == '!=': return left != right
+            if op == 'in': return left in right
             if op == 'and': return left and right
             if op == 'or': return left or right
 
-        # Indexación de lista/matriz (4 hijos: expr '[' expr ']')
+        # Indexación de lista/matriz/diccionario (4 hijos: expr '[' expr ']')
         if ctx.getChildCount() == 4:
             if ctx.getChild(1).getText() == '[':
                 obj = self.visit(ctx.expresion(0))
                 idx = self.visit(ctx.expresion(1))
-                if isinstance(obj, list):
+                if isinstance(obj, LISTAS):
                     return obj[int(idx)]
+                if isinstance(obj, dict):
+                    return obj[idx]
+                if type(obj) is Vector:
+                    # Posición o máscara (v[v > 0])
+                    return obj[idx]
                 return None
 
         # Slicing (6 hijos: expr '[' expr ':' expr ']')
@@ -281,7 +383,8 @@ class Visitor(DSLVisitor):
                 lista = self.visit(ctx.expresion(0))
                 inicio = self.visit(ctx.expresion(1))
                 fin = self.visit(ctx.expresion(2))
-                return lista[int(inicio):int(fin)]
+                # Las rebanadas largas son vistas (se copian solo si se modifican)
+                return rebanar(lista, inicio, fin)
                 
         # Indexación matriz 2D (7 hijos: expr '[' expr ']' '[' expr ']')
         if ctx.getChildCount() == 7:
@@ -292,6 +395,15 @@ class Visitor(DSLVisitor):
 
         return None
 
+    def visitExpresionInvariante(self, ctx):
+        # Invariante de un ciclo (Optimizador): se evalúa una vez por ejecución del ciclo
+        if ctx.valor is SIN_VALOR:
+            valor = self.visitExpresion(ctx)
+            if type(valor) not in LITERALES:
+                return valor
+            ctx.valor = valor
+        return ctx.valor
+
     def visitLista(self, ctx:DSLParser.ListaContext):
         elementos = []
         if ctx.expresion():
@@ -304,29 +416,108 @@ class Visitor(DSLVisitor):
             filas = [self.visit(l) for l in ctx.lista()]
         return filas
 
+    def visitDiccionario(self, ctx:DSLParser.DiccionarioContext):
+        diccionario = {}
+        for par in ctx.par():
+            clave = self.visit(par.expresion(0))
+            diccionario[clave] = self.visit(par.expresion(1))
+        return diccionario
+
+    def visitConjunto(self, ctx:DSLParser.ConjuntoContext):
+        return {self.visit(e) for e in ctx.expresion()}
+
     def visitImpresion(self, ctx:DSLParser.ImpresionContext):
         valor = self.visit(ctx.expresion())
         if ctx.getChild(0).getText() == 'print':
-            print(valor)
+            imprimir(valor)
         elif ctx.getChild(0).getText() == 'show':
             # 'show' podría ser para dataframes o matrices de forma más bonita
-            if isinstance(valor, list):
-                if len(valor) > 0 and isinstance(valor[0], list):
+            if isinstance(valor, LISTAS):
+                if len(valor) > 0 and isinstance(valor[0], LISTAS):
                     Matrices.mostrar_matriz(valor)
                 else:
-                    print(valor)
+                    imprimir(valor)
             else:
-                print(valor)
+                imprimir(valor)
+        return None
+
+    # --- Liberación de memoria ---
+
+    def visitLiberacion(self, ctx:DSLParser.LiberacionContext):
+        # 'del' / 'free' a, b;
+        for id_ in ctx.ID():
+            self.liberar(id_.getText())
         return None
 
+    def liberar(self, nombre):
+        """Quita la variable y el dataframe y el modelo guardados con su nombre"""
+        if not self.contexto.eliminar_variable(nombre):
+            raise NameError(f"Variable '{nombre}' no está definida")
+        self.dataframes.eliminar_dataframe(nombre)
+        self.modelos.eliminar_modelo(nombre)
+
+    def liberar_muertas(self, nombres):
+        """Libera las variables que ya no se usan (las que existan)"""
+        for nombre in nombres:
+            self.contexto.eliminar_variable(nombre)
+            self.dataframes.eliminar_dataframe(nombre)
+            self.modelos.eliminar_modelo(nombre)
+
     # --- Machine Learning ---
 
+    def ejecutar_ml(self, ctx, funcion, *argumentos, **opciones):
+        """
+        Llama a la función de la librería; si 'ctx' es la operación de
+        un 'spawn', la envía al pool de procesos y retorna un Futuro
+        """
+        if ctx is not self._lanzamiento:
+            return funcion(*argumentos, **opciones)
+        self._lanzamiento = None
+        futuro = lanzar(funcion, *argumentos, **opciones)
+        self.tareas.append(futuro)
+        return futuro
+
+    def esperar_tareas(self):
+        """Espera todas las operaciones lanzadas (su salida queda en orden)"""
+        tareas, self.tareas = self.tareas, []
+        for futuro in tareas:
+            futuro.resultado()
+
+    def visitLanzamiento(self, ctx:DSLParser.LanzamientoContext):
+        # 'spawn' operacionML: los argumentos se evalúan acá y la operación
+        # corre en otro proceso; su variable queda con el Futuro
+        return self.lanzar_operacion(ctx.operacionML().getChild(0))
+
+    def lanzar_operacion(self, operacion):
+        """Ejecuta una operación de LANZABLES en el pool; retorna su Futuro"""
+        if not isinstance(operacion, LANZABLES):
+            raise ValueError(f"spawn: '{operacion.getChild(0).getText()}' no se puede lanzar en segundo plano "
+                             "(solo regresion_lineal, perceptron, train, kmeans, dbscan y hierarchical)")
+        if not isinstance(operacion, DSLParser.MlpEntrenarContext) and not operacion.ID():
+            raise ValueError("spawn: la operación tiene que asignar su resultado a una variable")
+        self._lanzamiento = operacion
+        try:
+            return self.visit(operacion)
+        finally:
+            self._lanzamiento = None
+
+    def visitEspera(self, ctx:DSLParser.EsperaContext):
+        # 'await' a, b; deja en cada variable el resultado de su operación
+        # ('await;' espera todas). Leer la variable también espera
+        if not ctx.ID():
+            self.esperar_tareas()
+            return None
+        for id_ in ctx.ID():
+            nombre = id_.getText()
+            self.contexto.actualizar_variable(nombre, self.contexto.obtener_variable(nombre))
+        return None
+
     def visitRegresionLineal(self, ctx:DSLParser.RegresionLinealContext):
         # 'regresion_lineal' '(' 'X=' expresion ',' 'y=' expresion ')' ';'
         X = self.visit(ctx.expresion(0))
         y = self.visit(ctx.expresion(1))
         
-        modelo = RedesNeuronales.regresion_lineal_multiple(X, y)
+        modelo = self.ejecutar_ml(ctx, RedesNeuronales.regresion_lineal_multiple, X, y)
         
         if ctx.ID(): # Asignación a variable
             nombre = ctx.ID().getText()
@@ -350,7 +541,7 @@ class Visitor(DSLVisitor):
                 epochs = self.visit(ctx.expresion(idx_expr))
                 idx_expr += 1
                 
-        modelo = RedesNeuronales.perceptron_simple(X, y, lr, int(epochs))
+        modelo = self.ejecutar_ml(ctx, RedesNeuronales.perceptron_simple, X, y, lr, int(epochs))
         
         if ctx.ID():
             nombre = ctx.ID().getText()
@@ -388,7 +579,7 @@ class Visitor(DSLVisitor):
                 epochs = self.visit(ctx.expresion(idx_expr))
                 idx_expr += 1
                 
-        modelo_entrenado = RedesNeuronales.entrenar_mlp(modelo, X, y, lr, int(epochs), verbose=True)
+        modelo_entrenado = self.ejecutar_ml(ctx, RedesNeuronales.entrenar_mlp, modelo, X, y, lr, int(epochs), verbose=True)
         self.contexto.actualizar_variable(nombre, modelo_entrenado)
         return modelo_entrenado
 
@@ -492,7 +683,7 @@ class Visitor(DSLVisitor):
             if child.getText() == 'max_iter=':
                 max_iter = self.visit(ctx.expresion(idx_expr))
                 
-        modelo = Agrupamiento.kmeans(data, int(k), int(max_iter))
+        modelo = self.ejecutar_ml(ctx, Agrupamiento.kmeans, data, int(k), int(max_iter))
         
         if ctx.ID():
             nombre = ctx.ID().getText()
@@ -506,7 +697,7 @@ class Visitor(DSLVisitor):
         eps = self.visit(ctx.expresion(1))
         min_pts = self.visit(ctx.expresion(2))
         
-        modelo = Agrupamiento.dbscan(data, float(eps), int(min_pts))
+        modelo = self.ejecutar_ml(ctx, Agrupamiento.dbscan, data, float(eps), int(min_pts))
         
         if ctx.ID():
             nombre = ctx.ID().getText()
@@ -523,7 +714,7 @@ class Visitor(DSLVisitor):
         if ctx.STRING():
             method = ctx.STRING().getText()[1:-1]
             
-        modelo = Agrupamiento.agrupamiento_jerarquico(data, int(n_clusters), method)
+        modelo = self.ejecutar_ml(ctx, Agrupamiento.agrupamiento_jerarquico, data, int(n_clusters), method)
         
         if ctx.ID():
             nombre = ctx.ID().getText()
@@ -693,26 +884,13 @@ class Visitor(DSLVisitor):
                 return 0
                 
             funcion_info = self.contexto.obtener_funcion(func_name)
-            parametros = funcion_info['parametros']
-            cuerpo = funcion_info['cuerpo']
             
             # Asumimos función de 1 argumento
-            if len(parametros) != 1:
+            if len(funcion_info['parametros']) != 1:
                 return 0
                 
-            self.contexto.entrar_llamada(func_name, [x])
-            self.contexto.entrar_scope('funcion')
-            self.contexto.definir_local(parametros[0], x)
-            
-            res = 0
-            try:
-                self.visit(cuerpo)
-            except ReturnException as e:
-                res = e.value
-            finally:
-                self.contexto.salir_scope()
-                self.contexto.salir_llamada()
-            return res
+            res = self.llamar_funcion(func_name, funcion_info, [x])
+            return res if res is not None else 0
 
         Graficos.funcion(func_wrapper, start, end, titulo=title)
         return None
\ No newline at end of file